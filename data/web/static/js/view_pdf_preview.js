@@ -0,0 +1,13 @@
+$(document).ready(function () {
+    $('a.pdf_preview_on_demand').click(function (event) {
+        var link = $(this);
+        var image = $('<img />', {
+            src: link.attr('href'),
+            'class': 'pdf_preview',
+            alt: link.text()});
+
+        link.replaceWith($('<a />', {href: link.data('pdf_url')}).append(image));
+
+        event.preventDefault();
+    });
+});
@@ -21,8 +21,10 @@ from __future__ import absolute_import, division, print_function, \
 from collections import defaultdict
 from datetime import datetime, timedelta
 
-from ..config import get_config
-from ..type.enum import BaseReviewerRole, ProposalState, ReviewState
+from ..config import get_config, get_facilities
+from ..facility.generic.tool_clash import ClashTool
+from ..type.enum import AttachmentState, BaseReviewerRole, CallState, \
+    ProposalState, ReviewState
 from ..util import get_logger
 from .proposal import close_call_proposals, send_call_proposal_feedback
 
@@ -53,6 +55,101 @@ def close_completed_call(db):
     return n_closed
 
 
+def process_call_target_clash(db):
+    """
+    Check the targets of closed calls against the coverage maps (MOCs)
+    of their facility's clash tool.
+
+    Calls with proposals in the review process are checked if they
+    have not been checked before, or if any of the facility's MOCs
+    have been uploaded since they were last checked.  Facilities are
+    skipped while any of their MOCs are still being processed.
+
+    The results are stored in the database, for the call clash report,
+    by the clash tool's
+    :meth:`~hedwig.facility.generic.tool_clash.ClashTool.check_call` method.
+    """
+
+    calls = db.search_call(
+        state=CallState.CLOSED,
+        has_proposal_state=ProposalState.review_states(),
+        with_facility_code=True)
+
+    if not calls:
+        return 0
+
+    checks = db.search_call_clash(call_id=list(calls.keys()))
+
+    facility_tools = {}
+
+    n_checked = 0
+
+    for call in calls.values():
+        if call.facility_id not in facility_tools:
+            facility_tools[call.facility_id] = _get_facility_clash_tool(
+                db, call.facility_id, call.facility_code)
+
+        (tool, uploaded) = facility_tools[call.facility_id]
+
+        if tool is None:
+            continue
+
+        check = checks.get(call.id)
+
+        if check is not None and check.date >= uploaded:
+            continue
+
+        logger.debug('Checking targets of call {} for clashes', call.id)
+
+        try:
+            n_clash = tool.check_call(db, call.id)
+
+            logger.debug('Found {} clashing target(s) in call {}',
+                         n_clash, call.id)
+
+            n_checked += 1
+
+        except:
+            logger.exception('Error checking targets of call {}', call.id)
+
+    return n_checked
+
+
+def _get_facility_clash_tool(db, facility_id, facility_code):
+    """
+    Prepare to check the targets of a facility's calls.
+
+    :return: a tuple containing the facility's clash tool (or `None` if
+        the facility does not have one, or its MOCs are not ready) and
+        the latest upload date of its MOCs
+    """
+
+    for facility_class in get_facilities():
+        if facility_class.get_code() == facility_code:
+            facility = facility_class(facility_id)
+            break
+    else:
+        return (None, None)
+
+    for tool_class in facility.get_target_tool_classes():
+        if issubclass(tool_class, ClashTool):
+            tool = tool_class(facility, 0)
+            break
+    else:
+        return (None, None)
+
+    mocs = db.search_moc(facility_id=facility_id, public=None)
+
+    if not mocs:
+        return (None, None)
+
+    if not all(AttachmentState.is_ready(x.state) for x in mocs.values()):
+        logger.debug('Facility {} MOCs are not ready', facility_code)
+        return (None, None)
+
+    return (tool, max(x.uploaded for x in mocs.values()))
+
+
 def send_proposal_feedback(db):
     """
     Send feedback for proposals when have been reviewed.
@@ -18,10 +18,11 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
-from collections import OrderedDict, namedtuple
+from collections import OrderedDict, defaultdict, namedtuple
 
 from astropy import coordinates
 from astropy.units import degree, hourangle
+import numpy as np
 
 from ..error import UserError
 
@@ -155,3 +156,228 @@ def coord_from_dec_deg(system, x_deg, y_deg):
     info = CoordSystem._get_info(system)
 
     return coordinates.SkyCoord(x_deg, y_deg, unit=degree, frame=info.frame)
+
+
+def parse_coord_list(systems, xs, ys, names):
+    """
+    Parse lists of coordinate information (strings) as entered by users
+    and return arrays of decimal degrees.
+
+    This is equivalent to applying :func:`parse_coord` and
+    :func:`coord_to_dec_deg` to each position, but the positions in
+    each system are parsed together by a single astropy coordinate object.
+    If any position can not be parsed, the first such position is
+    located by repeating the parsing on progressively smaller sections
+    of the list, and the error for that position is raised.
+
+    :param systems: list of coordinate systems
+    :param xs: list of "x" (longitude) values
+    :param ys: list of "y" (latitude) values
+    :param names: list of target names, for use in error messages
+
+    :return: a tuple of numpy arrays `(x_deg, y_deg)`
+
+    :raises UserError: if any of the positions could not be parsed
+    """
+
+    x_deg = np.empty(len(systems))
+    y_deg = np.empty(len(systems))
+
+    indices = defaultdict(list)
+
+    for (i, system) in enumerate(systems):
+        if not CoordSystem.is_valid(system):
+            raise UserError('Coordinate system for "{}" not recognized.',
+                            names[i])
+
+        indices[system].append(i)
+
+    for (system, system_indices) in indices.items():
+        info = CoordSystem._get_info(system)
+
+        try:
+            system_coord = _parse_coord_array(
+                info,
+                [xs[i] for i in system_indices],
+                [ys[i] for i in system_indices])
+
+        except (coordinates.RangeError, ValueError):
+            _raise_first_coord_error(system, xs, ys, names, system_indices)
+
+        x_deg[system_indices] = system_coord.spherical.lon.deg
+        y_deg[system_indices] = system_coord.spherical.lat.deg
+
+    return (x_deg, y_deg)
+
+
+def _parse_coord_array(info, xs, ys):
+    """
+    Parse lists of coordinates in a single system and return
+    an astropy SkyCoord object containing arrays of positions.
+
+    :raises RangeError: or `ValueError` if any position could not
+        be parsed.
+    """
+
+    return coordinates.SkyCoord(
+        _parse_angle_array(xs, info.unit[0]),
+        _parse_angle_array(ys, info.unit[1]),
+        unit=degree, frame=info.frame)
+
+
+def _parse_angle_array(values, unit):
+    """
+    Parse a list of angles, given either as plain floating point
+    numbers (considered to be degrees) or as strings in the given unit,
+    and return an array of decimal degrees.
+    """
+
+    ans = np.empty(len(values))
+    angle_indices = []
+
+    for (i, value) in enumerate(values):
+        try:
+            ans[i] = float(value)
+        except ValueError:
+            angle_indices.append(i)
+
+    if angle_indices:
+        ans[angle_indices] = coordinates.Angle(
+            [values[i] for i in angle_indices], unit=unit).deg
+
+    return ans
+
+
+def _raise_first_coord_error(system, xs, ys, names, indices):
+    """
+    Find the first of the given positions which can not be parsed,
+    by bisection, and raise the corresponding error.
+
+    :raises UserError: describing the first position which could not
+        be parsed.
+    """
+
+    info = CoordSystem._get_info(system)
+
+    while len(indices) > 1:
+        half = len(indices) // 2
+
+        try:
+            _parse_coord_array(
+                info,
+                [xs[i] for i in indices[:half]],
+                [ys[i] for i in indices[:half]])
+
+        except (coordinates.RangeError, ValueError):
+            indices = indices[:half]
+
+        else:
+            indices = indices[half:]
+
+    (i,) = indices
+
+    # Parse the position individually to obtain the error message.
+    parse_coord(system, xs[i], ys[i], names[i])
+
+    raise UserError('Could not parse coordinates for "{}".', names[i])
+
+
+def format_coord_list(systems, x_deg, y_deg):
+    """
+    Format arrays of coordinates in decimal degrees for display.
+
+    The positions in each system are formatted together, giving the
+    same results as :func:`format_coord` would for each position.
+
+    :param systems: list of coordinate systems
+    :param x_deg: list or array of "x" (longitude) values in degrees
+    :param y_deg: list or array of "y" (latitude) values in degrees
+
+    :return: a tuple of lists of strings `(x, y)`
+    """
+
+    x_deg = np.asarray(x_deg, dtype=np.float64)
+    y_deg = np.asarray(y_deg, dtype=np.float64)
+
+    x_text = [None] * len(systems)
+    y_text = [None] * len(systems)
+
+    indices = defaultdict(list)
+
+    for (i, system) in enumerate(systems):
+        indices[system].append(i)
+
+    for (system, system_indices) in indices.items():
+        info = CoordSystem._get_info(system)
+
+        (system_x, system_y) = format_coord(system, coordinates.SkyCoord(
+            x_deg[system_indices], y_deg[system_indices],
+            unit=degree, frame=info.frame))
+
+        for (i, x, y) in zip(
+                system_indices, system_x.tolist(), system_y.tolist()):
+            x_text[i] = x
+            y_text[i] = y
+
+    return (x_text, y_text)
+
+
+def coord_list_to_icrs(systems, coords):
+    """
+    Convert a list of coordinate objects to a single ICRS coordinate
+    object containing arrays of positions.
+
+    :param systems: list of coordinate systems
+    :param coords: list of coordinate objects in the corresponding systems
+
+    :return: an astropy SkyCoord object in the ICRS frame
+    """
+
+    return dec_deg_list_to_icrs(
+        systems,
+        [x.spherical.lon.deg for x in coords],
+        [x.spherical.lat.deg for x in coords])
+
+
+def dec_deg_list_to_icrs(systems, x_deg, y_deg):
+    """
+    Convert arrays of coordinates in decimal degrees to a single ICRS
+    coordinate object containing arrays of positions.
+
+    The coordinates in each system are combined and transformed
+    in a single operation, rather than transforming each coordinate
+    separately.
+
+    :param systems: list of coordinate systems
+    :param x_deg: list or array of "x" (longitude) values in degrees
+    :param y_deg: list or array of "y" (latitude) values in degrees
+
+    :return: an astropy SkyCoord object in the ICRS frame
+    """
+
+    x_deg = np.asarray(x_deg, dtype=np.float64)
+    y_deg = np.asarray(y_deg, dtype=np.float64)
+
+    ra_deg = np.empty(len(systems))
+    dec_deg = np.empty(len(systems))
+
+    indices = defaultdict(list)
+
+    for (i, system) in enumerate(systems):
+        indices[system].append(i)
+
+    for (system, system_indices) in indices.items():
+        info = CoordSystem._get_info(system)
+
+        system_coord = coordinates.SkyCoord(
+            x_deg[system_indices], y_deg[system_indices],
+            unit=degree, frame=info.frame)
+
+        if system != CoordSystem.ICRS:
+            system_coord = system_coord.icrs
+
+        ra_deg[system_indices] = system_coord.spherical.lon.deg
+        dec_deg[system_indices] = system_coord.spherical.lat.deg
+
+    return coordinates.SkyCoord(ra_deg, dec_deg, unit=degree,
+                                frame=coordinates.ICRS)
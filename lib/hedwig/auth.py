@@ -24,41 +24,202 @@ try:
     from hashlib import pbkdf2_hmac
 except ImportError:
     from backports.pbkdf2 import pbkdf2_hmac
-from os import urandom
+from multiprocessing import Pool
+from os import getpid, urandom
+from threading import BoundedSemaphore, Lock
 
-_rounds = 1000000
+from .error import UserError
+from .util import get_logger
 
-# Time to sleep as a delay which simulates hashing the password.
-password_hash_delay = 10
+logger = get_logger(__name__)
 
+# Number of rounds used for password hashes which do not have a number
+# of rounds stored with them.
+_legacy_rounds = 1000000
 
-def create_password_hash(password_raw):
+# Number of rounds to use for new password hashes.
+_rounds = _legacy_rounds
+
+# Process pool used for password hashing, if configured.  This is
+# created by configure_password_hash, which should be called when the
+# application starts, so that the pool is not forked from a request thread.
+_pool = None
+_pool_pid = None
+_pool_processes = None
+_pool_max_waiting = 0
+_pool_semaphore = None
+_pool_lock = Lock()
+
+
+def configure_password_hash(rounds=None, processes=None, max_waiting=0):
+    """
+    Configure password hashing.
+
+    :param rounds: number of rounds for new password hashes.  Existing
+        hashes with a different number of rounds are replaced when the user
+        next logs in.  If not specified, the number is left unchanged.
+    :param processes: number of processes to use to compute hashes.
+        If not specified, hashes are computed in the calling thread.
+        The processes are started immediately, so this function should
+        be called when the application starts, before it begins
+        handling requests in multiple threads.
+    :param max_waiting: number of hashing requests which can wait for
+        a process to become available.  Further requests are rejected.
+    """
+
+    global _rounds, _pool, _pool_pid, _pool_processes, _pool_max_waiting, \
+        _pool_semaphore
+
+    if rounds:
+        _rounds = rounds
+
+    with _pool_lock:
+        if (processes == _pool_processes and
+                max_waiting == _pool_max_waiting and
+                (_pool is None or _pool_pid == getpid())):
+            return
+
+        if _pool is not None:
+            if _pool_pid == getpid():
+                _pool.terminate()
+
+            _pool = None
+
+        _pool_processes = processes
+        _pool_max_waiting = max_waiting
+        _pool_semaphore = (
+            None if not processes
+            else BoundedSemaphore(processes + max_waiting))
+
+        if processes:
+            _pool = Pool(processes)
+            _pool_pid = getpid()
+
+
+def get_password_rounds():
+    """
+    Get the number of rounds to be used for new password hashes.
+    """
+
+    return _rounds
+
+
+def is_password_hash_current(rounds):
+    """
+    Determine whether a password hash was created with the number of
+    rounds which would be used for a new hash.
+
+    :param rounds: the number of rounds stored with the hash,
+        or `None` if it was created before the number was stored.
+    """
+
+    if rounds is None:
+        rounds = _legacy_rounds
+
+    return rounds == _rounds
+
+
+def create_password_hash(password_raw, rounds=None):
     """
     Create hash and salt for the given raw password.
 
     The password is encoded as UTF-8 and a salt read from "os.random".
     Returns ASCII hex representation of the hash and salt.
+
+    If the number of rounds is not specified, the value from
+    :func:`get_password_rounds` is used.
     """
 
+    if rounds is None:
+        rounds = _rounds
+
     password_salt = urandom(32)
-    password_hash = pbkdf2_hmac(
-        'sha256', utf_8_encode(password_raw)[0], password_salt, _rounds)
+    password_hash = _compute_hash(password_raw, password_salt, rounds)
 
-    return (hexlify(password_hash), hexlify(password_salt))
+    return (password_hash, hexlify(password_salt))
 
 
-def check_password_hash(password_raw, password_hash, password_salt):
+def check_password_hash(password_raw, password_hash, password_salt,
+                        rounds=None):
     """
     Checks the given raw password against the hash and salt.
 
     Assumes that the hash and salt are given in ASCII hex representation
     and checks whether the password re-generates the hash when hashed
     using the salt.
+
+    The number of rounds with which the hash was created should be
+    given, unless it was created before the number was stored.
+    """
+
+    if rounds is None:
+        rounds = _legacy_rounds
+
+    return password_hash == _compute_hash(
+        password_raw, unhexlify(password_salt), rounds)
+
+
+def check_password_dummy(password_raw):
+    """
+    Perform the same work as :func:`check_password_hash` would for
+    a hash with the current number of rounds, without a stored hash,
+    e.g. when the user name does not exist, so that this can not be
+    distinguished by the time taken.
+    """
+
+    _compute_hash(password_raw, urandom(32), _rounds)
+
+
+def _compute_hash(password_raw, password_salt, rounds):
+    """
+    Compute a password hash, using the process pool if configured.
+
+    :raises UserError: if too many hashing requests are already waiting.
+    """
+
+    password_encoded = utf_8_encode(password_raw)[0]
+
+    pool = _get_pool()
+
+    if pool is None:
+        return _pbkdf2(password_encoded, password_salt, rounds)
+
+    if not _pool_semaphore.acquire(False):
+        raise UserError(
+            'The server is currently handling too many log in attempts.  '
+            'Please try again in a few moments.')
+
+    try:
+        return pool.apply(_pbkdf2, (password_encoded, password_salt, rounds))
+
+    finally:
+        _pool_semaphore.release()
+
+
+def _get_pool():
+    """
+    Get the password hashing process pool, if one was configured.
+
+    The pool is not created here, since doing so would fork a process
+    from a request thread.  If this process has been forked since the
+    pool was created, the pool can not be used, so `None` is returned
+    and hashes are computed in the calling thread.
     """
 
-    return password_hash == hexlify(pbkdf2_hmac(
-        'sha256', utf_8_encode(password_raw)[0], unhexlify(password_salt),
-        _rounds))
+    if _pool is None:
+        return None
+
+    if _pool_pid != getpid():
+        logger.warning(
+            'Password hashing pool was created by another process')
+        return None
+
+    return _pool
+
+
+def _pbkdf2(password_encoded, password_salt, rounds):
+    return hexlify(pbkdf2_hmac(
+        'sha256', password_encoded, password_salt, rounds))
 
 
 def generate_token():
@@ -25,6 +25,7 @@ import os
 from .error import FormattedError
 from .db.control import Database
 from .db.engine import get_engine
+from .db.store import get_attachment_store
 
 config_file = ('etc', 'hedwig.ini')
 config = None
@@ -55,12 +56,17 @@ def get_config():
     return config
 
 
-def get_database(database_url=None, facility_spec=None):
+def get_database(database_url=None, facility_spec=None,
+                 read_database_url=None):
     """
     Construct a database control object.
 
     The database URL and facility specifier text (comma-separated string)
     can be given for testing -- otherwise they are read from the configuration.
+
+    If a read database URL is given (or configured) then a second
+    engine is created for it, to be used for read-only transactions,
+    e.g. on a read replica of the main database.
     """
 
     global database
@@ -71,6 +77,9 @@ def get_database(database_url=None, facility_spec=None):
         if database_url is None:
             database_url = config.get('database', 'url')
 
+            if read_database_url is None:
+                read_database_url = config.get('database', 'read_url')
+
         engine_options = {}
 
         if not database_url.startswith('sqlite'):
@@ -86,8 +95,38 @@ def get_database(database_url=None, facility_spec=None):
                 engine_options['max_overflow'] = int(config.get(
                     'database', 'pool_overflow'))
 
+        database_options = {}
+
+        if config.get('database', 'transaction_lock'):
+            database_options['transaction_lock'] = config.get(
+                'database', 'transaction_lock')
+
+        if config.get('database', 'moc_index_max_cells'):
+            database_options['moc_index_max_cells'] = int(config.get(
+                'database', 'moc_index_max_cells'))
+
+        if config.get('database', 'moc_index_check_interval'):
+            database_options['moc_index_check_interval'] = int(config.get(
+                'database', 'moc_index_check_interval'))
+
+        attachment_store = config.get('attachment', 'store')
+        if attachment_store:
+            database_options['attachment_store'] = get_attachment_store(
+                attachment_store,
+                directory=config.get('attachment', 'directory'))
+
+        if read_database_url:
+            read_engine_options = {}
+
+            if not read_database_url.startswith('sqlite'):
+                read_engine_options.update(engine_options)
+
+            database_options['read_engine'] = get_engine(
+                read_database_url, **read_engine_options)
+
         CombinedDatabase = _get_db_class(facility_spec)
-        database = CombinedDatabase(get_engine(database_url, **engine_options))
+        database = CombinedDatabase(get_engine(database_url, **engine_options),
+                                    **database_options)
 
     return database
 
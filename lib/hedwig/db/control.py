@@ -20,7 +20,8 @@ from __future__ import absolute_import, division, print_function, \
 
 from collections import deque, namedtuple
 from contextlib import contextmanager
-from threading import Lock
+from tempfile import TemporaryFile
+from time import time
 
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from sqlalchemy.sql import select
@@ -28,9 +29,15 @@ from sqlalchemy.sql.expression import and_
 from sqlalchemy.sql.functions import count
 
 from ..error import ConsistencyError, Error, \
-    DatabaseError, DatabaseIntegrityError, UserError
+    DatabaseError, DatabaseIntegrityError, NoSuchRecord, UserError
 from ..type.collection import ResultCollection
-from ..util import is_list_like, list_in_blocks
+from ..type.misc import FileStream
+from ..util import get_logger, is_list_like, list_in_blocks
+from .engine import get_transaction_lock_mode
+from .lock import TransactionLock
+from .meta import moc_fits, proposal_fig, proposal_fig_preview, \
+    proposal_fig_thumbnail, proposal_pdf, proposal_pdf_preview
+from .moc_index import MOCIndexCache
 from .part.calculator import CalculatorPart
 from .part.message import MessagePart
 from .part.people import PeoplePart
@@ -38,30 +45,84 @@ from .part.proposal import ProposalPart
 from .part.review import ReviewPart
 
 
+logger = get_logger(__name__)
+
 RecordUpdate = namedtuple(
     'RecordUpdate',
     ('id', 'value', 'updates', 'value_unique_key', 'previous_unique_key',
      'deferred'))
 
+# Binary columns containing attachments which can be kept in the
+# attachment store, with the corresponding primary key column.
+attachment_columns = (
+    (moc_fits.c.fits, moc_fits.c.moc_id),
+    (proposal_fig.c.figure, proposal_fig.c.id),
+    (proposal_fig_preview.c.preview, proposal_fig_preview.c.fig_id),
+    (proposal_fig_thumbnail.c.thumbnail, proposal_fig_thumbnail.c.fig_id),
+    (proposal_pdf.c.pdf, proposal_pdf.c.id),
+    (proposal_pdf_preview.c.preview, proposal_pdf_preview.c.id),
+)
+
 
 class Database(CalculatorPart, MessagePart, PeoplePart, ProposalPart,
                ReviewPart):
-    def __init__(self, engine, query_block_size=50):
+    def __init__(self, engine, query_block_size=50, transaction_lock=None,
+                 read_engine=None, moc_index_max_cells=1000000,
+                 moc_index_check_interval=60, attachment_store=None):
         """
         Create database controller object.
+
+        :param engine: SQLAlchemy engine object.
+        :param query_block_size: maximum number of values to include
+            in a single "IN" clause.
+        :param transaction_lock: transaction locking mode (see
+            :class:`~hedwig.db.lock.TransactionLock`).  If not specified,
+            the mode is determined from the engine.
+        :param read_engine: SQLAlchemy engine object (e.g. for a
+            read replica) to be used for read-only transactions
+            which request it.  If not specified, the main engine is used.
+        :param moc_index_max_cells: maximum total number of MOC cells
+            to hold in in-memory coverage indexes (0 to disable them).
+        :param moc_index_check_interval: time (seconds) after which
+            in-memory coverage indexes should be checked against the
+            database for changes made by other processes.
+        :param attachment_store: attachment storage backend
+            (see :mod:`hedwig.db.store`).  If specified, new
+            attachments are written to the store and only their keys
+            are kept in the database.
         """
 
+        if transaction_lock is None:
+            transaction_lock = get_transaction_lock_mode(engine)
+
         self._engine = engine
-        self._lock = Lock()
+        self._lock = TransactionLock(transaction_lock)
+
+        if read_engine is None:
+            self._read_engine = engine
+            self._read_lock = self._lock
+
+        else:
+            self._read_engine = read_engine
+            self._read_lock = TransactionLock(
+                get_transaction_lock_mode(read_engine))
 
         self.query_block_size = query_block_size
 
+        self._moc_index = MOCIndexCache(
+            max_cells=moc_index_max_cells,
+            check_interval=moc_index_check_interval)
+
+        self._attachment_store = attachment_store
+
     @contextmanager
     def _transaction(self, _conn=None):
         """
         Private context manager method for handling database transactions.
 
-        Obtains a lock and then yields a connection object.  SQLAlchemy
+        Obtains the transaction lock in exclusive mode (which only blocks
+        if the engine requires write transactions to be serialized)
+        and then yields a connection object.  SQLAlchemy
         errors are trapped and re-raised as our DatabaseError, other than
         for IntegrityError which is re-raised as DatabaseIntegrityError.
 
@@ -75,7 +136,7 @@ class Database(CalculatorPart, MessagePart, PeoplePart, ProposalPart,
             return
 
         try:
-            with self._lock:
+            with self._lock.exclusive():
                 with self._engine.begin() as conn:
                     yield conn
         except IntegrityError as e:
@@ -83,6 +144,205 @@ class Database(CalculatorPart, MessagePart, PeoplePart, ProposalPart,
         except SQLAlchemyError as e:
             raise DatabaseError(e)
 
+    @contextmanager
+    def _read_transaction(self, _conn=None, read_replica=False):
+        """
+        Private context manager method for handling read-only database
+        transactions.
+
+        This is similar to :meth:`_transaction` but only obtains the
+        transaction lock in shared mode.  The transaction is always
+        rolled back, and MySQL transactions are explicitly declared
+        read-only, so this method must not be used for operations which
+        modify the database.
+
+        If "read_replica" is specified, the read engine (if one was
+        given) is used instead of the main engine.  Since a replica
+        may lag behind the main database, this should only be requested
+        for queries which can tolerate slightly out-of-date results,
+        such as those used to prepare listing pages.
+
+        If "_conn" is not None, simply yields its value, so that
+        methods can be called from within an existing transaction.
+        """
+
+        if _conn is not None:
+            yield _conn
+            return
+
+        if read_replica:
+            (engine, lock) = (self._read_engine, self._read_lock)
+        else:
+            (engine, lock) = (self._engine, self._lock)
+
+        try:
+            with lock.shared():
+                conn = engine.connect()
+
+                try:
+                    if conn.dialect.name == 'mysql':
+                        conn.execute('SET TRANSACTION READ ONLY')
+
+                    trans = conn.begin()
+
+                    try:
+                        yield conn
+
+                    finally:
+                        trans.rollback()
+
+                finally:
+                    conn.close()
+
+        except IntegrityError as e:
+            raise DatabaseIntegrityError(e)
+        except SQLAlchemyError as e:
+            raise DatabaseError(e)
+
+    def get_transaction_lock_statistics(self, reset=False):
+        """
+        Get statistics describing time spent waiting for the
+        transaction lock.
+
+        :param reset: if true, clear the statistics after reading them.
+
+        :return: a `TransactionLockStatistics` tuple.
+        """
+
+        return self._lock.get_statistics(reset=reset)
+
+    def clean_attachment_store(self, min_age=86400, dry_run=False):
+        """
+        Remove attachments from the store which are no longer referenced
+        by any database record.
+
+        :param min_age: minimum age (seconds) of attachments to remove.
+            Recently stored attachments are kept in case the
+            transaction which will refer to them has not yet been
+            committed.
+        :param dry_run: if specified, only count the attachments
+            which would have been removed.
+
+        :return: the number of attachments removed.
+        """
+
+        store = self._get_attachment_store()
+
+        # Read the candidate keys before the references, so that any
+        # attachment stored in the meantime is also referenced.
+        scan_time = time()
+        keys = list(store.iter_keys(min_age=min_age))
+
+        referenced = set()
+
+        with self._transaction() as conn:
+            for (column, id_column) in attachment_columns:
+                key_column = column.table.c.store_key
+
+                referenced.update(row[0] for row in conn.execute(
+                    select([key_column]).where(
+                        key_column.isnot(None)).distinct()))
+
+        n_removed = 0
+
+        for key in keys:
+            if key in referenced:
+                continue
+
+            # Check again that the attachment is not referenced, in case
+            # it was stored again (and referenced) since the scan.
+            # Attachments stored again after the scan began are also
+            # skipped, as their new references may not yet be committed.
+            with self._transaction() as conn:
+                if self._is_attachment_referenced(conn, key):
+                    continue
+
+                if not dry_run:
+                    if not store.delete(key, max_mtime=scan_time):
+                        continue
+
+                    logger.debug('Removed unreferenced attachment {}', key)
+
+            n_removed += 1
+
+        return n_removed
+
+    def _is_attachment_referenced(self, conn, key):
+        """
+        Determine whether any database record refers to the given
+        attachment store key.
+        """
+
+        for (column, id_column) in attachment_columns:
+            key_column = column.table.c.store_key
+
+            if conn.execute(select([id_column]).where(
+                    key_column == key).limit(1)).first() is not None:
+                return True
+
+        return False
+
+    def migrate_attachments(self, to_store=True):
+        """
+        Move attachments between the database and the attachment store.
+
+        Each attachment is moved in a separate transaction so that
+        this can be done while the system is in use.
+
+        :param to_store: if true, attachments held in the database are
+            moved to the store, otherwise attachments in the store
+            are moved back into the database.
+
+        :return: dictionary of the number of attachments moved by
+            table name.
+        """
+
+        store = self._get_attachment_store()
+        moved = {}
+
+        for (column, id_column) in attachment_columns:
+            table = column.table
+            key_column = table.c.store_key
+            source_column = column if to_store else key_column
+
+            with self._transaction() as conn:
+                ids = [row[0] for row in conn.execute(
+                    select([id_column]).where(
+                        source_column.isnot(None)).order_by(id_column))]
+
+            n_moved = 0
+
+            for id_ in ids:
+                with self._transaction() as conn:
+                    row = conn.execute(select([
+                        column, key_column,
+                    ]).where(id_column == id_).with_for_update()).first()
+
+                    if row is None or row[source_column.name] is None:
+                        # The record was altered in the meantime.
+                        continue
+
+                    if to_store:
+                        values = {
+                            column: None,
+                            key_column: store.put(row[column.name]),
+                        }
+
+                    else:
+                        values = {
+                            column: store.get(row['store_key']),
+                            key_column: None,
+                        }
+
+                    conn.execute(table.update().where(
+                        id_column == id_).values(values))
+
+                n_moved += 1
+
+            moved[table.name] = n_moved
+
+        return moved
+
     def _exists_id(self, conn, table, id_):
         """
         Test whether an identifier exists in the given table.
@@ -92,7 +352,112 @@ class Database(CalculatorPart, MessagePart, PeoplePart, ProposalPart,
             table.c.id == id_,
         )).scalar()
 
-    def _iter_stmt(self, stmt, iter_field, iter_list):
+    def _get_attachment(self, data, store_key):
+        """
+        Get attachment data, reading it from the attachment store
+        if the record has a store key.
+        """
+
+        if store_key is None:
+            return data
+
+        return self._get_attachment_store().get(store_key)
+
+    def _get_attachment_store(self):
+        """
+        Get the attachment store.
+
+        :raises Error: if no attachment store has been configured.
+        """
+
+        if self._attachment_store is None:
+            raise Error('attachment store is not configured')
+
+        return self._attachment_store
+
+    def _get_attachment_values(self, column, data):
+        """
+        Prepare column values to store attachment data.
+
+        If an attachment store has been configured, the data are written
+        to it immediately and the values refer to the stored attachment.
+        Otherwise the values place the data in the given column.
+
+        :return: a dictionary of values for the column
+            and its table's `store_key` column.
+        """
+
+        if self._attachment_store is None:
+            return {
+                column: data,
+                column.table.c.store_key: None,
+            }
+
+        return {
+            column: None,
+            column.table.c.store_key: self._attachment_store.put(data),
+        }
+
+    def _get_blob_stream(self, column, whereclause,
+                         etag=None, last_modified=None, store_key=None):
+        """
+        Create a stream object to read a binary column in sections.
+
+        The value is not read from the database until its length or
+        data are first required, allowing conditional requests to be
+        answered without doing so.  It is then read in a single query,
+        since on some databases (e.g. MySQL) reading part of a value
+        reads the whole value, and written to a temporary file from
+        which the sections are read.  The `whereclause` should select
+        the record unambiguously (e.g. by identifier and MD5 sum).
+
+        :param column: the binary column to read.
+        :param whereclause: condition selecting a single row.
+        :param etag: entity tag to attach to the stream.
+        :param last_modified: modification time to attach to the stream.
+        :param store_key: key of the attachment in the attachment
+            store, if present, in which case the stream is
+            obtained from the store instead.
+
+        :return: a :class:`~hedwig.type.misc.FileStream` object.
+            Its length raises :class:`~hedwig.error.NoSuchRecord` if the
+            data are not present.
+        """
+
+        if store_key is not None:
+            return self._get_attachment_store().get_stream(
+                store_key, etag=etag, last_modified=last_modified)
+
+        spill = []
+
+        def get_spill():
+            if not spill:
+                with self._read_transaction() as conn:
+                    data = conn.execute(select([
+                        column,
+                    ]).where(whereclause)).scalar()
+
+                if data is None:
+                    raise NoSuchRecord('binary data not found')
+
+                f = TemporaryFile()
+                f.write(data)
+                spill.append((f, len(data)))
+
+            return spill[0]
+
+        def length():
+            return get_spill()[1]
+
+        def read(offset, size):
+            f = get_spill()[0]
+            f.seek(offset)
+            return f.read(size)
+
+        return FileStream(length, read,
+                          etag=etag, last_modified=last_modified)
+
+    def _iter_stmt(self, stmt, iter_field, iter_list, block_size=None):
         """
         Generate sequence of query statements.
 
@@ -108,13 +473,17 @@ class Database(CalculatorPart, MessagePart, PeoplePart, ProposalPart,
         :param stmt: statement to be modified.
         :param iter_field: field being searched.
         :param iter_list: list (or other iterable) or search values.
+        :param block_size: block size to use instead of `query_block_size`.
         """
 
+        if block_size is None:
+            block_size = self.query_block_size
+
         if iter_field is None:
             yield stmt
 
         else:
-            for iter_block in list_in_blocks(iter_list, self.query_block_size):
+            for iter_block in list_in_blocks(iter_list, block_size):
                 yield stmt.where(iter_field.in_(iter_block))
 
     def _sync_records(self, conn, table, key_column, key_value, records,
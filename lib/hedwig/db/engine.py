@@ -22,9 +22,11 @@ from os import getpid
 
 from sqlalchemy import create_engine, event
 from sqlalchemy.engine import Engine
-from sqlalchemy.pool import Pool
+from sqlalchemy.pool import Pool, SingletonThreadPool, StaticPool
 from sqlalchemy.exc import DisconnectionError
 
+from .lock import TransactionLock
+
 
 @event.listens_for(Engine, 'connect')
 def engine_connect(dbapi_connection, connection_record):
@@ -91,3 +93,25 @@ def get_engine(url, **kwargs):
 
     return create_engine(url, pool_recycle=3600,
                          echo=False, **kwargs)
+
+
+def get_transaction_lock_mode(engine):
+    """
+    Determine the transaction locking mode required by an engine.
+
+    * SQLite engines using a single shared connection (such as for
+      in-memory databases) require all transactions to be serialized.
+    * Other SQLite engines only require write transactions to be serialized.
+    * Other (server-based) databases do not require any locking.
+
+    :return: a :class:`~hedwig.db.lock.TransactionLock` mode.
+    """
+
+    if engine.dialect.name != 'sqlite':
+        return TransactionLock.NONE
+
+    if (isinstance(engine.pool, (SingletonThreadPool, StaticPool)) or
+            engine.url.database in (None, '', ':memory:')):
+        return TransactionLock.ALL
+
+    return TransactionLock.WRITE
@@ -0,0 +1,162 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from collections import namedtuple
+from contextlib import contextmanager
+from threading import Lock
+from time import time
+
+from ..error import FormattedError
+from ..util import get_logger
+
+logger = get_logger(__name__)
+
+TransactionLockStatistics = namedtuple(
+    'TransactionLockStatistics',
+    ('acquired', 'wait_total', 'wait_max'))
+
+
+class TransactionLock(object):
+    """
+    Lock used to serialize database transactions where the database
+    engine requires it.
+
+    The lock operates in one of the following modes:
+
+    `NONE`
+        No locking is performed.  This is appropriate for server-based
+        databases, which handle concurrent connections from the pool
+        themselves.
+
+    `WRITE`
+        Only exclusive (read-write) transactions are serialized.  Shared
+        (read-only) transactions proceed in parallel.  This is appropriate
+        for SQLite database files, which allow only one writer at a time.
+
+    `ALL`
+        All transactions are serialized.  This is required when every
+        transaction uses the same underlying connection, such as
+        for an in-memory SQLite database.
+
+    The time spent waiting to acquire the lock is recorded
+    and can be retrieved via the :meth:`get_statistics` method.
+    """
+
+    NONE = 'none'
+    WRITE = 'write'
+    ALL = 'all'
+
+    modes = (NONE, WRITE, ALL)
+
+    def __init__(self, mode, slow_wait=1.0):
+        """
+        Construct lock object.
+
+        :param mode: the locking mode (see above).
+        :param slow_wait: wait time (seconds) above which a debugging
+            message is logged.
+        """
+
+        if mode not in self.modes:
+            raise FormattedError('unknown transaction lock mode "{}"', mode)
+
+        self.mode = mode
+        self.slow_wait = slow_wait
+
+        self._lock = Lock()
+        self._stats_lock = Lock()
+
+        self._acquired = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @contextmanager
+    def shared(self):
+        """
+        Context manager for a shared (read-only) transaction.
+        """
+
+        if self.mode == self.ALL:
+            with self._acquire():
+                yield
+
+        else:
+            yield
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Context manager for an exclusive (read-write) transaction.
+        """
+
+        if self.mode == self.NONE:
+            yield
+
+        else:
+            with self._acquire():
+                yield
+
+    @contextmanager
+    def _acquire(self):
+        """
+        Acquire the underlying lock, recording the time spent waiting.
+        """
+
+        start = time()
+        self._lock.acquire()
+
+        try:
+            wait = time() - start
+
+            with self._stats_lock:
+                self._acquired += 1
+                self._wait_total += wait
+                if wait > self._wait_max:
+                    self._wait_max = wait
+
+            if wait > self.slow_wait:
+                logger.debug('Waited {:.3f}s for transaction lock', wait)
+
+            yield
+
+        finally:
+            self._lock.release()
+
+    def get_statistics(self, reset=False):
+        """
+        Get lock acquisition statistics.
+
+        :param reset: if true, clear the statistics after reading them.
+
+        :return: a `TransactionLockStatistics` tuple giving the number of
+            times the lock has been acquired and the total and maximum
+            wait times (seconds).
+        """
+
+        with self._stats_lock:
+            stats = TransactionLockStatistics(
+                self._acquired, self._wait_total, self._wait_max)
+
+            if reset:
+                self._acquired = 0
+                self._wait_total = 0.0
+                self._wait_max = 0.0
+
+        return stats
@@ -21,8 +21,8 @@ from __future__ import absolute_import, division, print_function, \
 from sqlalchemy.schema import Column, ForeignKey, Index, MetaData, \
     PrimaryKeyConstraint, Table, UniqueConstraint
 
-from sqlalchemy.types import Boolean, DateTime, Float, Integer, \
-    LargeBinary, String, Unicode, UnicodeText
+from sqlalchemy.types import BigInteger, Boolean, DateTime, Float, \
+    Integer, LargeBinary, String, Unicode, UnicodeText
 
 from .type import JSONEncoded
 
@@ -134,6 +134,15 @@ call = Table(
     UniqueConstraint('semester_id', 'queue_id', 'type'),
     **table_opts)
 
+call_clash = Table(
+    'call_clash',
+    metadata,
+    Column('call_id', None,
+           ForeignKey('call.id', onupdate='RESTRICT', ondelete='RESTRICT'),
+           primary_key=True),
+    Column('date', DateTime(), nullable=False),
+    **table_opts)
+
 call_preamble = Table(
     'call_preamble',
     metadata,
@@ -294,6 +303,8 @@ message = Table(
     Column('discard', Boolean, nullable=False, default=False),
     Column('thread_type', Integer, default=None),
     Column('thread_id', Integer, default=None),
+    Column('state', Integer, nullable=False),
+    Index('idx_message_state', 'state', 'id'),
     **table_opts)
 
 message_recipient = Table(
@@ -345,7 +356,8 @@ moc_fits = Table(
     Column('moc_id', None,
            ForeignKey('moc.id', onupdate='RESTRICT', ondelete='CASCADE'),
            primary_key=True, nullable=False),
-    Column('fits', LargeBinary(2**32 - 1), nullable=False),
+    Column('fits', LargeBinary(2**32 - 1), nullable=True),
+    Column('store_key', String(40), nullable=True),
     **table_opts)
 
 person = Table(
@@ -449,7 +461,8 @@ proposal_fig = Table(
     Column('role', Integer, nullable=False),
     Column('type', Integer, nullable=False),
     Column('state', Integer, nullable=False, index=True),
-    Column('figure', LargeBinary(2**24 - 1), nullable=False),
+    Column('figure', LargeBinary(2**24 - 1), nullable=True),
+    Column('store_key', String(40), nullable=True),
     Column('md5sum', String(40), nullable=False),
     Column('filename', Unicode(255), nullable=False),
     Column('uploaded', DateTime(), nullable=False),
@@ -466,7 +479,8 @@ proposal_fig_preview = Table(
            ForeignKey('proposal_fig.id',
                       onupdate='RESTRICT', ondelete='CASCADE'),
            primary_key=True, nullable=False),
-    Column('preview', LargeBinary(2**24 - 1), nullable=False),
+    Column('preview', LargeBinary(2**24 - 1), nullable=True),
+    Column('store_key', String(40), nullable=True),
     **table_opts)
 
 proposal_fig_thumbnail = Table(
@@ -476,7 +490,8 @@ proposal_fig_thumbnail = Table(
            ForeignKey('proposal_fig.id',
                       onupdate='RESTRICT', ondelete='CASCADE'),
            primary_key=True, nullable=False),
-    Column('thumbnail', LargeBinary(2**24 - 1), nullable=False),
+    Column('thumbnail', LargeBinary(2**24 - 1), nullable=True),
+    Column('store_key', String(40), nullable=True),
     **table_opts)
 
 proposal_pdf = Table(
@@ -487,7 +502,8 @@ proposal_pdf = Table(
            ForeignKey('proposal.id', onupdate='RESTRICT', ondelete='RESTRICT'),
            nullable=False),
     Column('role', Integer, nullable=False),
-    Column('pdf', LargeBinary(2**32 - 1), nullable=False),
+    Column('pdf', LargeBinary(2**32 - 1), nullable=True),
+    Column('store_key', String(40), nullable=True),
     Column('md5sum', String(40), nullable=False),
     Column('state', Integer, nullable=False, index=True),
     Column('pages', Integer, nullable=False),
@@ -508,7 +524,8 @@ proposal_pdf_preview = Table(
                       onupdate='RESTRICT', ondelete='CASCADE'),
            nullable=False),
     Column('page', Integer, nullable=False),
-    Column('preview', LargeBinary(2**24 - 1), nullable=False),
+    Column('preview', LargeBinary(2**24 - 1), nullable=True),
+    Column('store_key', String(40), nullable=True),
     Index('idx_pdf_id_page', 'pdf_id', 'page', unique=True),
     **table_opts)
 
@@ -601,6 +618,28 @@ target = Table(
     Column('priority', Integer, nullable=True),
     **table_opts)
 
+target_cell = Table(
+    'target_cell',
+    metadata,
+    Column('target_id', None,
+           ForeignKey('target.id', onupdate='RESTRICT', ondelete='CASCADE'),
+           primary_key=True),
+    Column('cell', BigInteger, nullable=False, index=True),
+    **table_opts)
+
+target_clash = Table(
+    'target_clash',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('target_id', None,
+           ForeignKey('target.id', onupdate='RESTRICT', ondelete='CASCADE'),
+           nullable=False),
+    Column('moc_id', None,
+           ForeignKey('moc.id', onupdate='RESTRICT', ondelete='CASCADE'),
+           nullable=False),
+    UniqueConstraint('target_id', 'moc_id'),
+    **table_opts)
+
 user = Table(
     'user',
     metadata,
@@ -608,6 +647,7 @@ user = Table(
     Column('name', Unicode(255), unique=True, nullable=False),
     Column('password', String(255)),
     Column('salt', String(255)),
+    Column('password_rounds', Integer, nullable=True),
     **table_opts)
 
 user_log = Table(
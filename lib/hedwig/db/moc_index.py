@@ -0,0 +1,240 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from time import time
+
+import numpy as np
+
+from ..type.collection import ResultCollection
+
+MOCIndexEntry = namedtuple(
+    'MOCIndexEntry',
+    ('signature', 'index', 'checked'))
+
+
+class MOCIndex(object):
+    """
+    In-memory index of the coverage of a set of MOCs.
+
+    The cells of each MOC (up to the order of the index) are converted
+    to ranges of cells at the order of the index.  Overlapping and adjacent
+    ranges are merged and the result is stored as a pair of sorted NumPy
+    arrays of range start and end (exclusive) values.  Cells can then
+    be located by binary search.
+
+    Cells of MOCs at orders higher than that of the index are ignored,
+    matching the behavior of
+    :meth:`~hedwig.db.part.calculator.CalculatorPart.search_moc_cell`.
+
+    :param order: the order of the cells which will be searched for.
+    """
+
+    def __init__(self, order):
+        self.order = order
+        self.n_cell = 0
+        self.n_range = 0
+
+        self._mocs = []
+
+    def add(self, moc_info, cells):
+        """
+        Add a MOC to the index.
+
+        MOCs should be added in order of identifier.
+
+        :param moc_info: `MOCInfo` tuple describing the MOC.
+        :param cells: dictionary of cell numbers by order.
+        """
+
+        starts = []
+        ends = []
+
+        for (order, order_cells) in cells.items():
+            if order > self.order:
+                continue
+
+            shift = 2 * (self.order - order)
+            order_cells = np.array(list(order_cells), dtype=np.int64)
+
+            starts.append(order_cells << shift)
+            ends.append((order_cells + 1) << shift)
+
+            self.n_cell += len(order_cells)
+
+        if not starts:
+            return
+
+        starts = np.concatenate(starts)
+        ends = np.concatenate(ends)
+
+        sort = np.argsort(starts, kind='mergesort')
+        starts = starts[sort]
+        ends = np.maximum.accumulate(ends[sort])
+
+        # A new range begins wherever there is a gap after the ranges
+        # so far.  Each merged range ends at the (cumulative maximum)
+        # end value of the last range before the next gap.
+        new = np.concatenate(([True], starts[1:] > ends[:-1]))
+        (new_index,) = np.nonzero(new)
+        last_index = np.concatenate((new_index[1:] - 1, [len(starts) - 1]))
+
+        starts = starts[new_index]
+        ends = ends[last_index]
+
+        self._mocs.append((moc_info, starts, ends))
+        self.n_range += len(starts)
+
+    def search(self, public, cells):
+        """
+        Search for MOCs containing each of the given cells.
+
+        :param public: "public" constraint
+        :param cells: iterable of cell numbers at the order of the index
+
+        :return: dictionary by cell number of `ResultCollection`
+            objects of `MOCInfo` tuples, sorted by MOC identifier
+            (as for
+            :meth:`~hedwig.db.part.calculator.CalculatorPart.search_moc_cells`)
+        """
+
+        cells = np.unique(np.array(list(cells), dtype=np.int64))
+
+        ans = {int(x): ResultCollection() for x in cells}
+
+        if not len(cells):
+            return ans
+
+        for (moc_info, starts, ends) in self._mocs:
+            if public is not None and bool(moc_info.public) != bool(public):
+                continue
+
+            index = np.searchsorted(starts, cells, side='right') - 1
+            found = (index >= 0) & (cells < ends[np.maximum(index, 0)])
+
+            for cell in cells[found]:
+                ans[int(cell)][moc_info.id] = moc_info
+
+        return ans
+
+
+class MOCIndexCache(object):
+    """
+    Cache of MOC coverage indexes.
+
+    Indexes are stored by key (facility identifier and order)
+    along with a signature describing the MOCs which they contain.
+    Entries are considered valid for `check_interval` seconds, after
+    which the signature should be checked again.  This allows the
+    cache to notice changes made by other processes.
+
+    The total number of MOC cells from which the cached indexes were built
+    is kept below `max_cells` by discarding the least-recently used entries.
+    (The number of ranges stored, and hence the memory used, can not exceed
+    the number of cells.)
+    """
+
+    def __init__(self, max_cells=1000000, check_interval=60):
+        self.max_cells = max_cells
+        self.check_interval = check_interval
+
+        self._lock = Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+
+    def get(self, key):
+        """
+        Get a cache entry.
+
+        :return: a tuple `(entry, valid)` where the entry is a
+            `MOCIndexEntry` (or `None` if there is no entry)
+            and `valid` indicates whether the entry was checked within the
+            check interval.
+        """
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+            if entry is None:
+                return (None, False)
+
+            self._entries[key] = entry
+
+            return (entry, (time() - entry.checked) < self.check_interval)
+
+    def get_generation(self):
+        """
+        Get the current cache generation.
+
+        This should be read before building an index so that
+        it can be passed to :meth:`put`.
+        """
+
+        with self._lock:
+            return self._generation
+
+    def put(self, key, signature, index, generation):
+        """
+        Store an index in the cache.
+
+        The index is not stored if the cache has been invalidated since
+        the given generation was read, because it may have been built from
+        data which were being changed at the time.
+
+        :param index: the index, or `None` to record that the index
+            for this signature was too large to be cached.
+        """
+
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._entries.pop(key, None)
+
+            if index is not None:
+                n_cell = index.n_cell
+
+                if n_cell > self.max_cells:
+                    index = None
+
+                else:
+                    # Discard least-recently used entries until there
+                    # is room for the new index.
+                    for other_key in list(self._entries.keys()):
+                        if n_cell + self._count_cells() <= self.max_cells:
+                            break
+
+                        del self._entries[other_key]
+
+            self._entries[key] = MOCIndexEntry(signature, index, time())
+
+    def invalidate(self):
+        """
+        Discard all cache entries.
+        """
+
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def _count_cells(self):
+        return sum(x.index.n_cell for x in self._entries.values()
+                   if x.index is not None)
@@ -23,17 +23,19 @@ from time import sleep
 
 from pymoc import MOC
 from sqlalchemy.sql import select
-from sqlalchemy.sql.expression import and_, not_, or_
+from sqlalchemy.sql.expression import and_, bindparam, not_, or_
 from sqlalchemy.sql.functions import coalesce
 from sqlalchemy.sql.functions import max as max_
 
-from ...error import ConsistencyError, Error, UserError
+from ...error import ConsistencyError, Error, NoSuchRecord, UserError
 from ...file.moc import write_moc
 from ...type.collection import CalculationCollection, ResultCollection
 from ...type.enum import AttachmentState, FormatType
-from ...type.simple import Calculation, MOCInfo
+from ...type.simple import Calculation, CallClash, MOCInfo, TargetClashInfo
 from ...util import is_list_like, list_in_blocks
-from ..meta import calculator, calculation, facility, moc, moc_cell, moc_fits
+from ..meta import calculator, calculation, call_clash, facility, \
+    moc, moc_cell, moc_fits, proposal, target, target_clash
+from ..moc_index import MOCIndex
 from ..util import require_not_none
 
 
@@ -65,6 +67,9 @@ class CalculatorPart(object):
         if not FormatType.is_valid(description_format, is_system=True):
             raise UserError('Text format not recognised.')
 
+        fits_values = self._get_attachment_values(
+            moc_fits.c.fits, write_moc(moc_object))
+
         with self._transaction() as conn:
             result = conn.execute(moc.insert().values({
                 moc.c.facility_id: facility_id,
@@ -80,10 +85,9 @@ class CalculatorPart(object):
 
             moc_id = result.inserted_primary_key[0]
 
-            conn.execute(moc_fits.insert().values({
-                moc_fits.c.moc_id: moc_id,
-                moc_fits.c.fits: write_moc(moc_object),
-            }))
+            fits_values[moc_fits.c.moc_id] = moc_id
+
+            conn.execute(moc_fits.insert().values(fits_values))
 
         return moc_id
 
@@ -101,6 +105,8 @@ class CalculatorPart(object):
                 raise ConsistencyError(
                     'no rows matched deleting moc with id={}', moc_id)
 
+        self._moc_index.invalidate()
+
     def ensure_calculator(self, facility_id, code):
         """
         Ensure that a calculator exists in the database.
@@ -131,10 +137,84 @@ class CalculatorPart(object):
         return self.search_calculation(calculation_id=id_).get_single()
 
     @require_not_none
-    def get_moc_fits(self, moc_id):
+    def get_moc_fits(self, moc_id, stream=False):
+        """
+        Get the FITS representation of a MOC.
+
+        If `stream` is specified, the data are returned
+        as a :class:`~hedwig.type.misc.FileStream` object rather
+        than being read immediately.  The stream's modification
+        time is the MOC's upload time.
+        """
+
+        if stream:
+            with self._transaction() as conn:
+                row = conn.execute(select([
+                    moc_fits.c.store_key,
+                    moc.c.uploaded,
+                ]).select_from(moc_fits.join(moc)).where(
+                    moc_fits.c.moc_id == moc_id)).first()
+
+            if row is None:
+                raise NoSuchRecord('MOC FITS file does not exist')
+
+            return self._get_blob_stream(
+                moc_fits.c.fits, moc_fits.c.moc_id == moc_id,
+                last_modified=row['uploaded'], store_key=row['store_key'])
+
         with self._transaction() as conn:
-            return conn.execute(select([moc_fits.c.fits]).where(
-                moc_fits.c.moc_id == moc_id)).scalar()
+            row = conn.execute(select([
+                moc_fits.c.fits, moc_fits.c.store_key]).where(
+                    moc_fits.c.moc_id == moc_id)).first()
+
+        if row is None:
+            return None
+
+        return self._get_attachment(row['fits'], row['store_key'])
+
+    def get_moc_index(self, facility_id, order):
+        """
+        Get an in-memory coverage index of the MOCs for a facility.
+
+        Indexes are cached, and are discarded when this database
+        object is used to alter a MOC.  After the cache's check
+        interval has elapsed, the MOC records are compared to those
+        from which the index was built, so that changes made by other
+        processes are noticed.
+
+        :param facility_id: facility identifier
+        :param order: order of the cells which will be searched for
+
+        :return: a :class:`~hedwig.db.moc_index.MOCIndex` object,
+            or `None` if the MOCs are too large to be indexed, in which
+            case :meth:`search_moc_cells` should be used instead.
+        """
+
+        cache = self._moc_index
+
+        if not cache.max_cells:
+            return None
+
+        key = (facility_id, order)
+
+        (entry, valid) = cache.get(key)
+
+        if entry is not None and valid:
+            return entry.index
+
+        generation = cache.get_generation()
+
+        signature = tuple(self.search_moc(facility_id, None).values())
+
+        if entry is not None and entry.signature == signature:
+            index = entry.index
+
+        else:
+            index = self._get_moc_index(facility_id, order, cache.max_cells)
+
+        cache.put(key, signature, index, generation)
+
+        return index
 
     def search_calculation(self, calculation_id=None, proposal_id=None):
         stmt = calculation.select()
@@ -147,13 +227,39 @@ class CalculatorPart(object):
 
         ans = CalculationCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(
                     stmt.order_by(calculation.c.sort_order.asc())):
                 ans[row['id']] = Calculation(**row)
 
         return ans
 
+    def search_call_clash(self, call_id=None):
+        """
+        Search for records of calls for which the targets have been
+        checked against the facility's coverage maps (MOCs).
+
+        :param call_id: call identifier, or list of identifiers
+
+        :return: `ResultCollection` of `CallClash` tuples by call identifier
+        """
+
+        stmt = call_clash.select()
+
+        if call_id is not None:
+            if is_list_like(call_id):
+                stmt = stmt.where(call_clash.c.call_id.in_(call_id))
+            else:
+                stmt = stmt.where(call_clash.c.call_id == call_id)
+
+        ans = ResultCollection()
+
+        with self._read_transaction() as conn:
+            for row in conn.execute(stmt.order_by(call_clash.c.call_id)):
+                ans[row['call_id']] = CallClash(**row)
+
+        return ans
+
     def search_moc(self, facility_id, public, moc_id=None, state=None,
                    with_description=False, order_by_date=False):
         """
@@ -205,7 +311,7 @@ class CalculatorPart(object):
 
         ans = ResultCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(stmt):
                 values = default.copy()
                 values.update(**row)
@@ -241,7 +347,7 @@ class CalculatorPart(object):
 
         ans = ResultCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(stmt):
                 ans[row['id']] = MOCInfo(description=None,
                                          description_format=None,
@@ -251,6 +357,185 @@ class CalculatorPart(object):
 
         return ans
 
+    def search_moc_cells(self, facility_id, public, order, cells,
+                         block_size=500):
+        """
+        Search for MOCs containing each of a number of cells, or cells
+        at a lower order containing them.
+
+        This gives the same results as calling :meth:`search_moc_cell`
+        for each cell, but uses a small number of set-based queries.  The
+        orders at which the facility's MOCs have cells are determined
+        first, and then the corresponding parent cells of all of the given
+        cells are searched for at each of these orders.
+
+        :param facility_id: facility identifier
+        :param public: "public" constraint
+        :param order: order of the cells being searched for
+        :param cells: iterable of cell numbers
+        :param block_size: maximum number of cells to search for in
+            each query
+
+        :return: dictionary by cell number of `ResultCollection`
+            objects of `MOCInfo` tuples, sorted by MOC identifier
+        """
+
+        cells = set(int(x) for x in cells)
+
+        stmt = select([
+            moc.c.id,
+            moc.c.facility_id,
+            moc.c.name,
+            moc.c.public,
+            moc_cell.c.cell,
+        ]).select_from(moc.join(moc_cell)).where(
+            moc.c.facility_id == facility_id)
+
+        stmt_order = select([moc_cell.c.order]).distinct().select_from(
+            moc.join(moc_cell)).where(and_(
+                moc.c.facility_id == facility_id,
+                moc_cell.c.order <= order))
+
+        if public is not None:
+            if public:
+                stmt = stmt.where(moc.c.public)
+                stmt_order = stmt_order.where(moc.c.public)
+            else:
+                stmt = stmt.where(not_(moc.c.public))
+                stmt_order = stmt_order.where(not_(moc.c.public))
+
+        moc_info = {}
+        cell_moc_ids = {}
+
+        with self._read_transaction() as conn:
+            cell_orders = [row[0] for row in conn.execute(stmt_order)]
+
+            for cell_order in cell_orders:
+                shift = 2 * (order - cell_order)
+                parent_cells = sorted(set(x >> shift for x in cells))
+
+                for iter_stmt in self._iter_stmt(
+                        stmt.where(moc_cell.c.order == cell_order),
+                        moc_cell.c.cell, parent_cells,
+                        block_size=block_size):
+                    for row in conn.execute(iter_stmt):
+                        moc_id = row['id']
+
+                        if moc_id not in moc_info:
+                            moc_info[moc_id] = MOCInfo(
+                                id=moc_id, facility_id=row['facility_id'],
+                                name=row['name'], public=row['public'],
+                                description=None, description_format=None,
+                                uploaded=None, num_cells=None, area=None,
+                                state=None)
+
+                        cell_moc_ids.setdefault(
+                            (cell_order, row['cell']), set()).add(moc_id)
+
+        ans = {}
+
+        for cell in cells:
+            moc_ids = set()
+
+            for cell_order in cell_orders:
+                moc_ids.update(cell_moc_ids.get(
+                    (cell_order, cell >> (2 * (order - cell_order))), ()))
+
+            ans[cell] = ResultCollection(
+                (x, moc_info[x]) for x in sorted(moc_ids))
+
+        return ans
+
+    def search_target_clash(self, call_id=None, proposal_id=None,
+                            public=None):
+        """
+        Search for stored clashes between proposal targets and
+        coverage maps (MOCs), as recorded by :meth:`sync_call_target_clash`.
+
+        :param call_id: call identifier
+        :param proposal_id: proposal identifier
+        :param public: "public" constraint for the MOCs
+
+        :return: `ResultCollection` of `TargetClashInfo` tuples,
+            ordered by proposal, target and MOC
+        """
+
+        select_from = target_clash.join(target).join(moc)
+
+        if call_id is not None:
+            select_from = select_from.join(proposal)
+
+        stmt = select([
+            target_clash,
+            target.c.proposal_id,
+            target.c.name.label('target_name'),
+            moc.c.name.label('moc_name'),
+            moc.c.public.label('moc_public'),
+        ]).select_from(select_from)
+
+        if call_id is not None:
+            stmt = stmt.where(proposal.c.call_id == call_id)
+
+        if proposal_id is not None:
+            stmt = stmt.where(target.c.proposal_id == proposal_id)
+
+        if public is not None:
+            if public:
+                stmt = stmt.where(moc.c.public)
+            else:
+                stmt = stmt.where(not_(moc.c.public))
+
+        ans = ResultCollection()
+
+        with self._read_transaction() as conn:
+            for row in conn.execute(stmt.order_by(
+                    target.c.proposal_id.asc(), target.c.sort_order.asc(),
+                    moc.c.id.asc())):
+                ans[row['id']] = TargetClashInfo(**row)
+
+        return ans
+
+    def sync_call_target_clash(self, call_id, clashes):
+        """
+        Store the results of checking the targets of a call's proposals
+        against the facility's coverage maps (MOCs).
+
+        Any previously stored clashes for targets of the call are
+        replaced, and the date of the check is recorded.
+
+        :param call_id: call identifier
+        :param clashes: dictionary of lists of MOC identifiers by target
+            identifier, for the targets which clash
+
+        :return: the number of target clash records stored
+        """
+
+        records = [
+            {'target_id': target_id, 'moc_id': moc_id}
+            for (target_id, moc_ids) in sorted(clashes.items())
+            for moc_id in moc_ids]
+
+        with self._transaction() as conn:
+            conn.execute(target_clash.delete().where(
+                target_clash.c.target_id.in_(
+                    select([target.c.id]).select_from(
+                        target.join(proposal)).where(
+                        proposal.c.call_id == call_id))))
+
+            if records:
+                conn.execute(target_clash.insert(), records)
+
+            values = {call_clash.c.date: datetime.utcnow()}
+
+            result = conn.execute(call_clash.update().where(
+                call_clash.c.call_id == call_id).values(values))
+
+            if result.rowcount == 0:
+                values[call_clash.c.call_id] = call_id
+                conn.execute(call_clash.insert().values(values))
+
+        return len(records)
+
     def sync_proposal_calculation(self, proposal_id, records):
         """
         Update the calculations for a proposal.
@@ -326,6 +611,10 @@ class CalculatorPart(object):
         if not values:
             raise Error('No moc updates specified')
 
+        if moc_object is not None:
+            fits_values = self._get_attachment_values(
+                moc_fits.c.fits, write_moc(moc_object))
+
         with self._transaction() as conn:
             result = conn.execute(stmt.values(values))
 
@@ -336,10 +625,12 @@ class CalculatorPart(object):
             if moc_object is not None:
                 conn.execute(moc_fits.update().where(
                     moc_fits.c.moc_id == moc_id
-                ).values({moc_fits.c.fits: write_moc(moc_object)}))
+                ).values(fits_values))
+
+        self._moc_index.invalidate()
 
     def update_moc_cell(self, moc_id, moc_object,
-                        block_size=1000, block_pause=1):
+                        block_size=10000, block_pause=0.1):
         """
         Update the moc_cell database table.
 
@@ -353,6 +644,11 @@ class CalculatorPart(object):
         cells inserted.  Otherwise removed cells are deleted individually
         and newly added cells inserted.
 
+        Cells are deleted and inserted in blocks of up to `block_size`
+        cells, with each block being handled by a single "executemany"
+        call in its own transaction.  The method pauses for `block_pause`
+        seconds before each block to allow other transactions to proceed.
+
         For debugging purposes, this method returns a dictionary indicating
         the action taken for each order.
         """
@@ -424,25 +720,78 @@ class CalculatorPart(object):
                 for delete_block in list_in_blocks(delete, block_size):
                     sleep(block_pause)
                     with self._transaction() as conn:
-                        for cell in delete_block:
-                            conn.execute(moc_cell.delete().where(and_(
-                                moc_cell.c.moc_id == moc_id,
-                                moc_cell.c.order == order,
-                                moc_cell.c.cell == cell)))
+                        conn.execute(moc_cell.delete().where(and_(
+                            moc_cell.c.moc_id == moc_id,
+                            moc_cell.c.order == order,
+                            moc_cell.c.cell == bindparam('b_cell'))), [
+                                {'b_cell': cell} for cell in delete_block])
 
             if insert is not None:
                 for insert_block in list_in_blocks(insert, block_size):
                     sleep(block_pause)
                     with self._transaction() as conn:
-                        for cell in insert_block:
-                            conn.execute(moc_cell.insert().values({
-                                moc_cell.c.moc_id: moc_id,
-                                moc_cell.c.order: order,
-                                moc_cell.c.cell: cell,
-                            }))
+                        conn.execute(moc_cell.insert(), [
+                            {
+                                'moc_id': moc_id,
+                                'order': order,
+                                'cell': cell,
+                            } for cell in insert_block])
+
+        self._moc_index.invalidate()
 
         return debug_info
 
+    def _get_moc_index(self, facility_id, order, max_cells):
+        """
+        Construct a coverage index from the moc_cell database table.
+
+        :return: a :class:`~hedwig.db.moc_index.MOCIndex` object, or `None`
+            if there are more than `max_cells` cells.
+        """
+
+        index = MOCIndex(order)
+
+        stmt = select([
+            moc.c.id,
+            moc.c.facility_id,
+            moc.c.name,
+            moc.c.public,
+            moc_cell.c.order,
+            moc_cell.c.cell,
+        ]).select_from(moc.join(moc_cell)).where(and_(
+            moc.c.facility_id == facility_id,
+            moc_cell.c.order <= order,
+        )).order_by(moc.c.id.asc())
+
+        n_cell = 0
+        moc_info = None
+        cells = {}
+
+        with self._read_transaction() as conn:
+            for row in conn.execute(stmt):
+                n_cell += 1
+                if n_cell > max_cells:
+                    return None
+
+                if moc_info is None or moc_info.id != row['id']:
+                    if moc_info is not None:
+                        index.add(moc_info, cells)
+
+                    moc_info = MOCInfo(
+                        id=row['id'], facility_id=row['facility_id'],
+                        name=row['name'], public=row['public'],
+                        description=None, description_format=None,
+                        uploaded=None, num_cells=None, area=None,
+                        state=None)
+                    cells = {}
+
+                cells.setdefault(row['order'], []).append(row['cell'])
+
+        if moc_info is not None:
+            index.add(moc_info, cells)
+
+        return index
+
     def _get_moc_from_cell(self, moc_id, _conn=None):
         """
         Retrieve a MOC object from the moc_cell database table.
@@ -22,7 +22,7 @@ from datetime import datetime
 from itertools import izip_longest
 
 from sqlalchemy.sql import select
-from sqlalchemy.sql.expression import and_, case, column, not_
+from sqlalchemy.sql.expression import and_, bindparam, case, column, or_
 from sqlalchemy.sql.functions import coalesce
 
 from ...error import ConsistencyError, FormattedError, \
@@ -65,6 +65,7 @@ class MessagePart(object):
                 message.c.body: body,
                 message.c.thread_type: thread_type,
                 message.c.thread_id: thread_id,
+                message.c.state: MessageState.UNSENT,
             }))
 
             message_id = result.inserted_primary_key[0]
@@ -102,7 +103,7 @@ class MessagePart(object):
                 raise NoSuchRecord('message not found with id {}', message_id)
 
             ans = Message(recipients=recipients, thread_identifiers=None,
-                          state=None, **row)
+                          **row)
 
         return ans
 
@@ -115,47 +116,87 @@ class MessagePart(object):
         ConsistencyError if the column become non-null in the meantime.
         """
 
+        messages = self.get_unsent_messages(1, mark_sending=mark_sending)
+
+        if not messages:
+            return None
+
+        return messages[0]
+
+    def get_unsent_messages(self, limit, mark_sending=False):
+        """
+        Return a list of up to "limit" unsent messages, oldest first.
+
+        At most one message from each thread is included, since the
+        identifiers of earlier messages in a thread are required
+        when sending later messages.
+
+        Optionally, mark the messages as being sent by writing the current
+        timestamp into their "timestamp_send" column.  This raises
+        ConsistencyError if the column become non-null in the meantime
+        for any of the messages.
+        """
+
         with self._transaction() as conn:
-            result = conn.execute(message.select().where(and_(
-                not_(message.c.discard),
-                message.c.timestamp_send.is_(None),
-                message.c.timestamp_sent.is_(None)
-            )).order_by(
-                message.c.id.asc()
-            ).limit(1)).first()
+            rows = []
+            threads = set()
 
-            if result is None:
-                return None
+            for row in conn.execute(message.select().where(
+                    message.c.state == MessageState.UNSENT
+                    ).order_by(
+                        message.c.id.asc()
+                    ).limit(limit)):
+                thread_type = row['thread_type']
+                thread_id = row['thread_id']
 
-            message_id = result['id']
+                if (thread_type is not None) and (thread_id is not None):
+                    if (thread_type, thread_id) in threads:
+                        continue
 
-            # Find the identifiers for previous messages in the same thread,
+                    threads.add((thread_type, thread_id))
+
+                rows.append(row)
+
+            if not rows:
+                return []
+
+            message_ids = [x['id'] for x in rows]
+
+            # Find the identifiers for previous messages in the same threads,
             # oldest first.
-            thread_type = result['thread_type']
-            thread_id = result['thread_id']
-            thread_identifiers = []
-
-            if (thread_type is not None) and (thread_id is not None):
-                for row in conn.execute(select([
-                        message.c.identifier,
-                        ]).select_from(message).where(and_(
-                            message.c.thread_type == thread_type,
-                            message.c.thread_id == thread_id,
-                            message.c.id < message_id
-                        )).order_by(message.c.id.asc())):
-                    thread_identifiers.append(row['identifier'])
-
-            # Find the recipients of the message: perform an outer join
+            thread_identifiers = {}
+
+            if threads:
+                for iter_stmt in self._iter_stmt(
+                        select([
+                            message.c.id,
+                            message.c.thread_type,
+                            message.c.thread_id,
+                            message.c.identifier,
+                        ]).where(and_(
+                            message.c.thread_type.in_(
+                                set(x[0] for x in threads)),
+                            message.c.id < max(message_ids),
+                        )),
+                        message.c.thread_id, set(x[1] for x in threads)):
+                    for row in conn.execute(iter_stmt):
+                        thread_identifiers.setdefault(
+                            (row['thread_type'], row['thread_id']), []
+                        ).append((row['id'], row['identifier']))
+
+            # Find the recipients of the messages: perform an outer join
             # with the email table in case the address is not there -- in that
             # case assume the address is not public.
-            recipients = []
-
-            for row in conn.execute(select([
-                    message_recipient.c.person_id,
-                    person.c.name,
-                    coalesce(message_recipient.c.email_address,
-                             email.c.address).label('address'),
-                    coalesce(email.c.public, False).label('public'),
+            recipients = {}
+
+            for iter_stmt in self._iter_stmt(
+                    select([
+                        message_recipient.c.message_id,
+                        message_recipient.c.person_id,
+                        person.c.name,
+                        coalesce(message_recipient.c.email_address,
+                                 email.c.address).label('address'),
+                        coalesce(email.c.public, False).label('public'),
                     ]).select_from(
                         message_recipient.join(person).outerjoin(
                             email,
@@ -164,26 +205,42 @@ class MessagePart(object):
                                 message_recipient.c.email_address ==
                                 email.c.address)],
                                 else_=email.c.primary)
-                            ))
-                    ).where(
-                        message_recipient.c.message_id == message_id)):
-                recipients.append(MessageRecipient(**row))
+                            ))),
+                    message_recipient.c.message_id, message_ids):
+                for row in conn.execute(iter_stmt):
+                    values = dict(row.items())
+                    recipients.setdefault(
+                        values.pop('message_id'), []
+                    ).append(MessageRecipient(**values))
 
             if mark_sending:
                 mark_result = conn.execute(message.update().where(and_(
-                    message.c.id == message_id,
+                    message.c.id.in_(message_ids),
                     message.c.timestamp_send.is_(None),
                 )).values({
                     message.c.timestamp_send: datetime.utcnow(),
+                    message.c.state: self._expr_message_state_unless_discard(
+                        MessageState.SENDING),
                 }))
 
-                if mark_result.rowcount != 1:
+                if mark_result.rowcount != len(message_ids):
                     raise ConsistencyError(
                         'no rows matched marking message as sending')
 
-        return Message(
-            recipients=recipients, thread_identifiers=thread_identifiers,
-            state=None, **result)
+        ans = []
+
+        for row in rows:
+            message_id = row['id']
+
+            ans.append(Message(
+                recipients=recipients.get(message_id, []),
+                thread_identifiers=[
+                    x[1] for x in sorted(thread_identifiers.get(
+                        (row['thread_type'], row['thread_id']), []))
+                    if x[0] < message_id],
+                **row))
+
+        return ans
 
     def mark_message_sent(self, message_id, identifier,
                           _test_skip_check=False):
@@ -205,28 +262,69 @@ class MessagePart(object):
             )).values({
                 message.c.timestamp_sent: datetime.utcnow(),
                 message.c.identifier: identifier,
+                message.c.state: self._expr_message_state_unless_discard(
+                    MessageState.SENT),
             }))
 
             if result.rowcount != 1:
                 raise ConsistencyError(
                     'no rows matched marking message as sent')
 
+    def mark_messages_sent(self, identifiers):
+        """
+        Marks a number of messages as sent.
+
+        The messages are updated individually, within a single transaction,
+        so that a message which can not be marked (e.g. because it no
+        longer exists or was already marked as sent) does not prevent the
+        others from being marked.
+
+        :param identifiers: dictionary of email "Message-ID" header
+            values by message identifier.
+
+        :return: a list of the identifiers of any messages which
+            could not be marked as sent.
+        """
+
+        unmatched = []
+
+        if not identifiers:
+            return unmatched
+
+        stmt = message.update().where(and_(
+            message.c.id == bindparam('b_id'),
+            message.c.timestamp_sent.is_(None)
+        )).values({
+            message.c.timestamp_sent: datetime.utcnow(),
+            message.c.identifier: bindparam('b_identifier'),
+            message.c.state: self._expr_message_state_unless_discard(
+                MessageState.SENT),
+        })
+
+        with self._transaction() as conn:
+            for (message_id, identifier) in sorted(identifiers.items()):
+                result = conn.execute(
+                    stmt, b_id=message_id, b_identifier=identifier)
+
+                if result.rowcount != 1:
+                    unmatched.append(message_id)
+
+        return unmatched
+
     def search_message(self, person_id=None, state=None, message_id_lt=None,
-                       thread_type=None, thread_id=None,
-                       limit=None, oldest_first=False):
+                       message_id_gt=None, thread_type=None, thread_id=None,
+                       limit=None, oldest_first=False, read_replica=False):
         """
         Searches for messages.
 
         The selection of messages to be returned can be controlled with the
-        optional keyword arguments.
-        """
+        optional keyword arguments.  The "message_id_lt" and "message_id_gt"
+        arguments can be used, along with "limit", to retrieve the pages
+        of messages before or after a given message.
 
-        state_expr = case([
-            (message.c.discard, MessageState.DISCARD),
-            (and_(message.c.timestamp_send.is_(None),
-                  message.c.timestamp_sent.is_(None)), MessageState.UNSENT),
-            (message.c.timestamp_sent.is_(None), MessageState.SENDING),
-        ], else_=MessageState.SENT)
+        If "read_replica" is specified, the search may be performed
+        on a read replica of the database, if one is configured.
+        """
 
         stmt = select([
             message.c.id,
@@ -238,7 +336,7 @@ class MessagePart(object):
             message.c.discard,
             message.c.thread_type,
             message.c.thread_id,
-            state_expr.label('state'),
+            message.c.state,
         ])
 
         if person_id is not None:
@@ -246,11 +344,14 @@ class MessagePart(object):
                 message_recipient.c.person_id == person_id)
 
         if state is not None:
-            stmt = stmt.where(state_expr == state)
+            stmt = stmt.where(message.c.state == state)
 
         if message_id_lt is not None:
             stmt = stmt.where(message.c.id < message_id_lt)
 
+        if message_id_gt is not None:
+            stmt = stmt.where(message.c.id > message_id_gt)
+
         if thread_type is not None:
             stmt = stmt.where(message.c.thread_type == thread_type)
 
@@ -270,7 +371,7 @@ class MessagePart(object):
         else:
             stmt = stmt.order_by(message.c.id.desc())
 
-        with self._transaction() as conn:
+        with self._read_transaction(read_replica=read_replica) as conn:
             for row in conn.execute(stmt):
                 ans[row['id']] = Message(body=None, recipients=None,
                                          thread_identifiers=None, **row)
@@ -291,11 +392,13 @@ class MessagePart(object):
                     'timestamp_send': None,
                     'timestamp_sent': None,
                     'discard': False,
+                    'state': MessageState.UNSENT,
                 })
 
             elif state == MessageState.DISCARD:
                 values.update({
                     'discard': True,
+                    'state': MessageState.DISCARD,
                 })
 
             else:
@@ -318,3 +421,42 @@ class MessagePart(object):
             if result.rowcount != 1:
                 raise ConsistencyError(
                     'no rows matched updating message with id={}', message_id)
+
+    def update_message_state(self):
+        """
+        Recompute the stored state of all messages.
+
+        This is only necessary for messages created before the `state`
+        column was introduced, since the state is normally kept up to date
+        by the other message methods.  The state is determined from
+        the discard flag and the send and sent timestamps.
+
+        :return: the number of messages whose state was changed
+        """
+
+        state_expr = case([
+            (message.c.discard, MessageState.DISCARD),
+            (and_(message.c.timestamp_send.is_(None),
+                  message.c.timestamp_sent.is_(None)), MessageState.UNSENT),
+            (message.c.timestamp_sent.is_(None), MessageState.SENDING),
+        ], else_=MessageState.SENT)
+
+        with self._transaction() as conn:
+            result = conn.execute(message.update().where(or_(
+                message.c.state.is_(None),
+                message.c.state != state_expr
+            )).values({
+                message.c.state: state_expr,
+            }))
+
+        return result.rowcount
+
+    def _expr_message_state_unless_discard(self, state):
+        """
+        Expression for the new state of a message being marked as
+        sending or sent, which leaves discarded messages unchanged.
+        """
+
+        return case([
+            (message.c.discard, MessageState.DISCARD),
+        ], else_=state)
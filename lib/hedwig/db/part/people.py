@@ -19,14 +19,14 @@ from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
 from datetime import datetime, timedelta
-from time import sleep
 
 from sqlalchemy.sql import select
 from sqlalchemy.sql.expression import and_, not_
 from sqlalchemy.sql.functions import count
 
-from ... import auth
-from ...auth import check_password_hash, create_password_hash, generate_token
+from ...auth import check_password_dummy, check_password_hash, \
+    create_password_hash, generate_token, get_password_rounds, \
+    is_password_hash_current
 from ...error import ConsistencyError, DatabaseIntegrityError, \
     Error, NoSuchRecord, UserError
 from ...type.collection import EmailCollection, ResultCollection
@@ -183,7 +183,9 @@ class PeoplePart(object):
         if not password_raw:
             raise UserError('The password can not be blank.')
 
-        (password_hash, password_salt) = create_password_hash(password_raw)
+        password_rounds = get_password_rounds()
+        (password_hash, password_salt) = create_password_hash(
+            password_raw, rounds=password_rounds)
 
         with self._transaction() as conn:
             if not _test_skip_check and self._exists_user_name(conn, name):
@@ -194,6 +196,7 @@ class PeoplePart(object):
                 user.c.name: name,
                 user.c.password: password_hash,
                 user.c.salt: password_salt,
+                user.c.password_rounds: password_rounds,
             }))
 
             user_id = result.inserted_primary_key[0]
@@ -238,6 +241,10 @@ class PeoplePart(object):
 
         Attempts to protect against multiple authentication attempts, but only
         if "name" is given.  (I.e. not in user_id re-authentication mode.)
+
+        If the password hash was created with a number of rounds other
+        than the currently configured number, it is replaced after
+        successful authentication.
         """
 
         stmt = user.select()
@@ -277,16 +284,30 @@ class PeoplePart(object):
             if name is not None:
                 self._record_auth_failure(name)
 
-            # Spend time as if we were hashing the password so that the user
-            # can't tell that the user name doesn't exist by this function
-            # returning fast.
-            sleep(auth.password_hash_delay)
+            # Hash the password anyway so that the user can't tell that the
+            # user name doesn't exist by this function returning fast.
+            check_password_dummy(password_raw)
             return None
 
         else:
+            password_rounds = result[user.c.password_rounds]
+
             if check_password_hash(password_raw, result[user.c.password],
-                                   result[user.c.salt]):
-                return result[user.c.id]
+                                   result[user.c.salt],
+                                   rounds=password_rounds):
+                user_id = result[user.c.id]
+
+                if not is_password_hash_current(password_rounds):
+                    # Replacing the hash is not essential, so if it can
+                    # not be done now (e.g. because the hashing pool is
+                    # busy), leave it until the user next logs in.
+                    try:
+                        self.update_user_password(
+                            user_id, password_raw, _skip_log=True)
+                    except UserError:
+                        pass
+
+                return user_id
             else:
                 if name is not None:
                     self._record_auth_failure(name)
@@ -584,7 +605,7 @@ class PeoplePart(object):
 
         ans = EmailCollection()
 
-        with self._transaction(_conn=_conn) as conn:
+        with self._read_transaction(_conn=_conn) as conn:
             for row in conn.execute(stmt.order_by(email.c.id)):
                 ans[row['id']] = Email(**row)
 
@@ -658,7 +679,7 @@ class PeoplePart(object):
 
         ans = ResultCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(stmt):
                 values = default.copy()
                 values.update(**row)
@@ -679,9 +700,12 @@ class PeoplePart(object):
     def search_person(self, user_id=None, email_address=None,
                       registered=None, public=None, admin=None,
                       institution_id=None,
-                      with_institution=False):
+                      with_institution=False, read_replica=False):
         """
         Find person records.
+
+        If "read_replica" is specified, the search may be performed
+        on a read replica of the database, if one is configured.
         """
 
         if not with_institution:
@@ -736,7 +760,7 @@ class PeoplePart(object):
 
         ans = ResultCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction(read_replica=read_replica) as conn:
             for row in conn.execute(stmt.order_by(person.c.name)):
                 values = default.copy()
                 values.update(**row)
@@ -765,7 +789,7 @@ class PeoplePart(object):
 
         ans = ResultCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(stmt.order_by(user.c.name.asc())):
                 ans[row['id']] = UserInfo(**row)
 
@@ -780,7 +804,7 @@ class PeoplePart(object):
 
         ans = ResultCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(stmt.order_by(user_log.c.id.desc())):
                 ans[row['id']] = UserLog(**row)
 
@@ -1006,7 +1030,9 @@ class PeoplePart(object):
         if not password_raw:
             raise UserError('The password can not be blank.')
 
-        (password_hash, password_salt) = create_password_hash(password_raw)
+        password_rounds = get_password_rounds()
+        (password_hash, password_salt) = create_password_hash(
+            password_raw, rounds=password_rounds)
 
         with self._transaction(_conn=_conn) as conn:
             if (not _test_skip_check and
@@ -1019,6 +1045,7 @@ class PeoplePart(object):
             ).values({
                 user.c.password: password_hash,
                 user.c.salt: password_salt,
+                user.c.password_rounds: password_rounds,
             }))
 
             if result.rowcount != 1:
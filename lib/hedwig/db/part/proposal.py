@@ -26,8 +26,8 @@ from sqlalchemy.sql.expression import and_, case, column, not_
 from sqlalchemy.sql.functions import coalesce, count
 from sqlalchemy.sql.functions import max as max_
 
-from ...error import ConsistencyError, Error, FormattedError, \
-    MultipleRecords, NoSuchRecord, UserError
+from ...error import ConsistencyError, DatabaseIntegrityError, Error, \
+    FormattedError, MultipleRecords, NoSuchRecord, UserError
 from ...type.collection import AffiliationCollection, \
     CallCollection, CallPreambleCollection, MemberCollection, \
     PrevProposalCollection, ProposalCollection, ProposalCategoryCollection, \
@@ -52,7 +52,8 @@ from ..meta import affiliation, affiliation_weight, \
     proposal, proposal_category, \
     proposal_fig, proposal_fig_preview, proposal_fig_thumbnail, \
     proposal_pdf, proposal_pdf_preview, proposal_text, \
-    queue, review, reviewer, semester, target
+    queue, review, reviewer, semester, target, target_cell
+from ..target_index import TargetIndex, get_target_cells
 from ..util import require_not_none
 
 
@@ -235,6 +236,8 @@ class ProposalPart(object):
             # type.
             raise UserError('Uploaded figure appears to be empty.')
 
+        values = self._get_attachment_values(proposal_fig.c.figure, figure)
+
         with self._transaction() as conn:
             if (not _test_skip_check and
                     not self._exists_id(conn, proposal, proposal_id)):
@@ -247,7 +250,7 @@ class ProposalPart(object):
 
             fig_alias = proposal_fig.alias()
 
-            result = conn.execute(proposal_fig.insert().values({
+            values.update({
                 proposal_fig.c.proposal_id: proposal_id,
                 proposal_fig.c.sort_order: select(
                     [coalesce(max_(fig_alias.c.sort_order), 0) + 1]
@@ -255,13 +258,14 @@ class ProposalPart(object):
                 proposal_fig.c.role: role,
                 proposal_fig.c.type: type_,
                 proposal_fig.c.state: AttachmentState.NEW,
-                proposal_fig.c.figure: figure,
                 proposal_fig.c.md5sum: md5(figure).hexdigest(),
                 proposal_fig.c.caption: caption,
                 proposal_fig.c.filename: filename,
                 proposal_fig.c.uploaded: datetime.utcnow(),
                 proposal_fig.c.uploader: uploader_person_id,
-            }))
+            })
+
+            result = conn.execute(proposal_fig.insert().values(values))
 
         return result.inserted_primary_key[0]
 
@@ -527,17 +531,27 @@ class ProposalPart(object):
 
         return result['code']
 
-    def get_proposal_figure(self, proposal_id, role, id_, md5sum=None):
+    def get_proposal_figure(self, proposal_id, role, id_, md5sum=None,
+                            stream=False):
         """
         Get a figure associated with a proposal.
 
         Returned as a ProposalFigure object.
+
+        If `stream` is specified, the figure data are returned
+        as a :class:`~hedwig.type.misc.FileStream` object rather
+        than being read immediately.  The stream's entity tag is the
+        figure's MD5 sum and its modification time is the
+        upload time.
         """
 
-        stmt = select([
-            proposal_fig.c.figure,
+        stmt = select(([] if stream else [proposal_fig.c.figure]) + [
+            proposal_fig.c.id,
+            proposal_fig.c.md5sum,
             proposal_fig.c.type,
             proposal_fig.c.filename,
+            proposal_fig.c.uploaded,
+            proposal_fig.c.store_key,
         ])
 
         if proposal_id is not None:
@@ -560,26 +574,55 @@ class ProposalPart(object):
         if row is None:
             raise NoSuchRecord('figure does not exist')
 
-        return ProposalFigure(row['figure'], row['type'], row['filename'])
+        if stream:
+            data = self._get_blob_stream(
+                proposal_fig.c.figure,
+                and_(proposal_fig.c.id == row['id'],
+                     proposal_fig.c.md5sum == row['md5sum']),
+                etag=row['md5sum'], last_modified=row['uploaded'],
+                store_key=row['store_key'])
+        else:
+            data = self._get_attachment(row['figure'], row['store_key'])
+
+        return ProposalFigure(data, row['type'], row['filename'])
 
     def get_proposal_figure_preview(self, proposal_id, role, id_,
-                                    md5sum=None):
+                                    md5sum=None, stream=False):
         return self._get_proposal_figure_alternate(
             proposal_fig_preview.c.preview, proposal_id, role, id_,
-            md5sum)
+            md5sum, stream)
 
     def get_proposal_figure_thumbnail(self, proposal_id, role, id_,
-                                      md5sum=None):
+                                      md5sum=None, stream=False):
         return self._get_proposal_figure_alternate(
             proposal_fig_thumbnail.c.thumbnail, proposal_id, role, id_,
-            md5sum)
+            md5sum, stream)
 
     def _get_proposal_figure_alternate(self, column,
-                                       proposal_id, role, id_, md5sum):
-        stmt = select([column])
+                                       proposal_id, role, id_, md5sum,
+                                       stream=False):
+        """
+        Get a figure preview or thumbnail.
+
+        If `stream` is specified, the image is returned as a
+        :class:`~hedwig.type.misc.FileStream` object, with the
+        MD5 sum and upload time of the original figure as its entity tag
+        and modification time.
+        """
+
+        store_key = column.table.c.store_key
+
+        if stream:
+            stmt = select([
+                store_key,
+                proposal_fig.c.md5sum,
+                proposal_fig.c.uploaded,
+            ])
+        else:
+            stmt = select([column, store_key])
 
         if ((proposal_id is not None) or (role is not None) or
-                (md5sum is not None)):
+                (md5sum is not None) or stream):
             stmt = stmt.select_from(column.table.join(proposal_fig))
             if proposal_id is not None:
                 stmt = stmt.where(proposal_fig.c.proposal_id == proposal_id)
@@ -599,15 +642,35 @@ class ProposalPart(object):
         if row is None:
             raise NoSuchRecord('figure preview/thumbnail does not exist')
 
-        return row[0]
+        if stream:
+            return self._get_blob_stream(
+                column,
+                and_(column.table.c.fig_id == id_,
+                     proposal_fig.c.id == id_,
+                     proposal_fig.c.md5sum == row['md5sum']),
+                etag=row['md5sum'], last_modified=row['uploaded'],
+                store_key=row[store_key])
+
+        return self._get_attachment(row[column], row[store_key])
 
     def get_proposal_pdf(self, proposal_id, role, id_=None, md5sum=None,
-                         _conn=None):
+                         stream=False, _conn=None):
         """
         Get the given PDF associated with a proposal.
+
+        If `stream` is specified, the PDF data are returned
+        as a :class:`~hedwig.type.misc.FileStream` object rather
+        than being read immediately.  The stream's entity tag is the
+        PDF's MD5 sum and its modification time is the upload time.
         """
 
-        stmt = select([proposal_pdf.c.pdf, proposal_pdf.c.filename])
+        stmt = select(([] if stream else [proposal_pdf.c.pdf]) + [
+            proposal_pdf.c.id,
+            proposal_pdf.c.md5sum,
+            proposal_pdf.c.filename,
+            proposal_pdf.c.uploaded,
+            proposal_pdf.c.store_key,
+        ])
 
         if (proposal_id is not None) and (role is not None):
             stmt = stmt.where(and_(
@@ -631,14 +694,43 @@ class ProposalPart(object):
             raise NoSuchRecord('PDF does not exist for {} role {}',
                                proposal_id, role)
 
-        return ProposalFigure(row['pdf'], FigureType.PDF, row['filename'])
+        if stream:
+            data = self._get_blob_stream(
+                proposal_pdf.c.pdf,
+                and_(proposal_pdf.c.id == row['id'],
+                     proposal_pdf.c.md5sum == row['md5sum']),
+                etag=row['md5sum'], last_modified=row['uploaded'],
+                store_key=row['store_key'])
+        else:
+            data = self._get_attachment(row['pdf'], row['store_key'])
+
+        return ProposalFigure(data, FigureType.PDF, row['filename'])
 
-    def get_proposal_pdf_preview(self, proposal_id, role, page, md5sum=None):
+    def get_proposal_pdf_preview(self, proposal_id, role, page, md5sum=None,
+                                 stream=False):
         """
         Get a preview page from a PDF associated with a proposal.
+
+        If `stream` is specified, the image is returned as a
+        :class:`~hedwig.type.misc.FileStream` object, with the
+        MD5 sum and upload time of the PDF as its entity tag
+        and modification time.
         """
 
-        stmt = select([proposal_pdf_preview.c.preview]).select_from(
+        if stream:
+            stmt = select([
+                proposal_pdf_preview.c.id,
+                proposal_pdf_preview.c.store_key,
+                proposal_pdf.c.md5sum,
+                proposal_pdf.c.uploaded,
+            ])
+        else:
+            stmt = select([
+                proposal_pdf_preview.c.preview,
+                proposal_pdf_preview.c.store_key,
+            ])
+
+        stmt = stmt.select_from(
             proposal_pdf.join(proposal_pdf_preview)
         ).where(and_(
             proposal_pdf.c.proposal_id == proposal_id,
@@ -650,14 +742,25 @@ class ProposalPart(object):
             stmt = stmt.where(proposal_pdf.c.md5sum == md5sum)
 
         with self._transaction() as conn:
-            preview = conn.execute(stmt).scalar()
+            row = conn.execute(stmt).first()
 
-        if preview is None:
+        if row is None:
             raise NoSuchRecord(
                 'PDF preview does not exist for {} role {} page {}',
                 proposal_id, role, page)
 
-        return preview
+        if stream:
+            return self._get_blob_stream(
+                proposal_pdf_preview.c.preview,
+                and_(proposal_pdf_preview.c.id == row['id'],
+                     proposal_pdf_preview.c.pdf_id == proposal_pdf.c.id,
+                     proposal_pdf.c.md5sum == row['md5sum']),
+                etag=row['md5sum'], last_modified=row['uploaded'],
+                store_key=row[proposal_pdf_preview.c.store_key])
+
+        return self._get_attachment(
+            row[proposal_pdf_preview.c.preview],
+            row[proposal_pdf_preview.c.store_key])
 
     def get_proposal_text(self, proposal_id, role):
         """
@@ -713,9 +816,13 @@ class ProposalPart(object):
         return Queue(**result)
 
     def search_affiliation(self, queue_id=None, hidden=None, type_=None,
-                           with_weight_call_id=None, order_by_id=False):
+                           with_weight_call_id=None, order_by_id=False,
+                           read_replica=False):
         """
         Search for affiliation records.
+
+        If "read_replica" is specified, the search may be performed
+        on a read replica of the database, if one is configured.
         """
 
         if with_weight_call_id is None:
@@ -752,7 +859,7 @@ class ProposalPart(object):
 
         ans = AffiliationCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction(read_replica=read_replica) as conn:
             for row in conn.execute(stmt):
                 values = default.copy()
                 values.update(**row)
@@ -856,7 +963,7 @@ class ProposalPart(object):
 
         ans = CallCollection()
 
-        with self._transaction(_conn=_conn) as conn:
+        with self._read_transaction(_conn=_conn) as conn:
             for row in conn.execute(stmt.order_by(semester.c.id.desc(),
                                                   queue.c.name.asc())):
                 values = default.copy()
@@ -880,7 +987,7 @@ class ProposalPart(object):
         if type_ is not None:
             stmt = stmt.where(call_preamble.c.type == type_)
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(stmt.order_by(
                     call_preamble.c.semester_id.asc(),
                     call_preamble.c.type.asc())):
@@ -912,7 +1019,7 @@ class ProposalPart(object):
         else:
             stmt = stmt.order_by(category.c.name.asc())
 
-        with self._transaction(_conn=_conn) as conn:
+        with self._read_transaction(_conn=_conn) as conn:
             for row in conn.execute(stmt):
                 ans[row['id']] = Category(**row)
 
@@ -995,7 +1102,7 @@ class ProposalPart(object):
 
         ans = MemberCollection()
 
-        with self._transaction(_conn=_conn) as conn:
+        with self._read_transaction(_conn=_conn) as conn:
             for iter_stmt in self._iter_stmt(stmt, iter_field, iter_list):
                 for row in conn.execute(
                         iter_stmt.order_by(member.c.sort_order.asc())):
@@ -1031,7 +1138,7 @@ class ProposalPart(object):
 
         ans = ResultCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(
                     stmt.order_by(semester.c.date_start.desc())):
                 ans[row['id']] = SemesterInfo(**row)
@@ -1066,7 +1173,7 @@ class ProposalPart(object):
 
         ans = PrevProposalCollection()
 
-        with self._transaction(_conn=_conn) as conn:
+        with self._read_transaction(_conn=_conn) as conn:
             for iter_stmt in self._iter_stmt(stmt, iter_field, iter_list):
                 for row in conn.execute(iter_stmt.order_by(
                         prev_proposal.c.id.asc(),
@@ -1139,7 +1246,7 @@ class ProposalPart(object):
 
         ans = ResultCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(stmt):
                 values = default.copy()
                 values.update(**row)
@@ -1160,7 +1267,7 @@ class ProposalPart(object):
                         decision_accept_defined=None,
                         proposal_number=None, call_type=None,
                         semester_code=None, queue_code=None, queue_id=None,
-                        _conn=None):
+                        read_replica=False, _conn=None):
         """
         Search for proposals.
 
@@ -1185,6 +1292,12 @@ class ProposalPart(object):
         the given person.  Since in this mode there may be more than one
         result per proposal, the keys in the returned result collection
         are reviewer identifiers rather than proposal identifiers.
+
+        The "proposal_id" argument can also be a list of identifiers,
+        in which case the proposals are retrieved in blocks.
+
+        If "read_replica" is specified, the search may be performed
+        on a read replica of the database, if one is configured.
         """
 
         default = {}
@@ -1309,8 +1422,16 @@ class ProposalPart(object):
             else:
                 stmt = stmt.where(call.c.queue_id == queue_id)
 
+        iter_field = None
+        iter_list = None
+
         if proposal_id is not None:
-            stmt = stmt.where(proposal.c.id == proposal_id)
+            if is_list_like(proposal_id):
+                assert iter_field is None
+                iter_field = proposal.c.id
+                iter_list = proposal_id
+            else:
+                stmt = stmt.where(proposal.c.id == proposal_id)
 
         if person_id is not None:
             stmt = stmt.where(member.c.person_id == person_id)
@@ -1367,7 +1488,7 @@ class ProposalPart(object):
         # be useful as a pre-sort for those operations.)
         # If other pages rely on the sort order of results of this method,
         # perhaps the ordering should be controlled by more arguments.
-        if proposal_id is None:
+        if proposal_id is None or iter_list is not None:
             stmt = stmt.order_by(
                 semester.c.facility_id,
                 call.c.semester_id,
@@ -1380,51 +1501,54 @@ class ProposalPart(object):
         proposal_ids = set()
         extra = {}
 
-        with self._transaction(_conn=_conn) as conn:
-            for row in conn.execute(stmt):
-                member_info = None
-                reviewer_info = None
-                values = default.copy()
-                values.update(**row)
-                row_key = values['id']
-                proposal_ids.add(row_key)
-
-                if person_id is not None:
-                    member_info = MemberInfo(
-                        values.pop('pi'),
-                        values.pop('editor'),
-                        values.pop('observer'))
-
-                elif with_member_pi:
-                    member_info = MemberPIInfo(
-                        values.pop('person_id'),
-                        values.pop('pi_name'),
-                        values.pop('pi_public'),
-                        values.pop('pi_affiliation'))
-
-                    # If there was no such person, set the whole "member_info"
-                    # to None, but do this after popping the values.
-                    if member_info.person_id is None:
-                        member_info = None
-
-                if reviewer_person_id is not None:
-                    # There may be more than one reviewer record per person
-                    # and proposal, therefore in this case we need to use the
-                    # reviewer ID as the result collection key.
-                    row_key = values['reviewer_id']
-
-                    reviewer_info = ReviewerInfo(
-                        id=values.pop('reviewer_id'),
-                        role=values.pop('reviewer_role'),
-                        review_state=values.pop('review_state'),
-                        person_id=values.pop('reviewer_person_id'),
-                        proposal_id=values['id'])
-
-                ans[row_key] = Proposal(
-                    member=member_info, members=None,
-                    reviewer=reviewer_info, reviewers=None,
-                    categories=None,
-                    **values)
+        with self._read_transaction(
+                _conn=_conn, read_replica=read_replica) as conn:
+            for iter_stmt in self._iter_stmt(stmt, iter_field, iter_list):
+                for row in conn.execute(iter_stmt):
+                    member_info = None
+                    reviewer_info = None
+                    values = default.copy()
+                    values.update(**row)
+                    row_key = values['id']
+                    proposal_ids.add(row_key)
+
+                    if person_id is not None:
+                        member_info = MemberInfo(
+                            values.pop('pi'),
+                            values.pop('editor'),
+                            values.pop('observer'))
+
+                    elif with_member_pi:
+                        member_info = MemberPIInfo(
+                            values.pop('person_id'),
+                            values.pop('pi_name'),
+                            values.pop('pi_public'),
+                            values.pop('pi_affiliation'))
+
+                        # If there was no such person, set the whole
+                        # "member_info" to None, but do this after popping
+                        # the values.
+                        if member_info.person_id is None:
+                            member_info = None
+
+                    if reviewer_person_id is not None:
+                        # There may be more than one reviewer record per
+                        # person and proposal, therefore in this case we need
+                        # to use the reviewer ID as the result collection key.
+                        row_key = values['reviewer_id']
+
+                        reviewer_info = ReviewerInfo(
+                            id=values.pop('reviewer_id'),
+                            role=values.pop('reviewer_role'),
+                            review_state=values.pop('review_state'),
+                            person_id=values.pop('reviewer_person_id'),
+                            proposal_id=values['id'])
+
+                    ans[row_key] = Proposal(
+                        member=member_info, members=None,
+                        reviewer=reviewer_info, reviewers=None,
+                        categories=None,
+                        **values)
 
             # Now check if there is extra information which we need to attach.
             if with_members:
@@ -1480,7 +1604,7 @@ class ProposalPart(object):
 
         ans = ProposalCategoryCollection()
 
-        with self._transaction(_conn=_conn) as conn:
+        with self._read_transaction(_conn=_conn) as conn:
             for iter_stmt in self._iter_stmt(stmt, iter_field, iter_list):
                 for row in conn.execute(
                         iter_stmt.order_by(category.c.name.asc())):
@@ -1552,7 +1676,7 @@ class ProposalPart(object):
 
         ans = ProposalFigureCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(stmt):
                 values = default.copy()
                 values.update(**row)
@@ -1604,7 +1728,7 @@ class ProposalPart(object):
 
         ans = ProposalTextCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(stmt):
                 values = default.copy()
                 values.update(**row)
@@ -1632,7 +1756,7 @@ class ProposalPart(object):
 
         ans = ProposalTextCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(stmt):
                 ans[row['id']] = ProposalTextInfo(**row)
 
@@ -1659,39 +1783,116 @@ class ProposalPart(object):
 
         ans = ResultCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(stmt.order_by((queue.c.name))):
                 ans[row['id']] = QueueInfo(**row)
 
         return ans
 
-    def search_target(self, proposal_id):
+    def search_target(self, proposal_id=None, call_id=None):
         """
         Retrieve the targets of a given proposal.
+
+        Alternatively the targets of all of the proposals of a call
+        can be retrieved, ordered by proposal, by specifying `call_id`.
         """
 
         iter_field = None
         iter_list = None
 
-        stmt = target.select()
-
-        if is_list_like(proposal_id):
-            assert iter_field is None
-            iter_field = target.c.proposal_id
-            iter_list = proposal_id
+        if call_id is not None:
+            stmt = select([target]).select_from(target.join(proposal)).where(
+                proposal.c.call_id == call_id)
+        elif proposal_id is not None:
+            stmt = target.select()
         else:
-            stmt = stmt.where(target.c.proposal_id == proposal_id)
+            raise Error('Neither proposal nor call specified.')
+
+        if proposal_id is not None:
+            if is_list_like(proposal_id):
+                assert iter_field is None
+                iter_field = target.c.proposal_id
+                iter_list = proposal_id
+            else:
+                stmt = stmt.where(target.c.proposal_id == proposal_id)
 
         ans = TargetCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for iter_stmt in self._iter_stmt(stmt, iter_field, iter_list):
-                for row in conn.execute(
-                        iter_stmt.order_by(target.c.sort_order.asc())):
+                for row in conn.execute(iter_stmt.order_by(
+                        target.c.proposal_id.asc(),
+                        target.c.sort_order.asc())):
                     ans[row['id']] = Target(**row)
 
         return ans
 
+    def search_target_overlap(self, call_id, radius, state=None,
+                              with_prev_proposals=True):
+        """
+        Search for targets of the proposals of a call which lie within
+        a given distance of the targets of other proposals.
+
+        The other proposals considered are the rest of the proposals
+        of the call and, if `with_prev_proposals` is specified,
+        the previous proposals to which they refer.  The search uses
+        the target cells stored by :meth:`sync_proposal_target`,
+        so the coordinates of the targets are not needed.
+
+        :param call_id: call identifier
+        :param radius: search radius (degrees)
+        :param state: proposal state, or list of states, of the
+            proposals of the call to consider
+        :param with_prev_proposals: if true, also consider the previous
+            proposals of the call's proposals
+
+        :return: list of `TargetOverlap` tuples, as described for
+            :meth:`~hedwig.db.target_index.TargetIndex.search_overlap`
+        """
+
+        columns = [
+            target_cell.c.target_id, target.c.proposal_id, target_cell.c.cell]
+
+        stmt = select(columns).select_from(
+            target_cell.join(target).join(proposal)).where(
+            proposal.c.call_id == call_id)
+
+        prev_stmt = select(columns).select_from(
+            target_cell.join(target).join(
+                prev_proposal,
+                prev_proposal.c.proposal_id == target.c.proposal_id).join(
+                proposal,
+                proposal.c.id == prev_proposal.c.this_proposal_id)).where(
+            proposal.c.call_id == call_id).distinct()
+
+        if state is not None:
+            if is_list_like(state):
+                stmt = stmt.where(proposal.c.state.in_(state))
+                prev_stmt = prev_stmt.where(proposal.c.state.in_(state))
+            else:
+                stmt = stmt.where(proposal.c.state == state)
+                prev_stmt = prev_stmt.where(proposal.c.state == state)
+
+        cells = {}
+        proposal_ids = set()
+
+        with self._read_transaction() as conn:
+            for row in conn.execute(stmt):
+                cells[row['target_id']] = (row['proposal_id'], row['cell'])
+                proposal_ids.add(row['proposal_id'])
+
+            if with_prev_proposals:
+                for row in conn.execute(prev_stmt):
+                    cells[row['target_id']] = (
+                        row['proposal_id'], row['cell'])
+
+        index = TargetIndex(
+            list(cells.keys()),
+            [x[0] for x in cells.values()],
+            [x[1] for x in cells.values()])
+
+        return index.search_overlap(proposal_ids, radius)
+
     def set_call_preamble(self, type_class, semester_id, type_,
                           description, description_format, is_update,
                           _test_skip_check=False):
@@ -1752,29 +1953,83 @@ class ProposalPart(object):
         self._set_proposal_figure_alternate(
             proposal_fig_thumbnail.c.thumbnail, fig_id, thumbnail)
 
-    def _set_proposal_figure_alternate(self, column, fig_id, alternate):
-        table = column.table
+    def set_proposal_figure_alternate_ready(self, alternates):
+        """
+        Set the preview and thumbnail images for a number of figures
+        attached to proposals and mark them as ready, in a single
+        transaction.
+
+        Only figures which are still in the PROCESSING state are updated.
+
+        :param alternates: dictionary of `(preview, thumbnail)` tuples
+            by figure identifier, where the preview may be `None`
+
+        :return: list of identifiers of the figures which were updated
+        """
+
+        values = {}
+
+        for (fig_id, (preview, thumbnail)) in alternates.items():
+            values[fig_id] = [
+                (proposal_fig_thumbnail.c.thumbnail,
+                 self._get_attachment_values(
+                     proposal_fig_thumbnail.c.thumbnail, thumbnail))]
+
+            if preview is not None:
+                values[fig_id].append(
+                    (proposal_fig_preview.c.preview,
+                     self._get_attachment_values(
+                         proposal_fig_preview.c.preview, preview)))
+
+        updated = []
 
         with self._transaction() as conn:
-            if 0 < conn.execute(select([count(column)]).where(
-                    table.c.fig_id == fig_id)).scalar():
-                # Update existing alternate.
-                result = conn.execute(table.update().where(
-                    table.c.fig_id == fig_id
-                ).values({
-                    column: alternate,
+            for fig_id in sorted(values.keys()):
+                result = conn.execute(proposal_fig.update().where(and_(
+                    proposal_fig.c.id == fig_id,
+                    proposal_fig.c.state == AttachmentState.PROCESSING
+                )).values({
+                    proposal_fig.c.state: AttachmentState.READY,
                 }))
 
                 if result.rowcount != 1:
-                    raise ConsistencyError(
-                        'no rows matched updating proposal figure alternate')
+                    continue
 
-            else:
-                # Add new alternate.
-                conn.execute(table.insert().values({
-                    table.c.fig_id: fig_id,
-                    column: alternate,
-                }))
+                for (alt_column, alternate_values) in values[fig_id]:
+                    self._set_proposal_figure_alternate_values(
+                        conn, alt_column, fig_id, alternate_values)
+
+                updated.append(fig_id)
+
+        return updated
+
+    def _set_proposal_figure_alternate(self, column, fig_id, alternate):
+        values = self._get_attachment_values(column, alternate)
+
+        with self._transaction() as conn:
+            self._set_proposal_figure_alternate_values(
+                conn, column, fig_id, values)
+
+    def _set_proposal_figure_alternate_values(
+            self, conn, alt_column, fig_id, values):
+        table = alt_column.table
+
+        if 0 < conn.execute(select([count(alt_column)]).where(
+                table.c.fig_id == fig_id)).scalar():
+            # Update existing alternate.
+            result = conn.execute(table.update().where(
+                table.c.fig_id == fig_id
+            ).values(values))
+
+            if result.rowcount != 1:
+                raise ConsistencyError(
+                    'no rows matched updating proposal figure alternate')
+
+        else:
+            # Add new alternate.
+            values[table.c.fig_id] = fig_id
+
+            conn.execute(table.insert().values(values))
 
     def set_proposal_pdf(self, role_class, proposal_id, role, pdf, pages,
                          filename, uploader_person_id, _test_skip_check=False):
@@ -1788,6 +2043,8 @@ class ProposalPart(object):
             raise FormattedError('proposal text role not recognised: {}',
                                  role)
 
+        values = self._get_attachment_values(proposal_pdf.c.pdf, pdf)
+
         with self._transaction() as conn:
             if (not _test_skip_check and
                     not self._exists_id(conn, person, uploader_person_id)):
@@ -1796,15 +2053,14 @@ class ProposalPart(object):
 
             pdf_id = self._get_proposal_pdf_id(conn, proposal_id, role)
 
-            values = {
-                proposal_pdf.c.pdf: pdf,
+            values.update({
                 proposal_pdf.c.md5sum: md5(pdf).hexdigest(),
                 proposal_pdf.c.pages: pages,
                 proposal_pdf.c.state: AttachmentState.NEW,
                 proposal_pdf.c.filename: filename,
                 proposal_pdf.c.uploaded: datetime.utcnow(),
                 proposal_pdf.c.uploader: uploader_person_id,
-            }
+            })
 
             if pdf_id is not None:
                 result = conn.execute(proposal_pdf.update().where(
@@ -1853,22 +2109,132 @@ class ProposalPart(object):
         Set the preview images for a PDF file attached to a proposal.
         """
 
-        stmt = proposal_pdf_preview.insert()
-        n = 0
+        previews = [
+            self._get_attachment_values(proposal_pdf_preview.c.preview, png)
+            for png in pngs]
 
         with self._transaction() as conn:
-            conn.execute(proposal_pdf_preview.delete().where(
-                proposal_pdf_preview.c.pdf_id == pdf_id))
+            # Lock the PDF record so that pages are not stored on demand
+            # by :meth:`set_proposal_pdf_preview_page` concurrently.
+            conn.execute(select([proposal_pdf.c.id]).where(
+                proposal_pdf.c.id == pdf_id).with_for_update())
+
+            self._set_proposal_pdf_preview_values(conn, pdf_id, previews)
+
+    def set_proposal_pdf_preview_ready(self, pdf_pngs):
+        """
+        Set the preview images for a number of PDF files attached to
+        proposals and mark them as ready, in a single transaction.
+
+        Only PDF files which are still in the PROCESSING state are updated.
 
-            for png in pngs:
-                n += 1
+        :param pdf_pngs: dictionary of lists of preview images
+            by PDF identifier
 
-                conn.execute(stmt.values({
-                    proposal_pdf_preview.c.pdf_id: pdf_id,
-                    proposal_pdf_preview.c.page: n,
-                    proposal_pdf_preview.c.preview: png,
+        :return: list of identifiers of the PDF files which were updated
+        """
+
+        previews = {
+            pdf_id: [
+                self._get_attachment_values(
+                    proposal_pdf_preview.c.preview, png)
+                for png in pngs]
+            for (pdf_id, pngs) in pdf_pngs.items()}
+
+        updated = []
+
+        with self._transaction() as conn:
+            for pdf_id in sorted(previews.keys()):
+                result = conn.execute(proposal_pdf.update().where(and_(
+                    proposal_pdf.c.id == pdf_id,
+                    proposal_pdf.c.state == AttachmentState.PROCESSING
+                )).values({
+                    proposal_pdf.c.state: AttachmentState.READY,
                 }))
 
+                if result.rowcount != 1:
+                    continue
+
+                self._set_proposal_pdf_preview_values(
+                    conn, pdf_id, previews[pdf_id])
+
+                updated.append(pdf_id)
+
+        return updated
+
+    def _set_proposal_pdf_preview_values(self, conn, pdf_id, previews):
+        stmt = proposal_pdf_preview.insert()
+        n = 0
+
+        conn.execute(proposal_pdf_preview.delete().where(
+            proposal_pdf_preview.c.pdf_id == pdf_id))
+
+        for values in previews:
+            n += 1
+
+            values.update({
+                proposal_pdf_preview.c.pdf_id: pdf_id,
+                proposal_pdf_preview.c.page: n,
+            })
+
+            conn.execute(stmt.values(values))
+
+    def set_proposal_pdf_preview_page(self, pdf_id, page, png, md5sum=None):
+        """
+        Set the preview image for a single page of a PDF file attached
+        to a proposal, unless that page already has a preview image.
+
+        This is used to store pages rendered on demand, before
+        :meth:`set_proposal_pdf_preview` is called to store the
+        images for all of the pages.  The PDF record is locked
+        while the image is stored, and nothing is stored if the PDF
+        file has already been processed, or if its MD5 sum no longer
+        matches `md5sum` (if specified).
+
+        :return: `True` if the image was stored.
+        """
+
+        values = self._get_attachment_values(
+            proposal_pdf_preview.c.preview, png)
+
+        values.update({
+            proposal_pdf_preview.c.pdf_id: pdf_id,
+            proposal_pdf_preview.c.page: page,
+        })
+
+        try:
+            with self._transaction() as conn:
+                row = conn.execute(select([
+                    proposal_pdf.c.state, proposal_pdf.c.md5sum,
+                ]).where(
+                    proposal_pdf.c.id == pdf_id
+                ).with_for_update()).first()
+
+                if row is None:
+                    raise ConsistencyError(
+                        'PDF does not exist with id={}', pdf_id)
+
+                if row['state'] not in (
+                        AttachmentState.NEW, AttachmentState.PROCESSING):
+                    return False
+
+                if md5sum is not None and row['md5sum'] != md5sum:
+                    return False
+
+                if 0 < conn.execute(select([
+                        count(proposal_pdf_preview.c.id)]).where(and_(
+                            proposal_pdf_preview.c.pdf_id == pdf_id,
+                            proposal_pdf_preview.c.page == page))).scalar():
+                    return False
+
+                conn.execute(proposal_pdf_preview.insert().values(values))
+
+        except DatabaseIntegrityError:
+            # Another process stored this page in the meantime.
+            return False
+
+        return True
+
     def set_proposal_text(self, role_class, proposal_id, role, text, format,
                           words, editor_person_id, is_update,
                           _test_skip_check=False):
@@ -2182,9 +2548,13 @@ class ProposalPart(object):
         records.ensure_sort_order()
 
         with self._transaction() as conn:
-            return self._sync_records(
+            result = self._sync_records(
                 conn, target, target.c.proposal_id, proposal_id, records)
 
+            self._sync_proposal_target_cell(conn, proposal_id)
+
+        return result
+
     def sync_queue_affiliation(self, queue_id, records):
         """
         Update the affiliation records for a queue to match those
@@ -2472,10 +2842,12 @@ class ProposalPart(object):
             if uploader_person_id is None:
                 raise Error('updated figure uploader not specified')
 
+            values.update(self._get_attachment_values(
+                proposal_fig.c.figure, figure))
+
             values.update({
                 proposal_fig.c.type: type_,
                 proposal_fig.c.state: AttachmentState.NEW,
-                proposal_fig.c.figure: figure,
                 proposal_fig.c.md5sum: md5(figure).hexdigest(),
                 proposal_fig.c.filename: filename,
                 proposal_fig.c.uploaded: datetime.utcnow(),
@@ -2590,6 +2962,51 @@ class ProposalPart(object):
                     'no rows matched updating queue with id={}',
                     queue_id)
 
+    def update_target_cell(self):
+        """
+        Recompute the stored target cells for all proposals.
+
+        This is only necessary for targets entered before the
+        `target_cell` table was introduced, since the cells are normally
+        updated by :meth:`sync_proposal_target`.  Each proposal is
+        processed in a separate transaction.
+
+        :return: the number of proposals processed
+        """
+
+        with self._read_transaction() as conn:
+            proposal_ids = [row[0] for row in conn.execute(
+                select([target.c.proposal_id]).distinct().order_by(
+                    target.c.proposal_id))]
+
+        for proposal_id in proposal_ids:
+            with self._transaction() as conn:
+                self._sync_proposal_target_cell(conn, proposal_id)
+
+        return len(proposal_ids)
+
+    def _sync_proposal_target_cell(self, conn, proposal_id):
+        """
+        Replace the target cell records for the given proposal
+        to match its current targets.
+        """
+
+        targets = [
+            Target(**row) for row in conn.execute(
+                target.select().where(target.c.proposal_id == proposal_id))]
+
+        conn.execute(target_cell.delete().where(
+            target_cell.c.target_id.in_(
+                select([target.c.id]).where(
+                    target.c.proposal_id == proposal_id))))
+
+        cells = get_target_cells(targets)
+
+        if cells:
+            conn.execute(target_cell.insert(), [
+                {'target_id': target_id, 'cell': cell}
+                for (target_id, cell) in sorted(cells.items())])
+
     def _get_proposal_pdf_id(self, conn, proposal_id, role):
         """
         Test whether text of the given role already exists for a proposal,
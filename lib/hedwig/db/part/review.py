@@ -232,7 +232,7 @@ class ReviewPart(object):
 
         ans = GroupMemberCollection()
 
-        with self._transaction(_conn=_conn) as conn:
+        with self._read_transaction(_conn=_conn) as conn:
             for row in conn.execute(stmt):
                 if default is not None:
                     values = default.copy()
@@ -372,7 +372,7 @@ class ReviewPart(object):
 
         ans = ReviewerCollection()
 
-        with self._transaction(_conn=_conn) as conn:
+        with self._read_transaction(_conn=_conn) as conn:
             for iter_stmt in self._iter_stmt(stmt, iter_field, iter_list):
                 for row in conn.execute(iter_stmt.order_by(
                         reviewer.c.role, person.c.name, reviewer.c.id)):
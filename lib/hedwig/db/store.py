@@ -0,0 +1,259 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from hashlib import md5
+import os
+import re
+from tempfile import mkstemp
+from time import time
+
+from ..error import FormattedError, NoSuchRecord
+from ..type.misc import FileStream
+from ..util import get_logger
+
+logger = get_logger(__name__)
+
+valid_key = re.compile('^[0-9a-f]{32}$')
+
+
+class AttachmentStore(object):
+    """
+    Base class for attachment storage backends.
+
+    Attachments are content-addressed: each is identified by a key
+    derived from its data, so that storing the same data again
+    returns the same key.  Since several database records may
+    therefore refer to one stored attachment, attachments are not
+    deleted when records are removed, but can be cleaned up
+    by :meth:`~hedwig.db.control.Database.clean_attachment_store`.
+    """
+
+    def put(self, data):
+        """
+        Store attachment data.
+
+        If the data are already present, their storage time should be
+        updated, so that they are not removed as unreferenced
+        before the new reference to them has been committed.
+
+        :return: the key under which the data were stored.
+        """
+
+        raise NotImplementedError()
+
+    def get(self, key):
+        """
+        Read the data for an attachment.
+
+        :raises NoSuchRecord: if the attachment is not present.
+        """
+
+        raise NotImplementedError()
+
+    def get_stream(self, key, etag=None, last_modified=None):
+        """
+        Get a :class:`~hedwig.type.misc.FileStream` for an attachment.
+
+        This default implementation reads the whole attachment when
+        the stream is created, and should be overridden by backends
+        which can read sections of attachments.
+        """
+
+        data = self.get(key)
+
+        return FileStream(
+            len(data), (lambda offset, size: data[offset:offset + size]),
+            etag=etag, last_modified=last_modified)
+
+    def delete(self, key, max_mtime=None):
+        """
+        Remove an attachment from the store.
+
+        :param max_mtime: if specified, the attachment is only removed if
+            it was last stored before this time (as given by `time.time`).
+
+        :return: `True` if the attachment was removed.
+        """
+
+        raise NotImplementedError()
+
+    def iter_keys(self, min_age=None):
+        """
+        Generate the keys of all stored attachments.
+
+        :param min_age: if specified, only include attachments which were
+            stored at least this long ago (seconds).
+        """
+
+        raise NotImplementedError()
+
+
+class DirectoryStore(AttachmentStore):
+    """
+    Attachment store which keeps each attachment in a file,
+    named by its MD5 sum, within a directory tree.
+
+    Files are written to a temporary name and then renamed, so
+    that partially-written attachments are never visible.  The
+    `path` attribute of the streams returned by :meth:`get_stream`
+    is set so that the web server can send the files directly.
+
+    :param directory: the base directory of the store, which
+        must already exist.
+    """
+
+    def __init__(self, directory):
+        if not os.path.isdir(directory):
+            raise FormattedError(
+                'attachment store directory {} does not exist', directory)
+
+        self.directory = directory
+
+    def put(self, data):
+        key = md5(data).hexdigest()
+        path = self._get_path(key)
+
+        if os.path.exists(path):
+            # Update the modification time to protect the file from
+            # removal until the new reference to it has been committed.
+            try:
+                os.utime(path, None)
+                return key
+
+            except OSError:
+                # The file may have just been removed: store it again.
+                pass
+
+        subdirectory = os.path.dirname(path)
+        if not os.path.exists(subdirectory):
+            try:
+                os.mkdir(subdirectory)
+            except OSError:
+                # Another process may have created the directory.
+                if not os.path.isdir(subdirectory):
+                    raise
+
+        (fd, temporary) = mkstemp(dir=subdirectory, prefix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.chmod(temporary, 0o640)
+            os.rename(temporary, path)
+
+        except:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+
+            raise
+
+        logger.debug('Stored attachment {} ({} bytes)', key, len(data))
+
+        return key
+
+    def get(self, key):
+        try:
+            with open(self._get_path(key), 'rb') as f:
+                return f.read()
+
+        except IOError:
+            raise NoSuchRecord('attachment {} not found in store', key)
+
+    def get_stream(self, key, etag=None, last_modified=None):
+        path = self._get_path(key)
+
+        try:
+            length = os.path.getsize(path)
+        except OSError:
+            raise NoSuchRecord('attachment {} not found in store', key)
+
+        def read(offset, size):
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                return f.read(size)
+
+        return FileStream(length, read, etag=etag,
+                          last_modified=last_modified, path=path)
+
+    def delete(self, key, max_mtime=None):
+        path = self._get_path(key)
+
+        try:
+            if max_mtime is not None and os.path.getmtime(path) > max_mtime:
+                return False
+
+            os.unlink(path)
+
+        except OSError:
+            raise NoSuchRecord('attachment {} not found in store', key)
+
+        return True
+
+    def iter_keys(self, min_age=None):
+        max_mtime = None if min_age is None else (time() - min_age)
+
+        for subdirectory in sorted(os.listdir(self.directory)):
+            subdirectory_path = os.path.join(self.directory, subdirectory)
+
+            if not os.path.isdir(subdirectory_path):
+                continue
+
+            for filename in sorted(os.listdir(subdirectory_path)):
+                if not (valid_key.match(filename) and
+                        filename.startswith(subdirectory)):
+                    continue
+
+                if max_mtime is not None and os.path.getmtime(
+                        os.path.join(subdirectory_path, filename)) > max_mtime:
+                    continue
+
+                yield filename
+
+    def _get_path(self, key):
+        if not valid_key.match(key):
+            raise FormattedError('invalid attachment key {}', key)
+
+        return os.path.join(self.directory, key[:2], key)
+
+
+attachment_store_types = {
+    'directory': DirectoryStore,
+}
+
+
+def get_attachment_store(type_, **kwargs):
+    """
+    Construct an attachment store object.
+
+    :param type_: the name of the store type, e.g. "directory".
+    :param kwargs: options to be passed to the store's constructor.
+
+    :raises FormattedError: if the type is not recognized.
+    """
+
+    try:
+        store_class = attachment_store_types[type_]
+    except KeyError:
+        raise FormattedError('unknown attachment store type {}', type_)
+
+    return store_class(**kwargs)
@@ -0,0 +1,198 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from itertools import product
+from math import radians, sin
+
+from healpy import ang2pix, pix2vec
+import numpy as np
+
+from ..astro.coord import dec_deg_list_to_icrs
+from ..type.simple import TargetOverlap
+
+# HEALPix order at which target positions are stored.  This is the
+# highest order which HEALPix supports, so that the cells (of less
+# than a milliarcsecond in size) represent the positions essentially
+# exactly, and ranges of cells at any lower order can be searched for.
+target_index_order = 29
+
+_target_index_nside = 2 ** target_index_order
+
+# Minimum size of the cubes into which unit vectors are divided when
+# searching.  With at most 2 ** 20 cubes along each axis, the cube
+# coordinates (offset by one to allow for neighbouring cubes) can be
+# packed into a single 64-bit integer.
+_grid_bits = 21
+_grid_min_size = 2.0 ** (2 - _grid_bits)
+
+# Offsets of a cube and its neighbours.
+_grid_offsets = np.array(list(product((-1, 0, 1), repeat=3)), dtype=np.int64)
+
+
+def get_target_cells(targets):
+    """
+    Determine the HEALPix cell containing each of a set of targets.
+
+    Targets without coordinates are skipped.
+
+    :param targets: iterable of `Target` tuples
+
+    :return: dictionary of cell numbers, at order `target_index_order`
+        in the "nested" scheme, by target identifier
+    """
+
+    target_ids = []
+    systems = []
+    xs = []
+    ys = []
+
+    for target in targets:
+        if target.system is None or target.x is None or target.y is None:
+            continue
+
+        target_ids.append(target.id)
+        systems.append(target.system)
+        xs.append(target.x)
+        ys.append(target.y)
+
+    if not target_ids:
+        return {}
+
+    coord = dec_deg_list_to_icrs(systems, xs, ys)
+
+    cells = ang2pix(
+        _target_index_nside, coord.ra.deg, coord.dec.deg,
+        nest=True, lonlat=True)
+
+    return {x: int(y) for (x, y) in zip(target_ids, cells)}
+
+
+class TargetIndex(object):
+    """
+    In-memory index of a set of target positions.
+
+    Targets are given by their HEALPix cell number (as stored in the
+    `target_cell` table), from which their unit vectors are computed.
+    To search for pairs of targets near each other, space is divided
+    into cubes at least as large as the chord corresponding to the search
+    radius, so that any matching pair of targets lies in the same or
+    neighbouring cubes.  The targets are sorted by cube, allowing the
+    candidates for all of the targets to be located at once by binary
+    search, and they are then checked using their unit vectors.
+
+    :param target_ids: target identifiers
+    :param proposal_ids: corresponding proposal identifiers
+    :param cells: corresponding cell numbers at order `target_index_order`
+    """
+
+    def __init__(self, target_ids, proposal_ids, cells):
+        cells = np.array(cells, dtype=np.int64)
+        sort = np.argsort(cells, kind='mergesort')
+
+        self.cells = cells[sort]
+        self.target_ids = np.array(target_ids, dtype=np.int64)[sort]
+        self.proposal_ids = np.array(proposal_ids, dtype=np.int64)[sort]
+
+        if len(self.cells):
+            self.vectors = np.array(pix2vec(
+                _target_index_nside, self.cells, nest=True)).T
+        else:
+            self.vectors = np.empty((0, 3))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def search_overlap(self, proposal_ids, radius):
+        """
+        Search for pairs of targets of different proposals within
+        a given distance of each other.
+
+        :param proposal_ids: identifiers of the proposals whose
+            targets should be searched around
+        :param radius: search radius (degrees)
+
+        :return: list of `TargetOverlap` tuples, sorted by proposal,
+            target and separation, with the separation in degrees
+        """
+
+        (query,) = np.nonzero(np.in1d(
+            self.proposal_ids,
+            np.array(list(proposal_ids), dtype=np.int64)))
+
+        if not len(query):
+            return []
+
+        max_chord_sq = (2.0 * sin(radians(radius) / 2.0)) ** 2
+        size = max(np.sqrt(max_chord_sq), _grid_min_size)
+
+        cubes = np.floor((self.vectors + 1.0) / size).astype(np.int64)
+        keys = _cube_key(cubes)
+        sort = np.argsort(keys, kind='mergesort')
+        keys = keys[sort]
+
+        # Locate the targets in each cube neighbouring each query target.
+        neighbours = _cube_key(
+            cubes[query][:, np.newaxis, :] + _grid_offsets).ravel()
+        starts = np.searchsorted(keys, neighbours, side='left')
+        counts = np.searchsorted(keys, neighbours, side='right') - starts
+
+        # Expand the ranges into arrays of candidate pairs.
+        n_candidate = np.sum(counts)
+        i = np.repeat(np.repeat(query, len(_grid_offsets)), counts)
+        j = sort[np.repeat(starts - np.cumsum(counts) + counts, counts) +
+                 np.arange(n_candidate)]
+
+        candidates = self.proposal_ids[i] != self.proposal_ids[j]
+        i = i[candidates]
+        j = j[candidates]
+
+        chord_sq = np.sum((self.vectors[j] - self.vectors[i]) ** 2, axis=1)
+
+        match = chord_sq <= max_chord_sq
+        i = i[match]
+        j = j[match]
+        separations = np.degrees(
+            2.0 * np.arcsin(np.sqrt(chord_sq[match]) / 2.0))
+
+        order = np.lexsort((
+            self.target_ids[j], separations,
+            self.target_ids[i], self.proposal_ids[i]))
+
+        return [
+            TargetOverlap(
+                int(self.target_ids[x]), int(self.proposal_ids[x]),
+                int(self.target_ids[y]), int(self.proposal_ids[y]),
+                float(separation))
+            for (x, y, separation) in zip(
+                i[order], j[order], separations[order])]
+
+
+def _cube_key(cubes):
+    """
+    Pack cube coordinates, which may be offset by -1 for neighbouring
+    cubes, into single integers.
+    """
+
+    cubes = cubes + 1
+
+    return (
+        (cubes[..., 0] << (2 * _grid_bits)) |
+        (cubes[..., 1] << _grid_bits) |
+        cubes[..., 2])
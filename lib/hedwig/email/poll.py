@@ -20,16 +20,20 @@ from __future__ import absolute_import, division, print_function, \
 
 from ..config import get_database
 from ..error import ConsistencyError
-from .send import send_email_message
+from ..util import get_logger
+from .send import send_email_messages
 
+logger = get_logger(__name__)
 
-def send_queued_messages(db=None):
+
+def send_queued_messages(db=None, batch_size=50):
     """
     Attempts to send any unsent email messages.
 
-    Repeatedly queries the database for an unsent message.  If a message
-    is found, it is sent and then marked as sent in the database.
-    If no message is found then the loop exits.
+    Repeatedly queries the database for a batch of unsent messages.
+    The messages are sent using a single connection to the email server
+    and then marked as sent in the database.
+    If no messages are found then the loop exits.
 
     Returns the number of messages sent.
     """
@@ -42,20 +46,22 @@ def send_queued_messages(db=None):
     n_sent = 0
 
     while True:
-        message = db.get_unsent_message(mark_sending=True)
-        if message is None:
+        messages = db.get_unsent_messages(batch_size, mark_sending=True)
+        if not messages:
             break
 
-        if message.id in message_ids:
-            raise ConsistencyError('message with id={} seen more than once',
-                                   message.id)
-        message_ids.add(message.id)
+        for message in messages:
+            if message.id in message_ids:
+                raise ConsistencyError(
+                    'message with id={} seen more than once', message.id)
+            message_ids.add(message.id)
 
-        identifier = send_email_message(message)
+        identifiers = send_email_messages(messages)
 
-        if identifier is not None:
-            db.mark_message_sent(message.id, identifier)
+        for message_id in db.mark_messages_sent(identifiers):
+            logger.error('Email message {} could not be marked as sent',
+                         message_id)
 
-        n_sent += 1
+        n_sent += len(messages)
 
     return n_sent
@@ -18,14 +18,14 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
-from contextlib import closing, contextmanager
+from contextlib import closing
 from cStringIO import StringIO
 from email.generator import Generator
 from email.header import Header
 from email.mime.nonmultipart import MIMENonMultipart
 from email.utils import formataddr, formatdate, make_msgid
 import socket
-from smtplib import SMTP, SMTPException
+from smtplib import SMTP, SMTPException, SMTPServerDisconnected
 from time import mktime
 
 from ..config import get_config
@@ -34,21 +34,6 @@ from ..util import get_logger
 logger = get_logger(__name__)
 
 
-@contextmanager
-def quitting(smtp):
-    """
-    Context manager which calls the `quit` method on the given
-    object at the end of the block.
-
-    This function is analogous to the standard `contextlib.closing` function.
-    """
-
-    try:
-        yield smtp
-    finally:
-        smtp.quit()
-
-
 class MIMETextFlowed(MIMENonMultipart):
     """
     MIME message class for flowed text.
@@ -72,10 +57,91 @@ def send_email_message(message):
     On success, returns the message identifier.  Returns None on failure.
     """
 
+    return send_email_messages([message]).get(message.id)
+
+
+def send_email_messages(messages):
+    """
+    Send a number of email messages using a single SMTP session.
+
+    If the connection to the server is lost, a new connection is made
+    and the message which was being sent is tried again.
+
+    :param messages: list of messages to send.
+
+    :return: a dictionary of message identifiers (values for the
+        "Message-ID" header) by message ID, for each message which was sent.
+    """
+
     config = get_config()
     server = config.get('email', 'server')
     from_ = config.get('email', 'from')
 
+    identifiers = {}
+    smtp = None
+
+    try:
+        for message in messages:
+            (identifier, recipients, msg) = _prepare_email_message(
+                message, from_)
+
+            for attempt in (1, 2):
+                try:
+                    if smtp is None:
+                        smtp = SMTP(server)
+
+                    refusal = smtp.sendmail(from_, recipients, msg)
+
+                    for (recipient, problem) in refusal.items():
+                        logger.error(
+                            'Email message {} refused for {}: {}: {}',
+                            message.id, recipient, problem[0], problem[1])
+
+                    identifiers[message.id] = identifier
+
+                    break
+
+                except SMTPServerDisconnected:
+                    _close_smtp(smtp)
+                    smtp = None
+
+                    if attempt == 2:
+                        logger.exception(
+                            'Email message {} not sent due to '
+                            'disconnection from email server', message.id)
+
+                except SMTPException:
+                    logger.exception(
+                        'Email message {} refused for all recipients',
+                        message.id)
+
+                    break
+
+                except socket.error:
+                    logger.exception(
+                        'Email message {} not sent due to failure '
+                        'to connect to email server', message.id)
+
+                    _close_smtp(smtp)
+                    smtp = None
+
+                    break
+
+    finally:
+        if smtp is not None:
+            _close_smtp(smtp, quit_=True)
+
+    return identifiers
+
+
+def _prepare_email_message(message, from_):
+    """
+    Prepare an email message for sending.
+
+    :return: a tuple containing the message identifier, list of recipients
+        and the flattened message.
+    """
+
     # Sort recipients into public ("to") and private ("bcc") lists,
     # unless there is only one recipient, in which case there's no
     # need to hide the address.
@@ -111,22 +177,25 @@ def send_email_message(message):
         Generator(f, mangle_from_=False).flatten(msg)
         msg = f.getvalue()
 
-    try:
-        with quitting(SMTP(server)) as smtp:
-            refusal = smtp.sendmail(
-                from_, recipients_public + recipients_private, msg)
+    return (identifier, recipients_public + recipients_private, msg)
 
-            for (recipient, problem) in refusal.items():
-                logger.error('Email message {} refused for {}: {}: {}',
-                             message.id, recipient, problem[0], problem[1])
 
-            return identifier
+def _close_smtp(smtp, quit_=False):
+    """
+    Close an SMTP connection, ignoring errors.
 
-    except SMTPException:
-        logger.exception('Email message {} refused for all recipients',
-                         message.id)
-    except socket.error:
-        logger.exception('Email message {} not sent due to failure '
-                         'to connect to email server', message.id)
+    :param quit_: if true, try to send the "QUIT" command first.
+    """
+
+    if smtp is None:
+        return
+
+    try:
+        if quit_:
+            smtp.quit()
+        else:
+            smtp.close()
 
-    return None
+    except (SMTPException, socket.error):
+        logger.debug('Error closing SMTP connection', exc_info=True)
+        smtp.close()
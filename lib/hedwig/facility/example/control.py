@@ -50,7 +50,7 @@ class ExamplePart(object):
 
         ans = ExampleRequestCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for iter_stmt in self._iter_stmt(
                     stmt, iter_field, iter_list):
                 for row in conn.execute(
@@ -18,7 +18,7 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
-from collections import namedtuple
+from collections import OrderedDict, defaultdict, namedtuple
 from math import pi
 import re
 
@@ -26,15 +26,25 @@ from healpy import ang2pix
 
 from ...astro.coord import CoordSystem, format_coord
 from ...error import NoSuchRecord
+from ...file.csv import CSVWriter
 from ...view import auth
 from ...view.tool import BaseTargetTool
+from ...view.util import with_call_review
 from ...web.util import ErrorPage, HTTPNotFound
-from ...type.enum import AttachmentState, FileTypeInfo
+from ...type.collection import TargetObjectList
+from ...type.enum import AttachmentState, FileTypeInfo, PermissionType, \
+    ProposalState
 from ...type.simple import RouteInfo
 from ...type.util import null_tuple
 
-TargetClash = namedtuple('TargetClash', ('target', 'mocs', 'target_search',
-                                         'display_coord'))
+TargetClash = namedtuple('TargetClash', ('target_name', 'mocs',
+                                         'target_search', 'display_coord'))
+
+TargetClashMOC = namedtuple('TargetClashMOC', ('id', 'name', 'public'))
+
+ProposalClashSummary = namedtuple(
+    'ProposalClashSummary',
+    ('id', 'code', 'title', 'state', 'num_targets', 'clash_targets', 'mocs'))
 
 
 class ClashTool(BaseTargetTool):
@@ -85,6 +95,18 @@ class ClashTool(BaseTargetTool):
                 'moc_list',
                 self.view_moc_list,
                 {}),
+            RouteInfo(
+                'call.html',
+                'call/<int:call_id>',
+                'call',
+                self.view_call,
+                {'auth_required': True, 'init_route_params': ['call_id']}),
+            RouteInfo(
+                None,
+                'call/<int:call_id>/download',
+                'call_download',
+                self.view_call_download,
+                {'auth_required': True, 'init_route_params': ['call_id']}),
         ]
 
     def _view_any_mode(self, db, target_objects, args, form, auth_cache):
@@ -148,13 +170,15 @@ class ClashTool(BaseTargetTool):
         """
         Search the coverage maps (MOCs) for the given list of targets.
 
-        Iterates over the list of targets and converts each to a
-        HEALPix cell at the facility's specified (maximum) MOC order.
-        Then searches the MOC cell database table to determine whether
-        the target clashes or not.
+        Converts all of the targets to ICRS and then to HEALPix cells at
+        the facility's specified (maximum) MOC order, using array operations.
+        Then searches the in-memory coverage index, obtained via
+        :meth:`~hedwig.db.part.calculator.CalculatorPart.get_moc_index`,
+        to determine whether each target clashes or not.  If no index
+        is available, the MOC cell database table is searched instead.
 
         :param db: database access object
-        :param targets: list of targets
+        :param targets: list of targets, or a `TargetObjectList`
         :param public: database MOC search "public" constraint as determined by
                        :meth:`_determine_public_constraint`
 
@@ -162,40 +186,223 @@ class ClashTool(BaseTargetTool):
                  entry is a `TargetClash` tuple
         """
 
-        order = self.facility.get_moc_order()
         clashes = []
         non_clashes = []
 
-        for target in targets:
-            # If the coordinates weren't entered in ICRS, use the
-            # Astropy transformation to convert them.
-            if target.system == CoordSystem.ICRS:
-                coord = target.coord
-            else:
-                coord = target.coord.icrs
+        if not targets:
+            return (clashes, non_clashes)
 
-            ra_rad = coord.spherical.lon.rad
-            dec_rad = coord.spherical.lat.rad
-            cell = ang2pix(2 ** order, pi / 2 - dec_rad, ra_rad, nest=True)
+        if not isinstance(targets, TargetObjectList):
+            targets = TargetObjectList.from_object_list(targets)
 
-            target_clashes = db.search_moc_cell(
-                facility_id=self.facility.id_, public=public,
-                order=order, cell=int(cell))
+        (coords, cells, cell_clashes) = self._search_target_cells(
+            db, targets, public)
+
+        ra_deg = coords.spherical.lon.deg
+        dec_deg = coords.spherical.lat.deg
+
+        (ra_text, dec_text) = format_coord(CoordSystem.ICRS, coords)
+
+        for (i, target_name) in enumerate(targets.names):
+            target_clashes = cell_clashes[int(cells[i])]
 
             archive_url = self.facility.make_archive_search_url(
-                coord.spherical.lon.deg, coord.spherical.lat.deg)
-            archive_url_text = ' '.join(format_coord(CoordSystem.ICRS, coord))
+                float(ra_deg[i]), float(dec_deg[i]))
+            archive_url_text = ' '.join((ra_text[i], dec_text[i]))
 
             if target_clashes:
                 clashes.append(TargetClash(
-                    target, target_clashes, archive_url, archive_url_text))
+                    target_name, target_clashes,
+                    archive_url, archive_url_text))
 
             else:
                 non_clashes.append(TargetClash(
-                    target, None, archive_url, archive_url_text))
+                    target_name, None, archive_url, archive_url_text))
 
         return (clashes, non_clashes)
 
+    def _search_target_cells(self, db, targets, public):
+        """
+        Search the coverage maps (MOCs) for the cells containing
+        each of the given targets.
+
+        :param db: database access object
+        :param targets: a `TargetObjectList`
+        :param public: database MOC search "public" constraint
+
+        :return: tuple `(coords, cells, cell_clashes)` of the ICRS
+                 coordinates of the targets, the array of HEALPix cells
+                 containing them, and a dictionary by cell of the
+                 matching MOCs
+        """
+
+        order = self.facility.get_moc_order()
+
+        # Use Astropy to convert all of the targets to ICRS.
+        coords = targets.to_icrs()
+
+        cells = ang2pix(2 ** order, pi / 2 - coords.spherical.lat.rad,
+                        coords.spherical.lon.rad, nest=True)
+
+        index = db.get_moc_index(self.facility.id_, order)
+
+        if index is not None:
+            cell_clashes = index.search(public, cells)
+
+        else:
+            cell_clashes = db.search_moc_cells(
+                facility_id=self.facility.id_, public=public,
+                order=order, cells=cells)
+
+        return (coords, cells, cell_clashes)
+
+    def check_call(self, db, call_id):
+        """
+        Check the targets of all of the proposals of a call against
+        all of the facility's coverage maps (MOCs), and store the
+        results in the database.
+
+        The targets are retrieved with a single query and searched
+        for together.  Private MOCs are included: the call clash report
+        applies the usual "public" constraint when it is viewed.
+
+        :param db: database access object
+        :param call_id: call identifier
+
+        :return: the number of targets found to clash
+        """
+
+        targets = db.search_target(call_id=call_id)
+
+        target_ids = [
+            k for (k, v) in targets.items()
+            if not (v.x is None or v.y is None)]
+
+        clashes = {}
+
+        if target_ids:
+            (coords, cells, cell_clashes) = self._search_target_cells(
+                db, targets.to_object_list(), public=None)
+
+            for (target_id, cell) in zip(target_ids, cells):
+                moc_ids = list(cell_clashes[int(cell)].keys())
+
+                if moc_ids:
+                    clashes[target_id] = moc_ids
+
+        db.sync_call_target_clash(call_id, clashes)
+
+        return len(clashes)
+
+    @with_call_review(permission=PermissionType.VIEW, indirect_facility=True)
+    def view_call(self, db, call, can):
+        """
+        View handler for the call clash report custom route.
+        """
+
+        type_class = self.facility.get_call_types()
+
+        ctx = {
+            'title': 'Target Clashes: {} {} {}'.format(
+                call.semester_name, call.queue_name,
+                type_class.get_name(call.type)),
+            'call': call,
+            'target_moc_info': '.tool_clash_moc_info',
+        }
+
+        ctx.update(self._get_call_clash_summary(db, call, can))
+
+        return ctx
+
+    @with_call_review(permission=PermissionType.VIEW, indirect_facility=True)
+    def view_call_download(self, db, call, can):
+        """
+        View handler for the call clash report CSV download custom route.
+        """
+
+        type_class = self.facility.get_call_types()
+
+        summary = self._get_call_clash_summary(db, call, can)
+
+        writer = CSVWriter()
+
+        writer.add_row([
+            'Proposal', 'Title', 'State', 'Targets', 'Clashing targets',
+            'Clashing target names', 'Coverage maps',
+        ])
+
+        for proposal in summary['proposals']:
+            writer.add_row([
+                proposal.code,
+                proposal.title,
+                ProposalState.get_name(proposal.state),
+                proposal.num_targets,
+                len(proposal.clash_targets),
+                ', '.join(proposal.clash_targets),
+                ', '.join(x.name for x in proposal.mocs.values()),
+            ])
+
+        return (
+            writer.get_csv(),
+            null_tuple(FileTypeInfo)._replace(mime='text/csv'),
+            'clashes-{}-{}-{}.csv'.format(
+                re.sub('[^-_a-z0-9]', '_', call.semester_name.lower()),
+                re.sub('[^-_a-z0-9]', '_', call.queue_name.lower()),
+                re.sub('[^-_a-z0-9]', '_', type_class.url_path(call.type))))
+
+    def _get_call_clash_summary(self, db, call, can):
+        """
+        Prepare the per-proposal summary of the stored target clashes
+        for a call.
+
+        The results are read from the database, as stored by
+        :meth:`check_call`, so that this does not need to perform
+        any coordinate searches itself.
+
+        :return: dictionary with entries `checked` (the date of the check,
+            or `None` if the call has not yet been checked) and
+            `proposals` (list of `ProposalClashSummary` tuples)
+        """
+
+        public = self._determine_public_constraint(db, auth_cache=can.cache)
+
+        check = db.search_call_clash(call_id=call.id).get(call.id)
+
+        num_targets = defaultdict(int)
+
+        for target in db.search_target(call_id=call.id).values():
+            if not (target.x is None or target.y is None):
+                num_targets[target.proposal_id] += 1
+
+        clash_targets = defaultdict(OrderedDict)
+        clash_mocs = defaultdict(dict)
+
+        for clash in db.search_target_clash(
+                call_id=call.id, public=public).values():
+            clash_targets[clash.proposal_id][clash.target_id] = \
+                clash.target_name
+            clash_mocs[clash.proposal_id][clash.moc_id] = TargetClashMOC(
+                clash.moc_id, clash.moc_name, clash.moc_public)
+
+        proposals = []
+
+        for proposal in db.search_proposal(
+                call_id=call.id,
+                state=ProposalState.submitted_states()).values():
+            proposals.append(ProposalClashSummary(
+                proposal.id,
+                self.facility.make_proposal_code(db, proposal),
+                proposal.title,
+                proposal.state,
+                num_targets[proposal.id],
+                list(clash_targets[proposal.id].values()),
+                OrderedDict(sorted(clash_mocs[proposal.id].items()))))
+
+        return {
+            'checked': (None if check is None else check.date),
+            'proposals': proposals,
+        }
+
     def view_moc_list(self, db):
         """
         View handler for MOC listing custom route.
@@ -244,7 +451,7 @@ class ClashTool(BaseTargetTool):
             raise HTTPNotFound('Coverage map not found.')
 
         try:
-            moc_fits = db.get_moc_fits(moc_id)
+            moc_fits = db.get_moc_fits(moc_id, stream=True)
         except NoSuchRecord:
             raise HTTPNotFound('The FITS file for this coverage map '
                                'appears to be missing.')
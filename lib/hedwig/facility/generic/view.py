@@ -113,6 +113,17 @@ class Generic(GenericAdmin, GenericHome, GenericProposal, GenericReview):
         # MOC order 12 corresponds to 52" cells.
         return 12
 
+    def get_target_overlap_radius(self):
+        """
+        Get the distance within which targets of different proposals
+        are considered to overlap, for the purpose of highlighting
+        possible duplicate observations in the proposal tabulation.
+
+        :return: the radius (degrees), or `None` to disable the check
+        """
+
+        return 1.0 / 60.0
+
     def get_target_tool_classes(self):
         """
         Get a tuple of the target tool classes which can be used
@@ -468,7 +468,8 @@ class GenericAdmin(object):
 
         type_class = self.get_call_types()
 
-        proposals = db.search_proposal(call_id=call_id, with_member_pi=True)
+        proposals = db.search_proposal(
+            call_id=call_id, with_member_pi=True, read_replica=True)
 
         return {
             'title': 'Proposals: {} {} {}'.format(
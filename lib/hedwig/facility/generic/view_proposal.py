@@ -19,13 +19,16 @@ from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
 from collections import namedtuple
+from threading import BoundedSemaphore, Lock
 
 from ...astro.coord import CoordSystem
 from ...astro.catalog import parse_source_list
 from ...email.format import render_email_template
 from ...config import get_config
-from ...error import ConsistencyError, NoSuchRecord, UserError
+from ...error import ConsistencyError, ConversionError, NoSuchRecord, \
+    UserError
 from ...file.info import determine_figure_type, determine_pdf_page_count
+from ...file.poll import process_proposal_pdf_page
 from ...publication.url import make_publication_url
 from ...type.collection import PrevProposalCollection, ResultCollection, \
     TargetCollection
@@ -51,6 +54,9 @@ CalculationExtra = namedtuple(
     Calculation._fields + ('calculator_name',
                            'inputs', 'outputs', 'mode_info', 'target_view'))
 
+_pdf_on_demand_lock = Lock()
+_pdf_on_demand_semaphore = None
+
 PrevProposalExtra = namedtuple(
     'PrevProposalExtra',
     PrevProposal._fields + ('links',))
@@ -140,6 +146,14 @@ class GenericProposal(object):
 
         return ctx
 
+    def _is_pdf_on_demand(self):
+        """
+        Determine whether PDF previews should be rendered on demand.
+        """
+
+        return get_config().get('proposal_pdf', 'on_demand').lower() in (
+            '1', 'yes', 'true')
+
     def _view_proposal_extra(self, db, proposal, extra_text_roles={}):
         """
         Method to gather additional information for the proposal view page.
@@ -152,6 +166,7 @@ class GenericProposal(object):
 
         proposal_text = db.get_all_proposal_text(proposal.id)
         proposal_pdf = db.search_proposal_pdf(proposal.id)
+        pdf_on_demand = self._is_pdf_on_demand()
 
         proposal_fig = db.search_proposal_figure(proposal.id,
                                                  with_caption=True,
@@ -193,6 +208,7 @@ class GenericProposal(object):
                 'role': role,
                 'text': proposal_text.get(role, None),
                 'pdf': proposal_pdf.get_role(role, None),
+                'pdf_on_demand': pdf_on_demand,
                 'fig': proposal_fig.values_by_role(role),
             }
 
@@ -1473,21 +1489,21 @@ class GenericProposal(object):
         if type_ is None:
             try:
                 return db.get_proposal_figure(
-                    proposal.id, role, fig_id, md5sum=md5sum)
+                    proposal.id, role, fig_id, md5sum=md5sum, stream=True)
             except NoSuchRecord:
                 raise HTTPNotFound('Figure not found.')
 
         elif type_ == 'thumbnail':
             try:
                 return db.get_proposal_figure_thumbnail(
-                    proposal.id, role, fig_id, md5sum=md5sum)
+                    proposal.id, role, fig_id, md5sum=md5sum, stream=True)
             except NoSuchRecord:
                 raise HTTPNotFound('Figure thumbnail not found.')
 
         elif type_ == 'preview':
             try:
                 return db.get_proposal_figure_preview(
-                    proposal.id, role, fig_id, md5sum=md5sum)
+                    proposal.id, role, fig_id, md5sum=md5sum, stream=True)
             except NoSuchRecord:
                 raise HTTPNotFound('Figure preview not found.')
 
@@ -1557,8 +1573,11 @@ class GenericProposal(object):
 
     @with_proposal(permission=PermissionType.VIEW)
     def view_case_view_pdf(self, db, proposal, can, role, md5sum):
+        role_class = self.get_text_roles()
+
         try:
-            return db.get_proposal_pdf(proposal.id, role, md5sum=md5sum)
+            return db.get_proposal_pdf(proposal.id, role, md5sum=md5sum,
+                                       stream=True)
         except NoSuchRecord:
             raise HTTPNotFound('{} PDF not found.'.format(
                 role_class.get_name(role).capitalize()))
@@ -1568,9 +1587,43 @@ class GenericProposal(object):
                                    md5sum):
         try:
             return db.get_proposal_pdf_preview(proposal.id, role, page,
-                                               md5sum=md5sum)
+                                               md5sum=md5sum, stream=True)
         except NoSuchRecord:
-            raise HTTPNotFound('PDF preview page not found.')
+            pass
+
+        # If on-demand rendering is enabled, and the PDF file has not
+        # yet been processed, render the requested page now rather than
+        # leaving it to wait for the whole file to be processed.
+        if self._is_pdf_on_demand():
+            pdf = db.search_proposal_pdf(
+                proposal_id=proposal.id, role=role, state=(
+                    AttachmentState.NEW, AttachmentState.PROCESSING)
+            ).get_single(None)
+
+            if (pdf is not None and pdf.md5sum == md5sum and
+                    0 < page <= pdf.pages):
+                semaphore = _get_pdf_on_demand_semaphore()
+
+                # Do not wait if the maximum number of pages are already
+                # being rendered, to avoid tying up further threads.
+                if not semaphore.acquire(False):
+                    raise HTTPNotFound(
+                        'PDF preview page not yet available, '
+                        'please try again later.')
+
+                try:
+                    return process_proposal_pdf_page(
+                        db, pdf.id, md5sum, page, timeout=int(
+                            get_config().get(
+                                'proposal_pdf', 'on_demand_timeout')))
+
+                except (ConsistencyError, ConversionError, NoSuchRecord):
+                    pass
+
+                finally:
+                    semaphore.release()
+
+        raise HTTPNotFound('PDF preview page not found.')
 
     @with_proposal(permission=PermissionType.EDIT)
     def view_calculation_manage(self, db, proposal, can, form):
@@ -1761,3 +1814,19 @@ class GenericProposal(object):
                 calculations.append(calculation)
 
         return calculations
+
+
+def _get_pdf_on_demand_semaphore():
+    """
+    Get the semaphore limiting the number of PDF pages rendered on demand
+    at the same time by this process.
+    """
+
+    global _pdf_on_demand_semaphore
+
+    with _pdf_on_demand_lock:
+        if _pdf_on_demand_semaphore is None:
+            _pdf_on_demand_semaphore = BoundedSemaphore(int(get_config().get(
+                'proposal_pdf', 'on_demand_concurrency')))
+
+        return _pdf_on_demand_semaphore
@@ -18,7 +18,7 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
-from collections import namedtuple, OrderedDict
+from collections import defaultdict, namedtuple, OrderedDict
 from datetime import datetime
 from itertools import izip
 import re
@@ -39,6 +39,7 @@ from ...type.enum import AffiliationType, Assessment, \
 from ...type.simple import Affiliation, Link, MemberPIInfo, \
     ProposalWithCode, Reviewer
 from ...type.util import null_tuple, with_can_edit
+from .tool_clash import ClashTool
 
 
 ProposalWithInviteRoles = namedtuple(
@@ -69,7 +70,8 @@ class GenericReview(object):
                 with_members=True, with_reviewers=True,
                 with_reviewer_role=(role_class.CTTEE_PRIMARY,
                                     role_class.CTTEE_SECONDARY),
-                with_decision=True, with_categories=True).values():
+                with_decision=True, with_categories=True,
+                read_replica=True).values():
             member_pi = proposal.members.get_pi(default=None)
 
             review_can = auth.for_review(
@@ -96,8 +98,23 @@ class GenericReview(object):
             'can_edit': can.edit,
             'call_id': call.id,
             'proposals': proposals,
+            'clash_tool_code': self._get_clash_tool_code(),
         }
 
+    def _get_clash_tool_code(self):
+        """
+        Determine the code of the facility's clash tool, if it has one,
+        for use in linking to its call clash report.
+
+        :return: the tool code, or `None` if there is no clash tool.
+        """
+
+        for target_tool in self.target_tools.values():
+            if isinstance(target_tool.tool, ClashTool):
+                return target_tool.code
+
+        return None
+
     @with_call_review(permission=PermissionType.VIEW)
     def view_review_call_tabulation(self, db, call, can):
         type_class = self.get_call_types()
@@ -160,12 +177,16 @@ class GenericReview(object):
         proposals = db.search_proposal(
             call_id=call.id, state=ProposalState.submitted_states(),
             with_members=True, with_reviewers=True, with_review_info=True,
-            with_decision=True, with_categories=with_extra)
+            with_decision=True, with_categories=with_extra,
+            read_replica=True)
 
         self.attach_review_extra(db, proposals)
 
         affiliations = db.search_affiliation(
-            queue_id=call.queue_id, hidden=False, with_weight_call_id=call.id)
+            queue_id=call.queue_id, hidden=False, with_weight_call_id=call.id,
+            read_replica=True)
+
+        target_overlap = self._get_proposal_target_overlap(db, call, proposals)
 
         proposal_list = []
         for proposal in proposals.values():
@@ -193,6 +214,7 @@ class GenericReview(object):
                     db, proposal.members, affiliations),
                 'can_edit_decision': auth.for_proposal_decision(
                     db, proposal, call=call, auth_cache=can.cache).edit,
+                'target_overlap': target_overlap.get(proposal.id, []),
             })
 
             if can_view_review:
@@ -243,15 +265,54 @@ class GenericReview(object):
             'affiliation_accepted': {},
             'affiliation_available': {},
             'affiliation_original': {},
+            'target_overlap_radius': self.get_target_overlap_radius(),
         }
 
+    def _get_proposal_target_overlap(self, db, call, proposals):
+        """
+        Find other proposals with targets near those of each proposal,
+        either in the same call or amongst the proposals' previous
+        proposals.
+
+        :return: dictionary of sorted lists of other proposal codes
+            by proposal identifier
+        """
+
+        radius = self.get_target_overlap_radius()
+
+        if radius is None or not proposals:
+            return {}
+
+        overlaps = db.search_target_overlap(
+            call_id=call.id, radius=radius,
+            state=ProposalState.submitted_states())
+
+        if not overlaps:
+            return {}
+
+        codes = {
+            x.id: self.make_proposal_code(db, x) for x in proposals.values()}
+
+        for prev_proposal in db.search_prev_proposal(
+                proposal_id=list(proposals.keys())).values():
+            if prev_proposal.proposal_id is not None:
+                codes.setdefault(
+                    prev_proposal.proposal_id, prev_proposal.proposal_code)
+
+        ans = defaultdict(set)
+
+        for overlap in overlaps:
+            ans[overlap.proposal_id].add(codes[overlap.other_proposal_id])
+
+        return {k: sorted(v) for (k, v) in ans.items()}
+
     def _get_proposal_tabulation_titles(self, tabulation):
         return (
             [
                 'Proposal', 'PI name', 'PI affiliation', 'Co-Investigators',
                 'Title', 'State',
                 'Decision', 'Exempt', 'Rating', 'Rating std. dev.',
-                'Categories',
+                'Categories', 'Overlapping proposals',
             ] +
             [x.name for x in tabulation['affiliations']]
         )
@@ -279,6 +340,7 @@ class GenericReview(object):
                     proposal['rating_std_dev'],
                     ', '.join(x.category_name
                               for x in proposal['categories'].values()),
+                    ', '.join(proposal['target_overlap']),
                 ] +
                 [proposal['affiliations'].get(x.id) for x in affiliations]
             )
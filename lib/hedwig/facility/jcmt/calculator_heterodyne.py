@@ -376,7 +376,7 @@ class HeterodyneCalculator(JCMTCalculator):
 
         new_input = input_.copy()
 
-        result = self(mode, input_)
+        result = self.calculate(mode, input_)
 
         if new_mode == self.CALC_TIME:
             if mode == self.CALC_RMS_FROM_ELAPSED_TIME:
@@ -669,51 +669,27 @@ class HeterodyneCalculator(JCMTCalculator):
                     'Negative square root error occurred during calculation.')
             raise
 
-        weather_band_comparison = OrderedDict()
         kwargs['with_extra_output'] = False
-        for (weather_band, weather_band_info) in \
-                JCMTWeather.get_available().items():
-            weather_band_result = {}
-            for condition_name in ('rep', 'min', 'max'):
-                condition_tau = getattr(weather_band_info, condition_name)
-                if condition_tau is None:
-                    weather_band_result[condition_name] = None
-                    continue
-
-                condition_result = None
-
-                try:
-                    if mode == self.CALC_TIME:
-                        condition_result = \
-                            self.itc.calculate_time(
-                                input_['rms'], tau_225=condition_tau,
-                                **kwargs) / 3600.0
-
-                    elif mode == self.CALC_RMS_FROM_ELAPSED_TIME:
-                        condition_result = \
-                            self.itc.calculate_rms_for_elapsed_time(
-                                input_['elapsed'] * 3600.0,
-                                tau_225=condition_tau, **kwargs)
 
-                    elif mode == self.CALC_RMS_FROM_INT_TIME:
-                        condition_result = \
-                            self.itc.calculate_rms_for_int_time(
-                                input_['int_time'], tau_225=condition_tau,
-                                **kwargs)
+        def weather_band_result(condition_tau):
+            if mode == self.CALC_TIME:
+                return self.itc.calculate_time(
+                    input_['rms'], tau_225=condition_tau, **kwargs) / 3600.0
 
-                except HeterodyneITCError as e:
-                    pass
-                except ZeroDivisionError:
-                    pass
-                except ValueError:
-                    pass
+            elif mode == self.CALC_RMS_FROM_ELAPSED_TIME:
+                return self.itc.calculate_rms_for_elapsed_time(
+                    input_['elapsed'] * 3600.0, tau_225=condition_tau,
+                    **kwargs)
 
-                weather_band_result[condition_name] = condition_result
+            elif mode == self.CALC_RMS_FROM_INT_TIME:
+                return self.itc.calculate_rms_for_int_time(
+                    input_['int_time'], tau_225=condition_tau, **kwargs)
 
-            weather_band_comparison[weather_band] = weather_band_result
+        extra['wb_comparison'] = self._make_weather_band_comparison(
+            weather_band_result,
+            (HeterodyneITCError, ZeroDivisionError, ValueError))
 
         primary_output = self.get_outputs(mode)[0]
-        extra['wb_comparison'] = weather_band_comparison
         extra['wb_comparison_format'] = primary_output.format
         extra['wb_comparison_unit'] = primary_output.unit
 
@@ -27,6 +27,8 @@ from .type import JCMTWeather
 
 
 class JCMTCalculator(BaseCalculator):
+    cache_results = True
+
     PositionTypeInfo = namedtuple('PositionTypeInfo', ('name', 'no_unit'))
 
     position_type = OrderedDict((
@@ -69,6 +71,54 @@ class JCMTCalculator(BaseCalculator):
             except KeyError:
                 raise ErrorPage('Invalid weather band "{}".', tau_band)
 
+    def _make_weather_band_comparison(self, func, exceptions):
+        """
+        Evaluate a function for the representative, minimum and maximum
+        tau values of each available weather band.
+
+        Adjacent bands share their boundary tau values, so the function
+        is evaluated only once for each distinct tau value.
+
+        :param func: function taking a 225 GHz tau value, and returning
+            the value to be displayed.
+        :param exceptions: tuple of exception classes which indicate that
+            the function could not be evaluated for a particular tau value,
+            in which case `None` is recorded.
+
+        :return: an `OrderedDict` by weather band of dictionaries
+            of values by condition name ("rep", "min" and "max").
+        """
+
+        weather_bands = JCMTWeather.get_available()
+        condition_names = ('rep', 'min', 'max')
+
+        tau_values = set()
+        for weather_band_info in weather_bands.values():
+            for condition_name in condition_names:
+                condition_tau = getattr(weather_band_info, condition_name)
+                if condition_tau is not None:
+                    tau_values.add(condition_tau)
+
+        results = {}
+        for tau in tau_values:
+            try:
+                results[tau] = func(tau)
+            except exceptions:
+                results[tau] = None
+
+        weather_band_comparison = OrderedDict()
+        for (weather_band, weather_band_info) in weather_bands.items():
+            weather_band_result = {}
+
+            for condition_name in condition_names:
+                condition_tau = getattr(weather_band_info, condition_name)
+                weather_band_result[condition_name] = (
+                    None if condition_tau is None else results[condition_tau])
+
+            weather_band_comparison[weather_band] = weather_band_result
+
+        return weather_band_comparison
+
     def _condense_merge_values(self, calculation, value_tuples):
         """
         Helper routine for the "condense_calculation" method.
@@ -233,7 +233,7 @@ class SCUBA2Calculator(JCMTCalculator):
 
         new_input = input_.copy()
 
-        output = self(mode, input_).output
+        output = self.calculate(mode, input_).output
 
         if mode == self.CALC_RMS and new_mode == self.CALC_TIME:
             del new_input['time']
@@ -420,35 +420,19 @@ class SCUBA2Calculator(JCMTCalculator):
                 output = {'time': time_tot / 3600.0}
 
                 # Make weather band comparison table.
-                weather_band_comparison = OrderedDict()
-                for (weather_band, weather_band_info) in \
-                        JCMTWeather.get_available().items():
-                    weather_band_result = {}
-                    for condition_name in ('rep', 'min', 'max'):
-                        condition_tau = getattr(weather_band_info,
-                                                condition_name)
-                        if condition_tau is None:
-                            weather_band_result[condition_name] = None
-                            continue
-
-                        try:
-                            transmission = self.itc.calculate_transmission(
-                                airmass,
-                                self.itc.calculate_tau(filter_, condition_tau))
-                            time_src = self.itc.calculate_time(
-                                map_mode, filter_, transmission,
-                                factor[filter_], input_['rms'])
-                            time_tot = time_src + self.itc.estimate_overhead(
-                                map_mode, time_src)
-                            weather_band_result[condition_name] = \
-                                time_tot / 3600.0
-
-                        except SCUBA2ITCError:
-                            weather_band_result[condition_name] = None
-
-                    weather_band_comparison[weather_band] = weather_band_result
-
-                extra['wb_comparison'] = weather_band_comparison
+                def weather_band_time(condition_tau):
+                    transmission = self.itc.calculate_transmission(
+                        airmass,
+                        self.itc.calculate_tau(filter_, condition_tau))
+                    time_src = self.itc.calculate_time(
+                        map_mode, filter_, transmission,
+                        factor[filter_], input_['rms'])
+                    time_tot = time_src + self.itc.estimate_overhead(
+                        map_mode, time_src)
+                    return time_tot / 3600.0
+
+                extra['wb_comparison'] = self._make_weather_band_comparison(
+                    weather_band_time, (SCUBA2ITCError,))
                 extra['wb_comparison_format'] = '{:.3f}'
                 extra['wb_comparison_unit'] = 'hours'
 
@@ -475,32 +459,14 @@ class SCUBA2Calculator(JCMTCalculator):
                     pass
 
                 # Make weather band comparison table.
-                weather_band_comparison = OrderedDict()
-                for (weather_band, weather_band_info) in \
-                        JCMTWeather.get_available().items():
-                    weather_band_result = {}
-                    for condition_name in ('rep', 'min', 'max'):
-                        condition_tau = getattr(weather_band_info,
-                                                condition_name)
-                        if condition_tau is None:
-                            weather_band_result[condition_name] = None
-                            continue
-
-                        try:
-                            transmission = self.itc.calculate_transmission(
-                                airmass,
-                                self.itc.calculate_tau(850, condition_tau))
-                            weather_band_result[condition_name] = \
-                                self.itc.calculate_rms(
-                                    map_mode, 850, transmission, factor[850],
-                                    time_src)
-
-                        except SCUBA2ITCError:
-                            weather_band_result[condition_name] = None
-
-                    weather_band_comparison[weather_band] = weather_band_result
-
-                extra['wb_comparison'] = weather_band_comparison
+                def weather_band_rms(condition_tau):
+                    transmission = self.itc.calculate_transmission(
+                        airmass, self.itc.calculate_tau(850, condition_tau))
+                    return self.itc.calculate_rms(
+                        map_mode, 850, transmission, factor[850], time_src)
+
+                extra['wb_comparison'] = self._make_weather_band_comparison(
+                    weather_band_rms, (SCUBA2ITCError,))
                 extra['wb_comparison_format'] = '{:.3f}'
                 extra['wb_comparison_unit'] = 'mJy/beam'
 
@@ -73,7 +73,7 @@ class JCMTPart(object):
 
         ans = JCMTRequestCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for iter_stmt in self._iter_stmt(stmt, iter_field, iter_list):
                 for row in conn.execute(
                         iter_stmt.order_by(jcmt_allocation.c.id.asc())):
@@ -94,7 +94,7 @@ class JCMTPart(object):
 
         ans = JCMTAvailableCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for row in conn.execute(stmt.order_by(jcmt_available.c.id.asc())):
                 ans[row['id']] = JCMTAvailable(**row)
 
@@ -120,7 +120,7 @@ class JCMTPart(object):
 
         ans = JCMTOptionsCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for iter_stmt in self._iter_stmt(stmt, iter_field, iter_list):
                 for row in conn.execute(iter_stmt):
                     ans[row['proposal_id']] = JCMTOptions(**row)
@@ -147,7 +147,7 @@ class JCMTPart(object):
 
         ans = JCMTRequestCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for iter_stmt in self._iter_stmt(stmt, iter_field, iter_list):
                 for row in conn.execute(
                         iter_stmt.order_by(jcmt_request.c.id.asc())):
@@ -188,7 +188,7 @@ class JCMTPart(object):
 
         ans = ResultCollection()
 
-        with self._transaction() as conn:
+        with self._read_transaction() as conn:
             for iter_stmt in self._iter_stmt(stmt, iter_field, iter_list):
                 for row in conn.execute(iter_stmt):
                     ans[row['reviewer_id']] = JCMTReview(*row)
@@ -0,0 +1,233 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from hashlib import md5
+import json
+import os
+import re
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import time
+
+from ..error import FormattedError
+from ..util import get_logger
+
+logger = get_logger(__name__)
+
+valid_name = re.compile('^[-_a-z0-9]+$')
+
+
+def make_render_cache_key(kind, md5sum, options):
+    """
+    Construct a render cache key.
+
+    :param kind: the kind of rendering, e.g. "pdf" or "figure".
+    :param md5sum: the MD5 sum of the file being rendered.
+    :param options: dictionary of rendering options, which must
+        be JSON serializable.
+
+    :return: a key which is distinct for each combination of the
+        arguments.
+    """
+
+    return md5(json.dumps(
+        [kind, md5sum, options], sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class RenderCache(object):
+    """
+    Disk cache of rendered images, such as the page images of
+    PDF files or previews and thumbnails of figures.
+
+    Each entry is a directory, named by the cache key, containing
+    a file for each named image.  Entries are written to a temporary
+    directory and then renamed, so that incomplete entries are never
+    read.  When an entry is added, if the cache has not been checked
+    within `expire_interval`, the least-recently used entries are
+    removed until the total size of the cache is within `max_size`.
+    The time of the last check is recorded by the modification time
+    of a stamp file in the cache directory, so that it is shared
+    between processes.
+
+    :param directory: the cache directory, which must already exist.
+    :param max_size: the maximum total size (bytes) of the cached files.
+    :param expire_interval: the minimum time (seconds) between checks
+        of the size of the cache.
+    """
+
+    def __init__(self, directory, max_size, expire_interval=300):
+        if not os.path.isdir(directory):
+            raise FormattedError(
+                'render cache directory {} does not exist', directory)
+
+        self.directory = directory
+        self.max_size = max_size
+        self.expire_interval = expire_interval
+
+    def get(self, key):
+        """
+        Retrieve an entry from the cache.
+
+        :return: a dictionary of image data by name, or `None` if the
+            entry was not found.
+        """
+
+        path = os.path.join(self.directory, key)
+
+        try:
+            files = {}
+
+            for name in os.listdir(path):
+                with open(os.path.join(path, name), 'rb') as f:
+                    files[name] = f.read()
+
+            os.utime(path, None)
+
+        except (IOError, OSError):
+            # The entry does not exist, or was removed by another
+            # process while we were reading it.
+            return None
+
+        logger.debug('Render cache hit for {}', key)
+
+        return files
+
+    def put(self, key, files):
+        """
+        Store an entry in the cache, and then remove old entries
+        if the cache is due to be checked and is larger than its
+        maximum size.
+
+        :param key: the cache key, e.g. from :func:`make_render_cache_key`.
+        :param files: dictionary of image data by name.
+        """
+
+        path = os.path.join(self.directory, key)
+
+        if os.path.exists(path):
+            return
+
+        temporary = mkdtemp(dir=self.directory, prefix='.tmp')
+
+        try:
+            for (name, data) in files.items():
+                if not valid_name.match(name):
+                    raise FormattedError('invalid render cache name {}', name)
+
+                with open(os.path.join(temporary, name), 'wb') as f:
+                    f.write(data)
+
+            try:
+                os.rename(temporary, path)
+            except OSError:
+                # Another process may have stored the same entry.
+                if not os.path.isdir(path):
+                    raise
+
+        finally:
+            if os.path.exists(temporary):
+                rmtree(temporary)
+
+        if self._is_expire_due():
+            self.expire()
+
+    def _is_expire_due(self):
+        """
+        Determine whether the cache size should be checked, and if so
+        update the stamp file.
+        """
+
+        stamp = os.path.join(self.directory, '.expire')
+
+        try:
+            if os.path.getmtime(stamp) > time() - self.expire_interval:
+                return False
+
+        except OSError:
+            # The stamp file does not exist yet.
+            pass
+
+        with open(stamp, 'a'):
+            os.utime(stamp, None)
+
+        return True
+
+    def expire(self):
+        """
+        Remove least-recently used entries until the cache is within
+        its maximum size.
+
+        :return: the number of entries removed.
+        """
+
+        entries = []
+        total_size = 0
+
+        for key in os.listdir(self.directory):
+            if key.startswith('.'):
+                continue
+
+            path = os.path.join(self.directory, key)
+
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(path, x))
+                    for x in os.listdir(path))
+                entries.append((os.path.getmtime(path), key, size))
+            except OSError:
+                continue
+
+            total_size += size
+
+        n_removed = 0
+
+        for (mtime, key, size) in sorted(entries):
+            if total_size <= self.max_size:
+                break
+
+            logger.debug('Removing render cache entry {}', key)
+            self._remove(key)
+
+            total_size -= size
+            n_removed += 1
+
+        return n_removed
+
+    def _remove(self, key):
+        """
+        Remove an entry from the cache.
+
+        The entry is first moved into a temporary directory, so that
+        another process reading it sees either the whole entry or
+        none of it.
+        """
+
+        temporary = mkdtemp(dir=self.directory, prefix='.tmp')
+
+        try:
+            os.rename(os.path.join(self.directory, key),
+                      os.path.join(temporary, key))
+
+        except OSError:
+            # The entry may already have been removed by another process.
+            pass
+
+        finally:
+            rmtree(temporary, ignore_errors=True)
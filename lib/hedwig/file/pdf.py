@@ -18,7 +18,12 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
+import os
+import re
+from shutil import rmtree
 import subprocess
+from tempfile import mkdtemp
+from threading import Timer
 
 from ..config import get_config
 from ..error import Error, ConversionError
@@ -58,6 +63,26 @@ def pdf_to_png(pdf, page_count=None, renderer='ghostscript', **kwargs):
         raise ConversionError('Unrecognised PDF renderer: {}', renderer)
 
 
+def pdf_page_to_png(pdf, page, renderer='ghostscript', **kwargs):
+    """
+    Convert a single page of a PDF file to a PNG image.
+
+    The arguments are as for :func:`pdf_to_png`, except that
+    the page number to convert is given instead of the page count.
+    """
+
+    if renderer == 'ghostscript':
+        pngs = _pdf_ps_to_png(pdf, page_count=page, pages=[page], **kwargs)
+
+    elif renderer == 'pdftocairo':
+        pngs = _pdf_to_cairo(pdf, FigureType.PNG, pages=[page], **kwargs)
+
+    else:
+        raise ConversionError('Unrecognised PDF renderer: {}', renderer)
+
+    return pngs[0]
+
+
 def pdf_to_svg(pdf, page, **kwargs):
     """
     Convert a given page of the PDF file to SVG format.
@@ -84,9 +109,19 @@ def ps_to_png(ps, page_count=None, **kwargs):
     return _pdf_ps_to_png(ps, page_count=page_count, **kwargs)
 
 
-def _pdf_ps_to_png(buff, page_count, resolution=100, downscale=4):
+def _pdf_ps_to_png(buff, page_count, resolution=100, downscale=4,
+                   multi_page=True, pages=None, timeout=None):
     """
     Implements PDF or PS conversion to PDF via Ghostscript.
+
+    If `multi_page` is specified, and there is more than one page, then
+    Ghostscript is run once to write all of the pages to a temporary
+    directory.  Otherwise it is run separately for each page.
+
+    If a list of `pages` (by page number) is given, only those pages
+    are converted, each by a separate run of Ghostscript.
+
+    The `timeout` is passed to :func:`_run_converter`.
     """
 
     global ghostscript_version
@@ -127,56 +162,81 @@ def _pdf_ps_to_png(buff, page_count, resolution=100, downscale=4):
     if ghostscript_has_downscale:
         ghostscript_options.append('-dDownScaleFactor={}'.format(downscale))
 
+    if pages is None:
+        pages = range(1, page_count + 1)
+    else:
+        multi_page = False
+
     # Convert pages to images using Ghostscript.
-    pages = []
+    rendered_pages = []
 
     try:
-        for i in range(0, page_count):
-            p = subprocess.Popen(
-                [ghostscript] + ghostscript_options + [
-                    '-dFirstPage={}'.format(i + 1),
-                    '-dLastPage={}'.format(i + 1),
-                    '-sOutputFile=-',
-                    '-'
-                ],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE)
-
-            (stdoutdata, stderrdata) = p.communicate(buff)
-
-            if p.returncode:
-                raise ConversionError('PDF/PS to PNG conversion failed: ' +
-                                      stderrdata.replace('\n', ' ').strip())
-
-            # If we need to downscale but our Ghostscript doesn't support that
-            # feature, scale using Pillow instead.
-            if (not ghostscript_has_downscale) and (downscale != 1):
-                from PIL import Image
-                from .image import _read_image, _write_image
-                im = _read_image(stdoutdata)
-                (width, height) = im.size
-                stdoutdata = _write_image(im.resize(
-                    (int(width / downscale), int(height / downscale)),
-                    resample=Image.BICUBIC))
-
-            pages.append(stdoutdata)
+        if multi_page and page_count > 1:
+            temp_dir = mkdtemp(prefix='hedwig_gs_')
+
+            try:
+                _run_converter(
+                    [ghostscript] + ghostscript_options + [
+                        '-dFirstPage=1',
+                        '-dLastPage={}'.format(page_count),
+                        '-sOutputFile={}'.format(
+                            os.path.join(temp_dir, 'page_%d.png')),
+                        '-'
+                    ],
+                    buff, 'PDF/PS to PNG conversion failed: ', timeout)
+
+                rendered_pages = _read_page_files(
+                    temp_dir, 'page_', '.png', pages)
+
+            finally:
+                rmtree(temp_dir)
+
+        else:
+            for page in pages:
+                rendered_pages.append(_run_converter(
+                    [ghostscript] + ghostscript_options + [
+                        '-dFirstPage={}'.format(page),
+                        '-dLastPage={}'.format(page),
+                        '-sOutputFile=-',
+                        '-'
+                    ],
+                    buff, 'PDF/PS to PNG conversion failed: ', timeout))
 
     except OSError as e:
         raise ConversionError('Failed to run {}: {}', ghostscript, e.strerror)
 
-    return pages
+    # If we need to downscale but our Ghostscript doesn't support that
+    # feature, scale using Pillow instead.
+    if (not ghostscript_has_downscale) and (downscale != 1):
+        from PIL import Image
+        from .image import _read_image, _write_image
 
+        for (i, page) in enumerate(rendered_pages):
+            im = _read_image(page)
+            (width, height) = im.size
+            rendered_pages[i] = _write_image(im.resize(
+                (int(width / downscale), int(height / downscale)),
+                resample=Image.BICUBIC))
 
-def _pdf_to_cairo(buff, type_, pages, resolution=100, downscale=None):
+    return rendered_pages
+
+
+def _pdf_to_cairo(buff, type_, pages, resolution=100, downscale=None,
+                  multi_page=True, timeout=None):
     """
     Process a PDF file using pdftocairo.
 
     The arguments specify the desired figure type (PNG or SVG) and a list
     of the pages (by page number) to process.
 
+    If `multi_page` is specified, PNG output is requested and the pages
+    form a consecutive sequence, then pdftocairo is run once to write all
+    of the pages to a temporary directory.  Otherwise it is run separately
+    for each page.
+
     The `downscale` argument is ignored (it is present for compatibility
-    with the equivalent ghostscript-based method).
+    with the equivalent ghostscript-based method).  The `timeout` is
+    passed to :func:`_run_converter`.
     """
 
     pdftocairo = get_config().get('utilities', 'pdftocairo')
@@ -185,13 +245,19 @@ def _pdf_to_cairo(buff, type_, pages, resolution=100, downscale=None):
         '-q',
     ]
 
+    multi_page = (multi_page and (type_ == FigureType.PNG) and
+                  (len(pages) > 1) and
+                  (list(pages) == list(range(pages[0], pages[-1] + 1))))
+
     if type_ == FigureType.PNG:
         pdftocairo_options.extend([
             '-png',
-            '-singlefile',
             '-r', str(resolution),
         ])
 
+        if not multi_page:
+            pdftocairo_options.append('-singlefile')
+
     elif type_ == FigureType.SVG:
         pdftocairo_options.extend([
             '-svg',
@@ -206,26 +272,120 @@ def _pdf_to_cairo(buff, type_, pages, resolution=100, downscale=None):
     rendered_pages = []
 
     try:
-        for page in pages:
-            p = subprocess.Popen(
-                [pdftocairo] + pdftocairo_options + [
-                    '-f', str(page),
-                    '-l', str(page),
-                    '-', '-',
-                ],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE)
+        if multi_page:
+            temp_dir = mkdtemp(prefix='hedwig_cairo_')
+
+            try:
+                _run_converter(
+                    [pdftocairo] + pdftocairo_options + [
+                        '-f', str(pages[0]),
+                        '-l', str(pages[-1]),
+                        '-', os.path.join(temp_dir, 'page'),
+                    ],
+                    buff, 'PDF conversion (pdftocairo) failed: ', timeout)
+
+                rendered_pages = _read_page_files(
+                    temp_dir, 'page-', '.png', pages)
+
+            finally:
+                rmtree(temp_dir)
+
+        else:
+            for page in pages:
+                rendered_pages.append(_run_converter(
+                    [pdftocairo] + pdftocairo_options + [
+                        '-f', str(page),
+                        '-l', str(page),
+                        '-', '-',
+                    ],
+                    buff, 'PDF conversion (pdftocairo) failed: ', timeout))
+
+    except OSError as e:
+        raise ConversionError('Failed to run {}: {}', pdftocairo, e.strerror)
+
+    return rendered_pages
 
+
+def _run_converter(command, buff, error_prefix, timeout=None):
+    """
+    Run a conversion program, passing the given buffer as its standard
+    input.
+
+    If a `timeout` (seconds) is given, the program is killed if it
+    has not finished within that time.
+
+    :return: the program's standard output.
+
+    :raises ConversionError: if the program exits with non-zero status,
+        with a message made from the given prefix and the program's
+        standard error, or if it was killed due to the timeout.
+    """
+
+    p = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE)
+
+    if timeout is None:
+        (stdoutdata, stderrdata) = p.communicate(buff)
+
+    else:
+        timer = Timer(timeout, p.kill)
+        timer.start()
+
+        try:
             (stdoutdata, stderrdata) = p.communicate(buff)
 
-            if p.returncode:
-                raise ConversionError('PDF conversion (pdftocairo) failed: ' +
-                                      stderrdata.replace('\n', ' ').strip())
+        finally:
+            timed_out = not timer.is_alive()
+            timer.cancel()
 
-            rendered_pages.append(stdoutdata)
+        if timed_out and p.returncode:
+            raise ConversionError(
+                error_prefix + 'did not complete within {} seconds', timeout)
 
-    except OSError as e:
-        raise ConversionError('Failed to run {}: {}', pdftocairo, e.strerror)
+    if p.returncode:
+        raise ConversionError(
+            error_prefix + stderrdata.replace('\n', ' ').strip())
+
+    return stdoutdata
+
+
+def _read_page_files(directory, prefix, suffix, pages):
+    """
+    Read the page files written by a conversion program into the given
+    directory.
+
+    The file names are expected to consist of the prefix, the page
+    number (which may be zero-padded) and the suffix.
+
+    :return: list of the file contents, in the order given by `pages`.
+
+    :raises ConversionError: if the set of files found does not match
+        the expected list of page numbers.
+    """
+
+    pattern = re.compile(
+        '^' + re.escape(prefix) + '(\\d+)' + re.escape(suffix) + '$')
+
+    files = {}
+
+    for filename in os.listdir(directory):
+        m = pattern.match(filename)
+
+        if m:
+            files[int(m.group(1))] = os.path.join(directory, filename)
+
+    if sorted(files.keys()) != sorted(pages):
+        raise ConversionError(
+            'PDF conversion generated unexpected pages: {!r}',
+            sorted(files.keys()))
+
+    rendered_pages = []
+
+    for page in pages:
+        with open(files[page], 'rb') as f:
+            rendered_pages.append(f.read())
 
     return rendered_pages
@@ -18,42 +18,51 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
+from collections import namedtuple
+from functools import partial
+from hashlib import md5
+from multiprocessing import Pool
+from Queue import Empty, Queue
+from time import time
+
 from ..config import get_config
 from ..error import ConsistencyError, ConversionError
 from ..type.enum import AttachmentState, FigureType
-from ..util import get_logger
+from ..util import get_logger, list_in_blocks
+from .cache import RenderCache, make_render_cache_key
 from .image import create_thumbnail_and_preview
 from .moc import read_moc
-from .pdf import pdf_to_png, ps_to_png
+from .pdf import pdf_page_to_png, pdf_to_png, ps_to_png
 
 logger = get_logger(__name__)
 
+_CachedResult = namedtuple('_CachedResult', ('result',))
+
 
-def process_moc(db):
+def process_moc(db, workers=None, timeout=600):
     """
     Function to process new clash tool MOC files by importing their cells
     into the "moc_cell" database table in order to make them searchable.
+
+    If a number of `workers` is specified, the MOC files are read
+    in a pool of that many processes.  See :func:`_run_jobs`.
+    The cells of each MOC are then stored individually since
+    :meth:`~hedwig.db.part.calculator.CalculatorPart.update_moc_cell`
+    already writes them in blocks.
     """
 
     n_processed = 0
 
-    for moc_info in db.search_moc(facility_id=None, public=None,
-                                  state=AttachmentState.NEW).values():
-        logger.debug('Importing MOC {}', moc_info.id)
-
+    for (moc_id, moc, error) in _run_jobs(
+            _read_moc, _claim_moc(db), workers, timeout):
         try:
-            db.update_moc(moc_id=moc_info.id, state=AttachmentState.PROCESSING,
-                          state_prev=AttachmentState.NEW)
-        except ConsistencyError:
-            continue
+            if error is not None:
+                raise error
 
-        try:
-            moc = read_moc(buff=db.get_moc_fits(moc_info.id))
-
-            db.update_moc_cell(moc_info.id, moc)
+            db.update_moc_cell(moc_id, moc)
 
             try:
-                db.update_moc(moc_id=moc_info.id, state=AttachmentState.READY,
+                db.update_moc(moc_id=moc_id, state=AttachmentState.READY,
                               state_prev=AttachmentState.PROCESSING)
 
                 n_processed += 1
@@ -62,15 +71,23 @@ def process_moc(db):
                 continue
 
         except Exception as e:
-            logger.error('Error importing MOC {}: {}', moc_info.id, e.message)
-            db.update_moc(moc_id=moc_info.id, state=AttachmentState.ERROR)
+            logger.error('Error importing MOC {}: {}', moc_id, e.message)
+            db.update_moc(moc_id=moc_id, state=AttachmentState.ERROR)
 
     return n_processed
 
 
-def process_proposal_figure(db):
+def process_proposal_figure(db, workers=None, timeout=600):
     """
     Function to process pending proposal figure uploads.
+
+    If a number of `workers` is specified, the figures are processed
+    in a pool of that many processes.  See :func:`_run_jobs`.
+    The results are stored in blocks of up to the same number of figures.
+
+    If a render cache is configured, figures for which preview and
+    thumbnail images were previously prepared (with the same options)
+    are not processed again.
     """
 
     config = get_config()
@@ -86,9 +103,146 @@ def process_proposal_figure(db):
         'resolution': int(config.get('proposal_fig', 'resolution')),
         'downscale': int(config.get('proposal_fig', 'downscale')),
     }
+    pdf_renderer = config.get('proposal_fig', 'pdf_renderer')
+    render_cache = _get_render_cache()
+    cache_keys = {}
 
     n_processed = 0
 
+    jobs = _claim_proposal_figure(
+        db, render_cache, cache_keys, pdf_renderer, pdf_ps_options,
+        thumb_preview_options)
+
+    for results in list_in_blocks(_run_jobs(
+            _process_figure, jobs, workers, timeout), workers or 1):
+        alternates = {}
+
+        for (figure_id, result, error) in results:
+            if error is None:
+                alternates[figure_id] = result
+
+            else:
+                logger.error('Error converting figure {}: {}',
+                             figure_id, error.message)
+                db.update_proposal_figure(
+                    proposal_id=None, role=None, fig_id=figure_id,
+                    state=AttachmentState.ERROR)
+
+        for (figure_id, error) in _store_results(
+                db.set_proposal_figure_alternate_ready, alternates):
+            if error is not None:
+                logger.error('Error storing figure {}: {}',
+                             figure_id, error.message)
+                db.update_proposal_figure(
+                    proposal_id=None, role=None, fig_id=figure_id,
+                    state=AttachmentState.ERROR)
+                continue
+
+            n_processed += 1
+
+            if figure_id in cache_keys:
+                (preview, thumbnail) = alternates[figure_id]
+                entry = {'thumbnail': thumbnail}
+                if preview is not None:
+                    entry['preview'] = preview
+
+                _put_render_cache(
+                    render_cache, cache_keys.pop(figure_id), entry)
+
+    return n_processed
+
+
+def process_proposal_pdf(db, workers=None, timeout=600):
+    """
+    Function to process pending proposal PDF uploads.
+
+    If a number of `workers` is specified, the PDF files are processed
+    in a pool of that many processes.  See :func:`_run_jobs`.
+    The results are stored in blocks of up to the same number of files.
+
+    If a render cache is configured, PDF files which were previously
+    rendered (with the same options) are not rendered again.
+    """
+
+    pdf_options = _get_pdf_options()
+    render_cache = _get_render_cache()
+    cache_keys = {}
+
+    n_processed = 0
+
+    jobs = _claim_proposal_pdf(db, render_cache, cache_keys, pdf_options)
+
+    for results in list_in_blocks(_run_jobs(
+            _process_pdf, jobs, workers, timeout), workers or 1):
+        pdf_pngs = {}
+
+        for (pdf_id, pngs, error) in results:
+            if error is None:
+                pdf_pngs[pdf_id] = pngs
+
+            else:
+                logger.error('Error converting PDF {}: {}',
+                             pdf_id, error.message)
+                db.update_proposal_pdf(pdf_id, state=AttachmentState.ERROR)
+
+        # PDF files which are not updated because another process
+        # (e.g. new upload) has altered their state are skipped.
+        for (pdf_id, error) in _store_results(
+                db.set_proposal_pdf_preview_ready, pdf_pngs):
+            if error is not None:
+                logger.error('Error storing PDF {}: {}',
+                             pdf_id, error.message)
+                db.update_proposal_pdf(pdf_id, state=AttachmentState.ERROR)
+                continue
+
+            n_processed += 1
+
+            if pdf_id in cache_keys:
+                _put_render_cache(render_cache, cache_keys.pop(pdf_id), {
+                    'page_{:04d}'.format(n): png
+                    for (n, png) in enumerate(pdf_pngs[pdf_id], 1)})
+
+    return n_processed
+
+
+def _claim_moc(db):
+    """
+    Generator to claim new MOC files for processing.
+
+    Each MOC is only claimed (i.e. moved to the PROCESSING state)
+    when the next job is required, so that MOCs are not held in
+    the PROCESSING state while waiting for a worker.
+
+    :return: `(id, args)` job tuples for :func:`_run_jobs`
+    """
+
+    for moc_info in db.search_moc(facility_id=None, public=None,
+                                  state=AttachmentState.NEW).values():
+        logger.debug('Importing MOC {}', moc_info.id)
+
+        try:
+            db.update_moc(moc_id=moc_info.id,
+                          state=AttachmentState.PROCESSING,
+                          state_prev=AttachmentState.NEW)
+        except ConsistencyError:
+            continue
+
+        yield (moc_info.id, (db.get_moc_fits(moc_info.id),))
+
+
+def _claim_proposal_figure(
+        db, render_cache, cache_keys, pdf_renderer, pdf_ps_options,
+        thumb_preview_options):
+    """
+    Generator to claim new proposal figures for processing.
+
+    Figures with images in the render cache are given as
+    `_CachedResult` tuples.  Otherwise the cache key is recorded
+    in the `cache_keys` dictionary, if a render cache is configured.
+
+    :return: `(id, args)` job tuples for :func:`_run_jobs`
+    """
+
     for figure_info in db.search_proposal_figure(
             state=AttachmentState.NEW).values():
         logger.debug('Processing figure {}', figure_info.id)
@@ -104,124 +258,389 @@ def process_proposal_figure(db):
         figure = db.get_proposal_figure(
             proposal_id=None, role=None, id_=figure_info.id)
 
+        if render_cache is not None:
+            cache_key = make_render_cache_key(
+                'figure', md5(figure.data).hexdigest(), {
+                    'type': figure.type,
+                    'pdf_renderer': pdf_renderer,
+                    'pdf_ps_options': pdf_ps_options,
+                    'thumb_preview_options': thumb_preview_options,
+                })
+
+            entry = render_cache.get(cache_key)
+
+            if (entry is not None and 'thumbnail' in entry and (
+                    'preview' in entry or
+                    not FigureType.needs_preview(figure.type))):
+                yield (figure_info.id, _CachedResult((
+                    entry.get('preview'), entry['thumbnail'])))
+                continue
+
+            cache_keys[figure_info.id] = cache_key
+
+        yield (figure_info.id, (
+            figure.data, figure.type, pdf_renderer,
+            pdf_ps_options, thumb_preview_options))
+
+
+def _claim_proposal_pdf(db, render_cache, cache_keys, pdf_options):
+    """
+    Generator to claim new proposal PDF files for processing.
+
+    PDF files with images in the render cache are given as
+    `_CachedResult` tuples.  Otherwise the cache key is recorded
+    in the `cache_keys` dictionary, if a render cache is configured.
+
+    :return: `(id, args)` job tuples for :func:`_run_jobs`
+    """
+
+    for pdf in db.search_proposal_pdf(state=AttachmentState.NEW).values():
+        logger.debug('Processing PDF {}', pdf.id)
+
         try:
-            # Create figure preview if necessary.
-            preview = None
+            db.update_proposal_pdf(
+                pdf.id,
+                state=AttachmentState.PROCESSING,
+                state_prev=AttachmentState.NEW)
+        except ConsistencyError:
+            continue
 
-            if FigureType.needs_preview(figure.type):
-                if figure.type == FigureType.PDF:
-                    pngs = pdf_to_png(
-                        figure.data,
-                        renderer=config.get('proposal_fig', 'pdf_renderer'),
-                        **pdf_ps_options)
+        buff = db.get_proposal_pdf(proposal_id=None, role=None,
+                                   id_=pdf.id).data
 
-                    if len(pngs) != 1:
-                        raise ConversionError(
-                            'PDF figure did not generate one page')
+        if render_cache is not None:
+            cache_key = make_render_cache_key(
+                'pdf', md5(buff).hexdigest(), pdf_options)
 
-                    preview = pngs[0]
+            entry = render_cache.get(cache_key)
 
-                elif figure.type == FigureType.PS:
-                    pngs = ps_to_png(figure.data, **pdf_ps_options)
+            if entry is not None and len(entry) == pdf.pages:
+                yield (pdf.id, _CachedResult([
+                    entry[x] for x in sorted(entry.keys())]))
+                continue
 
-                    if len(pngs) != 1:
-                        raise ConversionError(
-                            'PS/EPS figure did not generate one page')
+            cache_keys[pdf.id] = cache_key
 
-                    preview = pngs[0]
+        yield (pdf.id, (buff, pdf.pages, pdf_options))
 
-                else:
-                    raise ConversionError(
-                        'Do not know how to make preview of type {}',
-                        FigureType.get_name(figure.type))
 
-            # Create figure thumbnail.
-            tp = create_thumbnail_and_preview(
-                figure.data if preview is None else preview,
-                **thumb_preview_options)
+def _store_results(store, results):
+    """
+    Store a block of results using a database method which takes
+    a dictionary of results by identifier, in a single transaction,
+    and returns the identifiers of the entries which it updated.
 
-            if tp.preview is not None:
-                preview = tp.preview
+    If this fails, each result is stored individually, so that one
+    problematic entry does not prevent the rest of the block from
+    being stored.
 
-            # Store the processed data.
-            if preview is not None:
-                db.set_proposal_figure_preview(figure_info.id, preview)
+    :return: list of `(id, error)` tuples for the entries which were
+        updated or could not be stored
+    """
 
-            db.set_proposal_figure_thumbnail(figure_info.id, tp.thumbnail)
+    if not results:
+        return []
 
-            try:
-                db.update_proposal_figure(
-                    proposal_id=None, role=None, fig_id=figure_info.id,
-                    state=AttachmentState.READY,
-                    state_prev=AttachmentState.PROCESSING)
+    try:
+        return [(x, None) for x in store(results)]
 
-                n_processed += 1
+    except Exception:
+        logger.exception('Error storing block of results')
 
-            except ConsistencyError:
-                continue
+    ans = []
+
+    for (id_, result) in results.items():
+        try:
+            ans.extend((x, None) for x in store({id_: result}))
 
         except Exception as e:
-            logger.error('Error converting figure {}: {}',
-                         figure_info.id, e.message)
-            db.update_proposal_figure(
-                proposal_id=None, role=None, fig_id=figure_info.id,
-                state=AttachmentState.ERROR)
+            ans.append((id_, e))
 
-    return n_processed
+    return ans
 
 
-def process_proposal_pdf(db):
+def process_proposal_pdf_page(db, pdf_id, md5sum, page, timeout=None):
     """
-    Function to process pending proposal PDF uploads.
+    Function to render a single page of a proposal PDF file on demand.
+
+    This allows the preview of a page which a user has requested to be
+    prepared without waiting for :func:`process_proposal_pdf` to reach
+    the PDF file.  The image is stored in the database, but the state of
+    the PDF file is not changed, so the remaining pages will still be
+    rendered by the usual processing.
+
+    The PDF file is only read if it still has the given MD5 sum, and
+    the image is only stored if this is still the case afterwards, so
+    that a page is never stored for a different version of the file.
+
+    :return: the PNG image of the page.
+
+    :raises NoSuchRecord: if the PDF file does not have the given MD5 sum.
+    :raises ConversionError: if the page could not be rendered, including
+        if rendering did not complete within `timeout` seconds.
+    """
+
+    buff = db.get_proposal_pdf(
+        proposal_id=None, role=None, id_=pdf_id, md5sum=md5sum).data
+
+    logger.debug('Rendering PDF {} page {} on demand', pdf_id, page)
+
+    png = pdf_page_to_png(buff, page, timeout=timeout, **_get_pdf_options())
+
+    db.set_proposal_pdf_preview_page(pdf_id, page, png, md5sum=md5sum)
+
+    return png
+
+
+def _get_pdf_options():
+    """
+    Get the PDF rendering options from the configuration.
     """
 
     config = get_config()
-    pdf_options = {
+
+    return {
         'renderer': config.get('proposal_pdf', 'renderer'),
         'resolution': int(config.get('proposal_pdf', 'resolution')),
         'downscale': int(config.get('proposal_pdf', 'downscale')),
     }
 
-    n_processed = 0
 
-    for pdf in db.search_proposal_pdf(
-            state=AttachmentState.NEW).values():
-        logger.debug('Processing PDF {}', pdf.id)
+def _get_render_cache():
+    """
+    Get the render cache, if one is configured.
 
-        try:
-            db.update_proposal_pdf(
-                pdf.id,
-                state=AttachmentState.PROCESSING,
-                state_prev=AttachmentState.NEW)
-        except ConsistencyError:
-            continue
+    :return: a :class:`~hedwig.file.cache.RenderCache` object or `None`.
+    """
 
-        buff = db.get_proposal_pdf(proposal_id=None, role=None,
-                                   id_=pdf.id).data
+    config = get_config()
 
-        try:
-            pngs = pdf_to_png(buff, **pdf_options)
+    directory = config.get('render_cache', 'directory')
+
+    if not directory:
+        return None
+
+    return RenderCache(
+        directory, int(config.get('render_cache', 'max_size')) * 1024 * 1024)
+
+
+def _put_render_cache(render_cache, key, entry):
+    """
+    Store an entry in the render cache.
+
+    This is done after the results have been stored in the database,
+    and any error is only logged, since the cache is not required
+    for the results to be used.
+    """
+
+    try:
+        render_cache.put(key, entry)
+
+    except Exception:
+        logger.exception('Error storing render cache entry {}', key)
+
+
+def _read_moc(buff):
+    """
+    Job function to read a MOC file.
+    """
+
+    return read_moc(buff=buff)
+
+
+def _process_figure(data, type_, pdf_renderer, pdf_ps_options,
+                    thumb_preview_options):
+    """
+    Job function to prepare the preview and thumbnail images for a figure.
+
+    :return: a `(preview, thumbnail)` tuple, where the preview may be
+        `None` if the figure can be displayed directly.
+    """
+
+    # Create figure preview if necessary.
+    preview = None
+
+    if FigureType.needs_preview(type_):
+        if type_ == FigureType.PDF:
+            pngs = pdf_to_png(data, renderer=pdf_renderer, **pdf_ps_options)
+
+            if len(pngs) != 1:
+                raise ConversionError(
+                    'PDF figure did not generate one page')
+
+            preview = pngs[0]
 
-            if len(pngs) != pdf.pages:
-                raise ConversionError('PDF generated wrong number of pages')
+        elif type_ == FigureType.PS:
+            pngs = ps_to_png(data, **pdf_ps_options)
 
-            db.set_proposal_pdf_preview(pdf.id, pngs)
+            if len(pngs) != 1:
+                raise ConversionError(
+                    'PS/EPS figure did not generate one page')
+
+            preview = pngs[0]
+
+        else:
+            raise ConversionError(
+                'Do not know how to make preview of type {}',
+                FigureType.get_name(type_))
+
+    # Create figure thumbnail.
+    tp = create_thumbnail_and_preview(
+        data if preview is None else preview,
+        **thumb_preview_options)
+
+    if tp.preview is not None:
+        preview = tp.preview
+
+    return (preview, tp.thumbnail)
+
+
+def _process_pdf(buff, page_count, pdf_options):
+    """
+    Job function to render the pages of a PDF file.
+    """
+
+    pngs = pdf_to_png(buff, **pdf_options)
+
+    if len(pngs) != page_count:
+        raise ConversionError('PDF generated wrong number of pages')
+
+    return pngs
+
+
+def _run_jobs(func, jobs, workers=None, timeout=600):
+    """
+    Apply a job function to a sequence of jobs.
+
+    Each job should be given as an `(id, args)` tuple, where `args`
+    can also be a `_CachedResult` tuple if the result of the job is
+    already known.  The jobs can be given by a generator, which is
+    only advanced when the next job is required.  This generator
+    yields `(id, result, error)` tuples, in the order in which the jobs
+    complete, where `error` is the exception raised by the job function
+    (in which case `result` is `None`).
+
+    If `workers` is specified (and greater than 1), the jobs are run in
+    a pool of that many processes, with a new job being given to the pool
+    whenever one completes.  This means that the job function does
+    not have access to the database and must only take (and return)
+    objects which can be pickled.  Jobs which fail to complete within
+    `timeout` seconds of being started (including any where the worker
+    process crashed) are reported as having failed.  Since a worker
+    process can not be stopped individually, the pool is then terminated
+    and the other jobs which were running are restarted in a new pool.
+    Otherwise the jobs are simply run in the current process.
+    """
+
+    if workers is None or workers <= 1:
+        for (id_, args) in jobs:
+            if isinstance(args, _CachedResult):
+                yield (id_, args.result, None)
+                continue
 
             try:
-                db.update_proposal_pdf(
-                    pdf.id,
-                    state=AttachmentState.READY,
-                    state_prev=AttachmentState.PROCESSING)
+                yield (id_, func(*args), None)
+            except Exception as e:
+                yield (id_, None, e)
 
-                n_processed += 1
+        return
+
+    jobs = iter(jobs)
+    jobs_exhausted = False
+    restart = []
+    running = {}
+    pool = completed = None
+
+    try:
+        while True:
+            while len(running) < workers:
+                if restart:
+                    (id_, args) = restart.pop(0)
+
+                elif jobs_exhausted:
+                    break
+
+                else:
+                    try:
+                        (id_, args) = next(jobs)
+                    except StopIteration:
+                        jobs_exhausted = True
+                        break
+
+                    if isinstance(args, _CachedResult):
+                        yield (id_, args.result, None)
+                        continue
 
-            except ConsitencyError:
-                # If another process (e.g. new upload) has altered the state,
-                # stop trying to process this PDF.
+                if pool is None:
+                    pool = Pool(processes=workers)
+                    completed = Queue()
+
+                pool.apply_async(
+                    _apply_job, (func, args),
+                    callback=partial(_put_job_result, completed, id_))
+
+                running[id_] = (args, time() + timeout)
+
+            if not running:
+                break
+
+            deadline = min(x[1] for x in running.values())
+
+            try:
+                (id_, result, error) = completed.get(
+                    timeout=max(0.0, deadline - time()))
+
+            except Empty:
+                now = time()
+
+                for (id_, (args, job_deadline)) in list(running.items()):
+                    if job_deadline <= now:
+                        del running[id_]
+
+                        yield (id_, None, ConversionError(
+                            'Processing did not complete within {} seconds',
+                            timeout))
+
+                    else:
+                        restart.append((id_, args))
+
+                running = {}
+                pool.terminate()
+                pool.join()
+                pool = completed = None
                 continue
 
-        except Exception as e:
-            logger.error('Error converting PDF {}: {}', pdf.id, e.message)
-            db.update_proposal_pdf(pdf.id, state=AttachmentState.ERROR)
+            del running[id_]
 
-    return n_processed
+            yield (id_, result, error)
+
+    finally:
+        if pool is not None:
+            if running:
+                pool.terminate()
+            else:
+                pool.close()
+
+            pool.join()
+
+
+def _apply_job(func, args):
+    """
+    Wrapper for job functions run in a process pool, returning a
+    `(result, error)` tuple so that the pool's callback is
+    called whether or not the job function raised an exception.
+    """
+
+    try:
+        return (func(*args), None)
+    except Exception as e:
+        return (None, e)
+
+
+def _put_job_result(queue, id_, value):
+    """
+    Callback function for process pool jobs, to add the job's
+    identifier and `(result, error)` tuple to the given queue.
+    """
+
+    queue.put((id_,) + value)
@@ -20,7 +20,6 @@ from __future__ import absolute_import, division, print_function, \
 
 import re
 import sys
-from threading import Lock
 
 from docutils import nodes
 from docutils.core import publish_parts
@@ -31,9 +30,6 @@ from docutils.transforms.frontmatter import DocTitle
 from ..config import get_home
 from ..web.util import HTTPError
 
-
-rst_publish_lock = Lock()
-
 named_link = re.compile('^(.*) +<(.*)>$')
 graph_path = re.compile('^graph\/([-_a-z0-9]+)\.dot$')
 
@@ -48,6 +44,11 @@ def rst_to_html(text, extract_title, start_heading):
     :return: a tuple containing the body, title and a list of TOC items
     """
 
+    # Each call gets its own list of TOC items, passed to the `toctree`
+    # directive via the settings, so that documents can be converted
+    # in several threads at once.
+    toc_items = []
+
     settings = {
         'file_insertion_enabled': False,
         'raw_enabled': False,
@@ -58,18 +59,16 @@ def rst_to_html(text, extract_title, start_heading):
         'smart_quotes': True,
         'doctitle_xform': extract_title,
         'sectsubtitle_xform': False,
+        'hedwig_toc_items': toc_items,
     }
 
-    with rst_publish_lock:
-        del HedwigTocTree.toc_items[:]
+    parts = publish_parts(
+        source=text,
+        reader=HedwigDocReader(),
+        writer_name='html',
+        settings_overrides=settings)
 
-        parts = publish_parts(
-            source=text,
-            reader=HedwigDocReader(),
-            writer_name='html',
-            settings_overrides=settings)
-
-        return (parts['body'], parts['title'], list(HedwigTocTree.toc_items))
+    return (parts['body'], parts['title'], toc_items)
 
 
 class HedwigDocReader(Reader):
@@ -105,6 +104,8 @@ class HedwigTocTree(Directive):
     Handler for the `toctree` directive.
 
     This allows the use of TOC trees in the Hedwig online help system.
+    The entries are appended to the `hedwig_toc_items` list in the
+    document settings (see :func:`rst_to_html`).
     """
 
     has_content = True
@@ -112,13 +113,13 @@ class HedwigTocTree(Directive):
         'maxdepth': int,
     }
 
-    toc_items = []
-
     def run(self):
+        toc_items = self.state.document.settings.hedwig_toc_items
+
         for line in self.content:
             line = line.strip()
             if line:
-                self.toc_items.append(line)
+                toc_items.append(line)
 
         return []
 
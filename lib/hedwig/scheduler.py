@@ -0,0 +1,288 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from collections import namedtuple
+from threading import Event, Lock, Thread
+from time import time
+
+from .error import FormattedError
+from .util import get_logger
+
+logger = get_logger(__name__)
+
+PollTaskStatistics = namedtuple(
+    'PollTaskStatistics',
+    ('runs', 'failures', 'processed',
+     'latency_last', 'latency_mean', 'latency_max', 'queue_depth'))
+
+
+class PollTask(object):
+    """
+    Class representing a type of task to be performed by the poll process.
+
+    :param name: name of the task.
+    :param function: function to call to perform the task.  It should
+        return the number of items processed.
+    :param message: format string used to log the number of items
+        processed, if non-zero.
+    :param interval: time (seconds) to wait between calls.
+    :param threads: number of threads to use to run the task concurrently.
+    :param max_backoff: maximum time (seconds) to wait after errors.
+        Consecutive errors double the wait time, up to this limit.
+    :param queue_depth: function to call to determine the number of
+        items waiting to be processed, or `None` if this can not
+        be determined.
+    """
+
+    def __init__(self, name, function, message, interval,
+                 threads=1, max_backoff=600, queue_depth=None):
+        self.name = name
+        self.function = function
+        self.message = message
+        self.interval = interval
+        self.threads = threads
+        self.max_backoff = max(interval, max_backoff)
+        self.queue_depth = queue_depth
+
+        self._lock = Lock()
+        self._runs = 0
+        self._failures = 0
+        self._processed = 0
+        self._latency_last = None
+        self._latency_total = 0.0
+        self._latency_max = None
+
+    def get_delay(self, n_failure):
+        """
+        Determine how long to wait before running the task again,
+        given the number of consecutive failures.
+        """
+
+        if not n_failure:
+            return self.interval
+
+        return min(self.interval * 2 ** min(n_failure, 32), self.max_backoff)
+
+    def record(self, latency, n_processed=None):
+        """
+        Record the result of running the task.
+
+        :param latency: time (seconds) taken.
+        :param n_processed: number of items processed, or `None`
+            if the task failed.
+        """
+
+        with self._lock:
+            self._runs += 1
+            self._latency_last = latency
+            self._latency_total += latency
+
+            if self._latency_max is None or latency > self._latency_max:
+                self._latency_max = latency
+
+            if n_processed is None:
+                self._failures += 1
+            else:
+                self._processed += n_processed
+
+    def get_statistics(self, with_queue_depth=False):
+        """
+        Get statistics for this task.
+
+        :param with_queue_depth: if true, call the task's `queue_depth`
+            function (if it has one).
+
+        :return: a `PollTaskStatistics` tuple.
+        """
+
+        queue_depth = None
+
+        if with_queue_depth and self.queue_depth is not None:
+            try:
+                queue_depth = self.queue_depth()
+            except Exception:
+                logger.exception('Error determining {} queue depth',
+                                 self.name)
+
+        with self._lock:
+            return PollTaskStatistics(
+                self._runs, self._failures, self._processed,
+                self._latency_last,
+                (None if not self._runs
+                 else self._latency_total / self._runs),
+                self._latency_max, queue_depth)
+
+
+class PollScheduler(object):
+    """
+    Scheduler to run poll tasks independently.
+
+    Each task is run repeatedly in its own thread(s) at its own interval
+    so that slow tasks do not delay the others.
+    """
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+
+        self._stop = Event()
+        self._threads = []
+
+    def start(self):
+        """
+        Start threads for all of the tasks.
+        """
+
+        for task in self.tasks:
+            for i in range(task.threads):
+                thread = Thread(target=self._run_task, args=(task,),
+                                name='poll-{}-{}'.format(task.name, i))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        """
+        Request that all task threads stop after their current run.
+        """
+
+        self._stop.set()
+
+    def join(self):
+        """
+        Wait for all task threads to finish.
+        """
+
+        for thread in self._threads:
+            thread.join()
+
+        self._threads = []
+
+    def run(self, report_interval=None):
+        """
+        Start the tasks and then wait until the scheduler is stopped.
+
+        If a `report_interval` (seconds) is given, statistics for each
+        task are logged at that interval.
+        """
+
+        self.start()
+
+        try:
+            while not self._stop.is_set():
+                # Always use a timeout so that the main thread
+                # remains responsive to signals.
+                self._stop.wait(report_interval or 60)
+
+                if report_interval and not self._stop.is_set():
+                    self.report()
+
+        finally:
+            self.stop()
+            self.join()
+
+    def report(self):
+        """
+        Log statistics for each task.
+        """
+
+        for (name, stats) in self.get_statistics(
+                with_queue_depth=True).items():
+            logger.info(
+                'Task {}: runs {} failures {} processed {} '
+                'latency last {} mean {} max {} queue {}',
+                name, stats.runs, stats.failures, stats.processed,
+                _format_seconds(stats.latency_last),
+                _format_seconds(stats.latency_mean),
+                _format_seconds(stats.latency_max),
+                ('-' if stats.queue_depth is None else stats.queue_depth))
+
+    def get_statistics(self, with_queue_depth=False):
+        """
+        Get statistics for all tasks.
+
+        :return: a dictionary of `PollTaskStatistics` tuples by task name.
+        """
+
+        return {
+            task.name: task.get_statistics(with_queue_depth=with_queue_depth)
+            for task in self.tasks}
+
+    def _run_task(self, task):
+        """
+        Repeatedly run the given task until the scheduler is stopped.
+        """
+
+        n_failure = 0
+
+        while not self._stop.is_set():
+            logger.debug('Running task {}', task.name)
+
+            start = time()
+
+            try:
+                n_processed = task.function()
+
+                n_failure = 0
+
+            except Exception:
+                logger.exception('Error running task {}', task.name)
+
+                n_processed = None
+                n_failure += 1
+
+            task.record(time() - start, n_processed)
+
+            if n_processed:
+                logger.info(task.message, n_processed)
+
+            self._stop.wait(task.get_delay(n_failure))
+
+
+def parse_task_values(text):
+    """
+    Parse a comma-separated list of task values.
+
+    For example "email:5,pdf:30" would be parsed as
+    `{'email': 5, 'pdf': 30}`.
+
+    :raises FormattedError: if the text can not be parsed.
+    """
+
+    values = {}
+
+    if not text:
+        return values
+
+    for entry in text.split(','):
+        try:
+            (name, value) = entry.split(':')
+            values[name.strip()] = int(value)
+
+        except ValueError:
+            raise FormattedError('Could not parse task value "{}"', entry)
+
+    return values
+
+
+def _format_seconds(value):
+    if value is None:
+        return '-'
+
+    return '{:.2f}s'.format(value)
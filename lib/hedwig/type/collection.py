@@ -21,8 +21,10 @@ from __future__ import absolute_import, division, print_function, \
 from collections import OrderedDict, namedtuple
 from math import sqrt
 
-from ..astro.coord import CoordSystem, coord_from_dec_deg, coord_to_dec_deg, \
-    format_coord, parse_coord
+import numpy as np
+
+from ..astro.coord import CoordSystem, coord_from_dec_deg, \
+    dec_deg_list_to_icrs, format_coord_list, parse_coord_list
 from ..error import NoSuchRecord, NoSuchValue, MultipleRecords, UserError
 from ..util import is_list_like, matches_constraint
 from .base import CollectionByProposal, CollectionOrdered, CollectionSortable
@@ -641,16 +643,26 @@ class TargetCollection(ResultCollection, CollectionOrdered,
         """
         Construct an `OrderedDict` in which the target values
         (`x`, `y`, `time`, `priority`) are replaced with formatted strings.
+
+        The coordinates of all of the targets are formatted together
+        using :func:`~hedwig.astro.coord.format_coord_list`.
         """
 
+        coord_keys = [
+            k for (k, v) in self.items()
+            if not (v.x is None or v.y is None)]
+
+        (coord_x, coord_y) = format_coord_list(
+            [self[k].system for k in coord_keys],
+            [self[k].x for k in coord_keys],
+            [self[k].y for k in coord_keys])
+
+        formatted_coords = dict(zip(coord_keys, zip(coord_x, coord_y)))
+
         ans = OrderedDict()
 
         for (k, v) in self.items():
-            if v.x is None or v.y is None:
-                x = y = ''
-            else:
-                (x, y) = format_coord(v.system,
-                                      coord_from_dec_deg(v.system, v.x, v.y))
+            (x, y) = formatted_coords.get(k, ('', ''))
 
             if v.time is None:
                 time = ''
@@ -673,10 +685,15 @@ class TargetCollection(ResultCollection, CollectionOrdered,
         input collection, the `x`, `y`, `time` and `priority` values are
         parsed.  (As decimal degrees (`float`), `float` and `int`
         respectively.)
+
+        The coordinates of all of the targets are parsed together
+        using :func:`~hedwig.astro.coord.parse_coord_list`.
         """
 
         ans = cls()
 
+        coord_keys = []
+
         for (k, v) in records.items():
             system = v.system
 
@@ -684,15 +701,14 @@ class TargetCollection(ResultCollection, CollectionOrdered,
                 raise UserError('Each target object should have a name.')
 
             if v.x and v.y:
-                (x, y) = coord_to_dec_deg(parse_coord(system,
-                                                      v.x, v.y, v.name))
+                coord_keys.append(k)
 
             elif v.x or v.y:
                 raise UserError('Target "{}" has only one coordinate.',
                                 v.name)
 
             else:
-                system = x = y = None
+                system = None
 
             try:
                 if v.time:
@@ -710,25 +726,34 @@ class TargetCollection(ResultCollection, CollectionOrdered,
             except ValueError:
                 raise UserError('Could not parse priority for "{}".', v.name)
 
-            ans[k] = v._replace(system=system, x=x, y=y,
+            ans[k] = v._replace(system=system, x=None, y=None,
                                 time=time, priority=priority)
 
+        (coord_x, coord_y) = parse_coord_list(
+            [records[k].system for k in coord_keys],
+            [records[k].x for k in coord_keys],
+            [records[k].y for k in coord_keys],
+            [records[k].name for k in coord_keys])
+
+        for (k, x, y) in zip(coord_keys, coord_x.tolist(), coord_y.tolist()):
+            ans[k] = ans[k]._replace(x=x, y=y)
+
         return ans
 
     def to_object_list(self):
         """
-        Returns a list of `TargetObject` instances representing members of the
+        Returns a :class:`TargetObjectList` representing members of the
         collection for which coordinates have been defined.
         """
 
-        ans = []
-
-        for v in self.values():
-            if not (v.x is None or v.y is None):
-                ans.append(TargetObject(
-                    v.name, v.system, coord_from_dec_deg(v.system, v.x, v.y)))
+        targets = [
+            v for v in self.values() if not (v.x is None or v.y is None)]
 
-        return ans
+        return TargetObjectList(
+            [x.name for x in targets],
+            [x.system for x in targets],
+            [x.x for x in targets],
+            [x.y for x in targets])
 
     def total_time(self):
         """
@@ -746,3 +771,64 @@ class TargetCollection(ResultCollection, CollectionOrdered,
                 total += v.time
 
         return total
+
+
+class TargetObjectList(object):
+    """
+    Array-backed list of target objects.
+
+    The coordinates are stored as arrays of decimal degrees, so that
+    analyses of many targets can use array operations, such as
+    :meth:`to_icrs`, rather than handling each target separately.
+    Iterating over the list, or indexing it, gives
+    :class:`~hedwig.type.simple.TargetObject` instances, the coordinate
+    objects of which are constructed as required.
+
+    :param names: list of target names
+    :param systems: list of coordinate systems
+    :param x: list or array of "x" (longitude) values in degrees
+    :param y: list or array of "y" (latitude) values in degrees
+    """
+
+    def __init__(self, names, systems, x, y):
+        self.names = list(names)
+        self.systems = list(systems)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+
+    @classmethod
+    def from_object_list(cls, objects):
+        """
+        Construct an instance of this class from a list of
+        :class:`~hedwig.type.simple.TargetObject` instances.
+        """
+
+        return cls(
+            [x.name for x in objects],
+            [x.system for x in objects],
+            [x.coord.spherical.lon.deg for x in objects],
+            [x.coord.spherical.lat.deg for x in objects])
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, i):
+        system = self.systems[i]
+
+        return TargetObject(
+            self.names[i], system,
+            coord_from_dec_deg(system, self.x[i], self.y[i]))
+
+    def __iter__(self):
+        for i in range(len(self.names)):
+            yield self[i]
+
+    def to_icrs(self):
+        """
+        Convert all of the targets to ICRS.
+
+        :return: an astropy SkyCoord object in the ICRS frame
+            containing arrays of positions.
+        """
+
+        return dec_deg_list_to_icrs(self.systems, self.x, self.y)
@@ -428,8 +428,11 @@ class MessageState(EnumBasic):
     """
     Class representing possible status values for email messages.
 
-    Note that this state is not stored directly in the database -- it is
-    determined based on the send and sent timestamps.
+    This state is stored in the database, alongside the send and sent
+    timestamps and the discard flag which determine it, so that
+    messages can be searched for by state using an index.
+    The message database methods keep it up to date whenever
+    these columns are changed.
     """
 
     UNSENT = 1
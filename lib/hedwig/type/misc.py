@@ -25,6 +25,81 @@ SectionedListSection = namedtuple(
     'SectionedListSection', ('section', 'name', 'items'))
 
 
+class FileStream(object):
+    """
+    Class representing file data which can be read in sections rather
+    than being held in memory all at once.
+
+    :param length: the total length of the data (bytes), or a function
+        returning it.  A function is only called when the length is
+        first required, so that it need not be determined if none of
+        the data are sent.
+    :param read: function which takes an offset and size (bytes)
+        and returns that section of the data.
+    :param chunk_size: default size of the sections read by
+        :meth:`iter_range`.
+    :param etag: entity tag identifying this version of the data,
+        such as an MD5 sum, if known.
+    :param last_modified: `datetime` at which the data were last
+        changed, if known.
+    :param path: path to a local file containing the data, if there is
+        one, which may be sent directly by the web server.
+    """
+
+    def __init__(self, length, read, chunk_size=(1024 * 1024),
+                 etag=None, last_modified=None, path=None):
+        self._length = length
+        self.chunk_size = chunk_size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.path = path
+
+        self._read = read
+
+    @property
+    def length(self):
+        """
+        The total length of the data (bytes).
+        """
+
+        if callable(self._length):
+            self._length = self._length()
+
+        return self._length
+
+    def iter_range(self, start=0, stop=None, chunk_size=None):
+        """
+        Generator which yields the data in sections.
+
+        :param start: offset at which to start (bytes).
+        :param stop: offset at which to stop (bytes, exclusive).  If not
+            specified, the data are read to the end.
+        :param chunk_size: maximum size of each section.
+        """
+
+        if stop is None or stop > self.length:
+            stop = self.length
+
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+
+        offset = start
+
+        while offset < stop:
+            size = min(chunk_size, stop - offset)
+
+            yield self._read(offset, size)
+
+            offset += size
+
+    def read(self):
+        """
+        Read all of the data.
+        """
+
+        return b''.join(self.iter_range())
+
+
 class SectionedList(object):
     """
     List-like class where the list can be divided into labeled sections.
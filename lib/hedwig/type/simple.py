@@ -21,12 +21,12 @@ from __future__ import absolute_import, division, print_function, \
 from collections import namedtuple
 
 from ..db.meta import affiliation, \
-    calculation, call, call_preamble, category, \
+    calculation, call, call_clash, call_preamble, category, \
     email, group_member, institution, institution_log, \
     member, message, moc, person, \
     prev_proposal, prev_proposal_pub, \
     proposal, proposal_category, queue, review, reviewer, \
-    semester, target, user_log
+    semester, target, target_clash, user_log
 
 Affiliation = namedtuple(
     'Affiliation',
@@ -58,6 +58,10 @@ Call = namedtuple(
     ['state', 'facility_id', 'semester_name', 'queue_name',
      'queue_description', 'queue_description_format', 'facility_code'])
 
+CallClash = namedtuple(
+    'CallClash',
+    [x.name for x in call_clash.columns])
+
 CallPreamble = namedtuple(
     'CallPreamble',
     [x.name for x in call_preamble.columns])
@@ -127,7 +131,7 @@ MemberPIInfo = namedtuple(
 Message = namedtuple(
     'Message',
     [x.name for x in message.columns] +
-    ['recipients', 'thread_identifiers', 'state'])
+    ['recipients', 'thread_identifiers'])
 
 MessageRecipient = namedtuple(
     'MessageRecipient',
@@ -242,6 +246,16 @@ Target = namedtuple(
     'Target',
     [x.name for x in target.columns])
 
+TargetOverlap = namedtuple(
+    'TargetOverlap',
+    ['target_id', 'proposal_id', 'other_target_id', 'other_proposal_id',
+     'separation'])
+
+TargetClashInfo = namedtuple(
+    'TargetClashInfo',
+    [x.name for x in target_clash.columns] +
+    ['proposal_id', 'target_name', 'moc_name', 'moc_public'])
+
 TargetObject = namedtuple('TargetObject', ('name', 'system', 'coord'))
 
 TargetToolInfo = namedtuple(
@@ -20,6 +20,7 @@ from __future__ import absolute_import, division, print_function, \
 
 from collections import OrderedDict
 import logging
+from threading import Lock
 
 import pycountry
 
@@ -80,6 +81,62 @@ class FormattedLogger(object):
         self.logger.log(level, msg.format(*args), **kwargs)
 
 
+class LRUCache(object):
+    """
+    Dictionary-like cache which holds up to a given number of entries,
+    discarding the least-recently used entry when a new entry is added.
+
+    A lock is held only while the underlying dictionary is accessed,
+    so the cache can be shared between threads.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Retrieve an entry, marking it as the most recently used.
+
+        :return: the entry's value, or `default` if it is not present.
+        """
+
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                return default
+
+            self._entries[key] = value
+
+            return value
+
+    def put(self, key, value):
+        """
+        Store an entry, removing the least-recently used entries if
+        the cache would otherwise exceed its maximum size.
+        """
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+        """
+
+        with self._lock:
+            self._entries.clear()
+
+
 def get_logger(name):
     """
     Get a "FormattedLogger" instance which uses string formatting.
@@ -21,11 +21,28 @@ from __future__ import absolute_import, division, print_function, \
 from collections import namedtuple
 
 from ..error import NoSuchRecord
-from ..type.simple import ProposalWithCode
+from ..type.simple import MOCInfo, PrevProposalPub, \
+    ProposalFigureInfo, ProposalPDFInfo, ProposalWithCode
 from ..type.enum import AttachmentState, MessageState, MessageThreadType
 from ..web.util import ErrorPage, HTTPNotFound, HTTPRedirect, flash, url_for
 from .util import with_verified_admin
 
+ProposalPDFWithProposal = namedtuple(
+    'ProposalPDFWithProposal',
+    ProposalPDFInfo._fields + ('proposal', 'facility_code'))
+
+ProposalFigureWithProposal = namedtuple(
+    'ProposalFigureWithProposal',
+    ProposalFigureInfo._fields + ('proposal', 'facility_code'))
+
+PrevProposalPubWithProposal = namedtuple(
+    'PrevProposalPubWithProposal',
+    PrevProposalPub._fields + ('proposal', 'facility_code'))
+
+MOCInfoWithCode = namedtuple(
+    'MOCInfoWithCode',
+    MOCInfo._fields + ('facility_code',))
+
 
 class AdminView(object):
     def home(self, facilities):
@@ -70,7 +87,7 @@ class AdminView(object):
         num_per_page = 100
         url_params = {}       # Params for nav links.
         set_form_params = {}  # Extras for form -- url_params will be added.
-        kwargs = {'limit': num_per_page}
+        kwargs = {}
 
         person_id = current_input.get('person_id')
         if person_id is not None:
@@ -87,10 +104,15 @@ class AdminView(object):
             url_params['state'] = state
 
         id_lt = current_input.get('id_lt')
+        id_gt = current_input.get('id_gt')
         if id_lt is not None:
             id_lt = int(id_lt)
             kwargs['message_id_lt'] = id_lt
             set_form_params['id_lt'] = id_lt
+        elif id_gt is not None:
+            id_gt = int(id_gt)
+            kwargs['message_id_gt'] = id_gt
+            set_form_params['id_gt'] = id_gt
 
         # Include all URL params in the setting form.
         set_form_params.update(url_params)
@@ -110,29 +132,42 @@ class AdminView(object):
                 raise ErrorPage(
                     'Message list requested for non-existent person.')
 
-        # Retrieve messages.
-        messages = db.search_message(**kwargs)
+        # Retrieve messages.  Pages are located by message identifier
+        # (id < x or id > x) rather than by offset, so that each page can
+        # be read from the index.  One extra message is requested to
+        # determine whether there are further pages in that direction.
+        messages = list(db.search_message(
+            limit=(num_per_page + 1), oldest_first=(id_gt is not None),
+            read_replica=True, **kwargs).values())
+
+        more = len(messages) > num_per_page
+        messages = messages[:num_per_page]
+
+        if id_gt is not None:
+            messages.reverse()
 
-        # Prepare pagination URLs.  Give only "first" and "next" links as
-        # we can generate these with simple SQL constructs (id < x, limit).
+        # Prepare pagination URLs.
         target_first = None
+        target_prev = None
         target_next = None
 
-        if id_lt is not None:
+        if (id_lt is not None) or (id_gt is not None and more):
             target_first = url_for('.message_list', **url_params)
 
-        # Guess that there are more messages if we have as many as the limit
-        # specified.  (Might not be true if the number of messages is divisible
-        # by the number per page.)
-        if len(messages) >= num_per_page:
-            target_next = url_for('.message_list', id_lt=min(messages.keys()),
-                                  **url_params)
+            if messages:
+                target_prev = url_for(
+                    '.message_list', id_gt=messages[0].id, **url_params)
+
+        if messages and ((id_gt is not None) or more):
+            target_next = url_for(
+                '.message_list', id_lt=messages[-1].id, **url_params)
 
         return {
             'title': ('Message List' if person is None
                       else '{}: Messages'.format(person.name)),
-            'messages': messages.values(),
+            'messages': messages,
             'target_first': target_first,
+            'target_prev': target_prev,
             'target_next': target_next,
             # Parameters for the filtering form at the top of the page:
             'form_params': {k: v for (k, v) in url_params.items()
@@ -220,21 +255,23 @@ class AdminView(object):
         unready = AttachmentState.unready_states()
 
         status = {
-            'pdfs': db.search_proposal_pdf(
-                with_uploader_name=True, state=unready, order_by_date=True),
-            'figures': db.search_proposal_figure(
-                with_uploader_name=True, state=unready, order_by_date=True),
-            'pubs': db.search_prev_proposal_pub(
-                with_proposal_id=True, state=unready, order_by_date=True),
+            'pdfs': (ProposalPDFWithProposal, db.search_proposal_pdf(
+                with_uploader_name=True, state=unready, order_by_date=True)),
+            'figures': (ProposalFigureWithProposal, db.search_proposal_figure(
+                with_uploader_name=True, state=unready, order_by_date=True)),
+            'pubs': (PrevProposalPubWithProposal, db.search_prev_proposal_pub(
+                with_proposal_id=True, state=unready, order_by_date=True)),
         }
 
-        # Create empty proposal cache dictionaries.
-        proposals = {}
-        proposal_facilities = {}
+        # Retrieve all of the proposals to which the entries refer
+        # in one search, rather than separately for each proposal.
+        proposals = self._get_proposals_with_code(
+            db, facilities, set(
+                x.proposal_id for (_, entries) in status.values()
+                for x in entries.values()))
 
-        ctx = {k: self._add_proposal(db, v.values(), facilities,
-                                     proposals, proposal_facilities)
-               for (k, v) in status.items()}
+        ctx = {k: self._add_proposal(entry_class, entries.values(), proposals)
+               for (k, (entry_class, entries)) in status.items()}
 
         ctx.update({
             'title': 'Processing Status',
@@ -247,35 +284,47 @@ class AdminView(object):
 
         return ctx
 
-    def _add_proposal(self, db, entries, facilities, proposals,
-                      proposal_facilities):
-        result = []
+    def _get_proposals_with_code(self, db, facilities, proposal_ids):
+        """
+        Retrieve the given proposals and determine their codes.
 
-        for entry in entries:
-            proposal_id = entry.proposal_id
-            proposal = proposals.get(proposal_id)
-
-            if proposal is None:
-                proposal = db.get_proposal(facility_id=None,
-                                           proposal_id=proposal_id)
-                facility = facilities.get(proposal.facility_id)
-                if facility is None:
-                    continue
-                proposal = ProposalWithCode(
+        Proposals of facilities which are not present are omitted.
+
+        :return: a dictionary of `(proposal, facility_code)` tuples by
+            proposal identifier, where `proposal` is a `ProposalWithCode`
+        """
+
+        ans = {}
+
+        if not proposal_ids:
+            return ans
+
+        for proposal in db.search_proposal(
+                proposal_id=sorted(proposal_ids)).values():
+            facility = facilities.get(proposal.facility_id)
+            if facility is None:
+                continue
+
+            ans[proposal.id] = (
+                ProposalWithCode(
                     *proposal,
-                    code=facility.view.make_proposal_code(db, proposal))
-                proposals[proposal_id] = proposal
+                    code=facility.view.make_proposal_code(db, proposal)),
+                facility.code)
 
-                facility_code = facility.code
-                proposal_facilities[proposal_id] = facility_code
+        return ans
 
-            else:
-                facility_code = proposal_facilities[proposal_id]
+    def _add_proposal(self, entry_class, entries, proposals):
+        result = []
+
+        for entry in entries:
+            proposal_info = proposals.get(entry.proposal_id)
+            if proposal_info is None:
+                continue
+
+            (proposal, facility_code) = proposal_info
 
-            result.append(
-                namedtuple('EntryWithProposal',
-                           entry._fields + ('proposal', 'facility_code'))(
-                    *entry, proposal=proposal, facility_code=facility_code))
+            result.append(entry_class(
+                *entry, proposal=proposal, facility_code=facility_code))
 
         return result
 
@@ -286,8 +335,8 @@ class AdminView(object):
             facility = facilities.get(entry.facility_id)
             if facility is None:
                 continue
-            result.append(namedtuple(
-                'EntryWithCode', entry._fields + ('facility_code',))(
+
+            result.append(MOCInfoWithCode(
                 *entry, facility_code=facility.code))
 
         return result
@@ -19,16 +19,31 @@ from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
 from collections import namedtuple
+from copy import deepcopy
+import json
+from numbers import Number
 
 from ..error import NoSuchRecord, UserError
 from ..type.enum import ProposalState
 from ..type.simple import CalculatorResult, ProposalWithCode
+from ..util import LRUCache
 from ..web.util import HTTPError, HTTPForbidden, HTTPNotFound, HTTPRedirect, \
     flash, session, url_for
 from . import auth
 
 
+result_cache = LRUCache(max_size=1000)
+
+
 class BaseCalculator(object):
+    # Sub-classes whose results depend only on the mode and input
+    # can set this attribute to allow results to be cached.
+    cache_results = False
+
+    # Maximum number of calculations accepted by the batch API.
+    # The API does not require authentication, so this is kept low.
+    batch_max_calculations = 100
+
     def __init__(self, facility, id_):
         self.facility = facility
         self.id_ = id_
@@ -143,7 +158,7 @@ class BaseCalculator(object):
                 elif 'submit_calc' in form:
                     parsed_input = self.parse_input(mode, input_values)
 
-                    output = self(mode, parsed_input)
+                    output = self.calculate(mode, parsed_input)
 
                 elif ('submit_save' in form) or ('submit_save_redir' in form):
                     parsed_input = self.parse_input(mode, input_values)
@@ -160,7 +175,7 @@ class BaseCalculator(object):
                         raise HTTPForbidden(
                             'Edit permission denied for this proposal.')
 
-                    output = self(mode, parsed_input)
+                    output = self.calculate(mode, parsed_input)
 
                     if overwrite:
                         # Check that the calculation is really for the right
@@ -249,7 +264,7 @@ class BaseCalculator(object):
                 overwrite = can.edit
 
                 try:
-                    output = self(mode, default_input)
+                    output = self.calculate(mode, default_input)
                 except UserError as e:
                     message = e.message
 
@@ -301,6 +316,166 @@ class BaseCalculator(object):
 
         return ctx
 
+    def calculate(self, mode, input_):
+        """
+        Perform a calculation, as for the calculator's `__call__` method.
+
+        If the `cache_results` attribute is set, results are stored in a
+        cache, shared by all calculators in this process.  The cache key
+        includes the calculator code, mode, version and calculation version
+        as well as the input, so that a repeated calculation (e.g. from
+        viewing a stored calculation again) can use the cached result.
+        Copies of the results are stored and returned, so that callers may
+        modify them.
+        """
+
+        if not self.cache_results:
+            return self(mode, input_)
+
+        key = (self.get_code(), mode, self.version, self.get_calc_version(),
+               json.dumps(input_, sort_keys=True))
+
+        result = result_cache.get(key)
+
+        if result is None:
+            result = self(mode, input_)
+
+            result_cache.put(key, deepcopy(result))
+
+        else:
+            result = deepcopy(result)
+
+        return result
+
+    def view_batch(self, db, data):
+        """
+        Handler for the batch calculation API.
+
+        :param db: database control object (currently not used).
+        :param data: the decoded JSON request.  This should be an object
+            with a "calculations" list, each entry of which is an
+            object giving the "mode" (by its code) and the "input"
+            (an object giving values for some or all of the inputs,
+            as they would be entered in the form -- the others take
+            their default values).
+
+        :return: a dictionary with a "results" list giving an object
+            with "output" and "error" entries for each calculation.
+
+        :raises UserError: if the request is not in the expected format.
+        """
+
+        calculations = (data.get('calculations')
+                        if isinstance(data, dict) else None)
+
+        if not isinstance(calculations, list):
+            raise UserError('Request should contain a list of calculations.')
+
+        if len(calculations) > self.batch_max_calculations:
+            raise UserError('Request contains too many calculations '
+                            '(maximum {}).', self.batch_max_calculations)
+
+        mode_codes = {x.code: mode for (mode, x) in self.modes.items()}
+
+        results = [None] * len(calculations)
+        parsed = []
+
+        for (i, calculation) in enumerate(calculations):
+            try:
+                if not isinstance(calculation, dict):
+                    raise UserError('Calculation should be an object.')
+
+                mode = mode_codes.get(calculation.get('mode'))
+
+                if mode is None:
+                    raise UserError('Unknown calculator mode.')
+
+                input_values = self._get_batch_input(
+                    mode, calculation.get('input', {}))
+
+                try:
+                    parsed.append((i, mode, self.parse_input(
+                        mode, input_values,
+                        defaults=self.get_default_input(mode))))
+
+                except (TypeError, ValueError, KeyError):
+                    raise UserError('Calculation input could not be read.')
+
+            except UserError as e:
+                results[i] = {'output': None, 'error': e.message}
+
+        batch_results = self.calculate_batch(
+            [(mode, input_) for (i, mode, input_) in parsed])
+
+        for ((i, mode, input_), (output, error)) in zip(
+                parsed, batch_results):
+            results[i] = {'output': output, 'error': error}
+
+        return {'results': results}
+
+    def calculate_batch(self, calculations):
+        """
+        Perform a number of calculations.
+
+        This implementation applies :meth:`calculate` to each calculation
+        in turn.  Sub-classes may override it to evaluate calculations
+        together where possible.
+
+        :param calculations: a list of `(mode, input)` tuples, where
+            the input has already been parsed.
+
+        :return: a list of `(output, error)` tuples, where the output
+            is the dictionary of essential outputs (or `None` if the
+            calculation failed), and the error is a message (or `None`
+            if the calculation was successful).
+        """
+
+        results = []
+
+        for (mode, input_) in calculations:
+            try:
+                results.append((self.calculate(mode, input_).output, None))
+
+            except UserError as e:
+                results.append((None, e.message))
+
+            except (TypeError, ValueError, KeyError):
+                results.append((None, 'Calculation could not be performed.'))
+
+        return results
+
+    def _get_batch_input(self, mode, input_):
+        """
+        Prepare input values for a calculation from the batch API.
+
+        The given values are merged with the default values, formatted
+        as for the input form.  Numbers are converted to text where the
+        formatted default value is text, to match the form input.
+        """
+
+        if not isinstance(input_, dict):
+            raise UserError('Calculation input should be an object.')
+
+        values = self.format_input(
+            self.get_inputs(mode), self.get_default_input(mode))
+
+        for (code, value) in input_.items():
+            if code not in values:
+                raise UserError('Unknown input "{}".', code)
+
+            if not isinstance(value, (unicode, Number)):
+                raise UserError(
+                    'Input "{}" should be a string or number.', code)
+
+            if (isinstance(values[code], unicode) and
+                    isinstance(value, Number) and
+                    not isinstance(value, bool)):
+                value = '{}'.format(value)
+
+            values[code] = value
+
+        return values
+
     def format_input(self, inputs, values):
         """
         Format the calculator inputs for display in the input form.
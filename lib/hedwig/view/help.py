@@ -30,6 +30,8 @@ from ..web.util import HTTPError, HTTPNotFound, url_for
 
 valid_page_name = re.compile('^([-_a-z0-9]+)$')
 
+help_directories = ('about', 'user', 'review', 'admin')
+
 NavLink = namedtuple(
     'NavLink', ('up', 'up_title', 'prev', 'prev_title', 'next', 'next_title'))
 
@@ -37,6 +39,10 @@ TOCEntry = namedtuple('TOCEntry', ('mtime', 'title'))
 
 TreeEntry = namedtuple('TreeEntry', ('mtime', 'toc'))
 
+PageEntry = namedtuple('PageEntry', ('mtime', 'body', 'title', 'toc'))
+
+GraphEntry = namedtuple('GraphEntry', ('mtime', 'png'))
+
 
 class HelpView(object):
     def help_page(self, doc_root, page_name, toc_cache):
@@ -45,18 +51,13 @@ class HelpView(object):
 
         The toc_cache argument is a dictionary in which we can store
         information about other pages for use in generating tables
-        of contents.
+        of contents, and the formatted pages themselves.
+        See also :func:`compile_help`.
         """
 
-        title_cache = toc_cache.get('_title')
-        if title_cache is None:
-            title_cache = {}
-            toc_cache['_title'] = title_cache
-
-        tree_cache = toc_cache.get('_tree')
-        if tree_cache is None:
-            tree_cache = {}
-            toc_cache['_tree'] = tree_cache
+        title_cache = _get_sub_cache(toc_cache, '_title')
+        tree_cache = _get_sub_cache(toc_cache, '_tree')
+        page_cache = _get_sub_cache(toc_cache, '_page')
 
         if page_name is None:
             file_name = 'index'
@@ -74,7 +75,7 @@ class HelpView(object):
         if not os.path.exists(path_name):
             raise HTTPNotFound('Help page  not found.')
 
-        (body, title, toc) = _read_rst_file(doc_root, path_name)
+        (body, title, toc) = _get_page(doc_root, file_name, page_cache)
 
         toc_entries = OrderedDict()
 
@@ -92,7 +93,7 @@ class HelpView(object):
 
         else:
             nav_link = _find_nav_link(doc_root, page_name, 'index',
-                                      title_cache, tree_cache)
+                                      title_cache, tree_cache, page_cache)
 
         return {
             'title': title,
@@ -101,9 +102,13 @@ class HelpView(object):
             'nav_link': nav_link,
         }
 
-    def help_graph(self, doc_root, graph_name):
+    def help_graph(self, doc_root, graph_name, toc_cache):
         """
         Convert Graphviz image and return as a PNG image.
+
+        The image is stored in the toc_cache dictionary (see
+        :meth:`help_page`) so that Graphviz is only run again
+        if the file is modified.
         """
 
         m = valid_page_name.match(graph_name)
@@ -118,24 +123,194 @@ class HelpView(object):
         if not os.path.exists(path_name):
             raise HTTPNotFound('Graph file not found.')
 
-        with open(path_name) as f:
-            buff = f.read()
-
         try:
-            return graphviz_to_png(buff)
+            return _get_graph(doc_root, file_name,
+                              _get_sub_cache(toc_cache, '_graph'))
         except ConversionError:
             raise HTTPError('Failed to process graph file.')
 
 
-def _read_rst_file(doc_root, path_name):
+def compile_help(doc_root, toc_cache):
+    """
+    Prepare all of the pages and graphs in a help directory.
+
+    The formatted pages, their titles and TOC trees, and the PNG images
+    of the graphs are stored in the given cache dictionary, as used by
+    :meth:`HelpView.help_page` and :meth:`HelpView.help_graph`, so that
+    requests for them can be answered from memory.  Entries are
+    prepared again by these methods if their file is subsequently
+    modified.
+
+    :param doc_root: the help directory.
+    :param toc_cache: the cache dictionary.
+
+    :return: a tuple giving the numbers of pages and graphs.
+
+    :raises ConversionError: if a graph could not be converted.
+    """
+
+    title_cache = _get_sub_cache(toc_cache, '_title')
+    tree_cache = _get_sub_cache(toc_cache, '_tree')
+    page_cache = _get_sub_cache(toc_cache, '_page')
+    graph_cache = _get_sub_cache(toc_cache, '_graph')
+
+    n_pages = n_graphs = 0
+
+    for file_name in sorted(os.listdir(doc_root)):
+        (page_name, ext) = os.path.splitext(file_name)
+
+        if ext != '.rst' or not valid_page_name.match(page_name):
+            continue
+
+        (body, title, toc) = _get_page(doc_root, page_name, page_cache)
+        title_cache[page_name] = TOCEntry(
+            page_cache[page_name].mtime, title)
+        n_pages += 1
+
+    # Search for a non-existent page in order to visit the whole TOC tree.
+    _find_nav_link(doc_root, None, 'index',
+                   title_cache, tree_cache, page_cache)
+
+    for graph_name in _list_graphs(doc_root):
+        _get_graph(doc_root, graph_name, graph_cache)
+        n_graphs += 1
+
+    return (n_pages, n_graphs)
+
+
+def write_help_graphs(doc_root):
+    """
+    Write the PNG image of each graph in a help directory alongside
+    its Graphviz file, where it will be found by :func:`_get_graph`
+    (unless the Graphviz file is newer) without needing to run Graphviz.
+
+    Images which are already up to date are not written again.
+
+    :param doc_root: the help directory.
+
+    :return: the number of images written.
+
+    :raises ConversionError: if a graph could not be converted.
+    :raises IOError: if an image could not be written.
+    """
+
+    n_written = 0
+
+    for graph_name in _list_graphs(doc_root):
+        path_name = os.path.join(doc_root, 'graph', graph_name + '.dot')
+        png_path_name = os.path.join(doc_root, 'graph', graph_name + '.png')
+
+        if (os.path.exists(png_path_name) and not (
+                os.path.getmtime(png_path_name) <
+                os.path.getmtime(path_name))):
+            continue
+
+        with open(path_name) as f:
+            png = graphviz_to_png(f.read())
+
+        with open(png_path_name, 'wb') as f:
+            f.write(png)
+
+        n_written += 1
+
+    return n_written
+
+
+def _list_graphs(doc_root):
+    """
+    Get a sorted list of the names of the graphs in a help directory.
+    """
+
+    graph_dir = os.path.join(doc_root, 'graph')
+
+    if not os.path.isdir(graph_dir):
+        return []
+
+    graphs = []
+
+    for file_name in sorted(os.listdir(graph_dir)):
+        (graph_name, ext) = os.path.splitext(file_name)
+
+        if ext == '.dot' and valid_page_name.match(graph_name):
+            graphs.append(graph_name)
+
+    return graphs
+
+
+def _get_sub_cache(toc_cache, name):
+    """
+    Get a dictionary from the cache, creating it if necessary.
+    """
+
+    sub_cache = toc_cache.get(name)
+
+    if sub_cache is None:
+        sub_cache = toc_cache[name] = {}
+
+    return sub_cache
+
+
+def _get_page(doc_root, page_name, page_cache, mtime=None):
     """
-    Read a file and return the body, title and toc.
+    Get the body, title and toc of a page, using the cache if possible.
+
+    The mtime can be given to skip reading the file's mtime.
     """
 
-    with open(os.path.join(path_name)) as f:
+    path_name = os.path.join(doc_root, page_name + '.rst')
+
+    if mtime is None:
+        mtime = os.path.getmtime(path_name)
+
+    page_entry = page_cache.get(page_name)
+
+    if (page_entry is not None) and not (page_entry.mtime < mtime):
+        return (page_entry.body, page_entry.title, list(page_entry.toc))
+
+    with open(path_name) as f:
         text = f.read()
 
-    return format_text_rst(text, extract_title_toc=True, start_heading=2)
+    (body, title, toc) = format_text_rst(
+        text, extract_title_toc=True, start_heading=2)
+
+    page_cache[page_name] = PageEntry(mtime, body, title, list(toc))
+
+    return (body, title, toc)
+
+
+def _get_graph(doc_root, graph_name, graph_cache):
+    """
+    Get the PNG image of a graph, using the cache if possible.
+
+    If the cache does not have an up-to-date image, a PNG file written
+    by :func:`write_help_graphs` is read, if it is not older than the
+    Graphviz file.  Otherwise Graphviz is run.
+    """
+
+    path_name = os.path.join(doc_root, 'graph', graph_name + '.dot')
+    png_path_name = os.path.join(doc_root, 'graph', graph_name + '.png')
+
+    mtime = os.path.getmtime(path_name)
+
+    graph_entry = graph_cache.get(graph_name)
+
+    if (graph_entry is not None) and not (graph_entry.mtime < mtime):
+        return graph_entry.png
+
+    if (os.path.exists(png_path_name) and
+            not (os.path.getmtime(png_path_name) < mtime)):
+        with open(png_path_name, 'rb') as f:
+            png = f.read()
+
+    else:
+        with open(path_name) as f:
+            buff = f.read()
+
+        png = graphviz_to_png(buff)
+
+    graph_cache[graph_name] = GraphEntry(mtime, png)
+
+    return png
 
 
 def _get_page_title(doc_root, page_name, title_cache, mtime=None):
@@ -170,7 +345,8 @@ def _get_page_title(doc_root, page_name, title_cache, mtime=None):
     return toc_entry_title
 
 
-def _find_nav_link(doc_root, target_name, page_name, title_cache, tree_cache):
+def _find_nav_link(doc_root, target_name, page_name, title_cache, tree_cache,
+                   page_cache):
     """
     Find navigation links for the given page.
 
@@ -187,7 +363,7 @@ def _find_nav_link(doc_root, target_name, page_name, title_cache, tree_cache):
     tree_entry = tree_cache.get(page_name)
 
     if tree_entry is None or tree_entry.mtime < mtime:
-        (body, title, toc) = _read_rst_file(doc_root, path_name)
+        (body, title, toc) = _get_page(doc_root, page_name, page_cache, mtime)
         sub_tree_cache = OrderedDict(((x, None) for x in toc))
         tree_cache[page_name] = TreeEntry(mtime, sub_tree_cache)
         title_cache[page_name] = TOCEntry(mtime, title)
@@ -225,7 +401,7 @@ def _find_nav_link(doc_root, target_name, page_name, title_cache, tree_cache):
         # Recurse through the TOC entries looking for a match.
         for toc_entry in toc:
             ans = _find_nav_link(doc_root, target_name, toc_entry,
-                                 title_cache, sub_tree_cache)
+                                 title_cache, sub_tree_cache, page_cache)
 
             if ans is not None:
                 return ans
@@ -470,7 +470,7 @@ class PeopleView(object):
         if session.get('is_admin', False) and auth.can_be_admin(db):
             public = None
         persons = db.search_person(registered=True, public=public,
-                                   with_institution=True)
+                                   with_institution=True, read_replica=True)
 
         return {
             'title': 'Directory of Users',
@@ -175,9 +175,6 @@ class BaseTargetTool(object):
                 else:
                     raise UserError('No target list file was received.')
 
-                # TODO: would be more efficient to update parse_source_list
-                # to be able to return a list directly: this converts to
-                # and from Astropy objects twice.
                 target_objects = parse_source_list(buff).to_object_list()
 
             except UserError as e:
@@ -67,7 +67,7 @@ def organise_collection(class_, updated_records, added_records):
     return records
 
 
-def with_call_review(permission):
+def with_call_review(permission, indirect_facility=False):
     """
     Decorator for methods which deal with reviews of all the proposals
     for a given call.
@@ -76,15 +76,18 @@ def with_call_review(permission):
     The wrapped method is called with the database, call record and
     authorization object followed by any remaining arguments.
 
-    Note: this currently can only be used to decorate methods of
-    facility classes because it uses `self.id_` for the facility ID.
+    Note: this uses `self.id_` for the facility ID, unless
+    `indirect_facility` is specified, in which case `self.facility.id_`
+    is used instead.  (E.g. for target tools.)
     """
 
     def decorator(f):
         @functools.wraps(f)
         def decorated_method(self, db, call_id, *args, **kwargs):
+            facility = (self.facility if indirect_facility else self)
+
             try:
-                call = db.get_call(facility_id=self.id_, call_id=call_id)
+                call = db.get_call(facility_id=facility.id_, call_id=call_id)
             except NoSuchRecord:
                 raise HTTPNotFound('Call not found')
 
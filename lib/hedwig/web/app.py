@@ -25,6 +25,7 @@ import os
 from flask import Flask
 from jinja2_orderblocks import OrderBlocks
 
+from ..auth import configure_password_hash
 from ..config import get_config, get_database, get_facilities, get_home
 from ..type.enum import GroupType, MessageThreadType
 from ..type.simple import FacilityInfo
@@ -99,6 +100,21 @@ def create_web_app(db=None, facility_spec=None, _test_return_extra=False):
         if upload_key.startswith('max_') and upload_key.endswith('_size'))
     app.config['MAX_CONTENT_LENGTH'] = max_upload_size * 1024 * 1024
 
+    # Allow the web server to send files from the attachment store.
+    app.config['USE_X_SENDFILE'] = \
+        config.get('attachment', 'x_sendfile').lower() in ('1', 'yes', 'true')
+
+    # Configure password hashing.
+    password_hash_options = {}
+    for (option, key) in (
+            ('password_rounds', 'rounds'),
+            ('hash_processes', 'processes'),
+            ('hash_max_waiting', 'max_waiting')):
+        value = config.get('auth', option)
+        if value:
+            password_hash_options[key] = int(value)
+    configure_password_hash(**password_hash_options)
+
     # Try to read the secret key from the configuration file, but if
     # there isn't one, generate a temporary key.
     secret_key = config.get('application', 'secret_key')
@@ -18,8 +18,9 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
-from flask import Blueprint, request
+from flask import Blueprint, jsonify, request
 
+from ...error import UserError
 from ...type.enum import FigureType
 from ...type.simple import CalculatorInfo, TargetToolInfo
 from ..util import HTTPRedirect, \
@@ -51,6 +52,10 @@ def create_facility_blueprint(db, facility):
 
       The base calculator template.
 
+    Each calculator also has a batch calculation API, accepting
+    JSON requests at `calculator/<calculator_code>/batch`
+    (see :func:`make_calculator_batch_route`).
+
     **Target Tools**
 
     A list of possible HTML templates to use for the target tool
@@ -757,6 +762,12 @@ def create_facility_blueprint(db, facility):
                     calculator_code,
                     list(calculator.modes.values())[0].code)))
 
+        bp.add_url_rule(
+            '/calculator/{}/batch'.format(calculator_code),
+            'calc_{}_batch'.format(calculator_code),
+            make_calculator_batch_route(db, calculator),
+            methods=['POST'])
+
         # Create routes for each calculator mode.
         for (calculator_mode_id, calculator_mode) in calculator.modes.items():
             route_opts = (calculator_code, calculator_mode.code)
@@ -844,6 +855,34 @@ def create_facility_blueprint(db, facility):
     return bp
 
 
+def make_calculator_batch_route(db, calculator):
+    """
+    Create a view function for a calculator's batch calculation API.
+
+    The request body is decoded as JSON and passed to the calculator's
+    :meth:`~hedwig.view.calculator.BaseCalculator.view_batch` method,
+    and the result is returned as JSON.  If the request is not valid,
+    a "400 Bad Request" response is given, containing a JSON object
+    with an "error" message.
+    """
+
+    def view_func():
+        try:
+            data = request.get_json(force=True, silent=True)
+
+            if data is None:
+                raise UserError('Request is not valid JSON.')
+
+            return jsonify(calculator.view_batch(db, data))
+
+        except UserError as e:
+            response = jsonify({'error': e.message})
+            response.status_code = 400
+            return response
+
+    return view_func
+
+
 def make_custom_redirect(target, target_opts={}):
     """
     Create a view function for a redirect to the given target.
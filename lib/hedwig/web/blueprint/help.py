@@ -22,11 +22,15 @@ import os.path
 
 from flask import Blueprint, send_from_directory
 
-from ...config import get_home
+from ...config import get_config, get_home
+from ...error import ConversionError
 from ...type.enum import FigureType
-from ...view.help import HelpView
+from ...util import get_logger
+from ...view.help import HelpView, compile_help
 from ..util import send_file, templated
 
+logger = get_logger(__name__)
+
 
 def create_help_blueprint():
     """
@@ -39,6 +43,7 @@ def create_help_blueprint():
     doc_root = os.path.join(get_home(), 'doc')
 
     about_doc_root = os.path.join(doc_root, 'about')
+    about_toc_cache = {}
 
     user_doc_root = os.path.join(doc_root, 'user')
     user_image_root = os.path.join(user_doc_root, 'image')
@@ -52,6 +57,21 @@ def create_help_blueprint():
     admin_image_root = os.path.join(admin_doc_root, 'image')
     admin_toc_cache = {}
 
+    if get_config().get('help', 'precompile').lower() in ('1', 'yes', 'true'):
+        for (help_doc_root, help_toc_cache) in (
+                (about_doc_root, about_toc_cache),
+                (user_doc_root, user_toc_cache),
+                (review_doc_root, review_toc_cache),
+                (admin_doc_root, admin_toc_cache)):
+            try:
+                compile_help(help_doc_root, help_toc_cache)
+
+            except ConversionError as e:
+                # Graphs which could not be prepared will be converted
+                # again when requested.
+                logger.warning('Failed to compile help in {}: {}',
+                               help_doc_root, e.message)
+
     @bp.route('/')
     @templated('help/index.html')
     def help_index():
@@ -60,7 +80,7 @@ def create_help_blueprint():
     @bp.route('/about')
     @templated('help/help_page.html')
     def help_about():
-        return view.help_page(about_doc_root, None, {})
+        return view.help_page(about_doc_root, None, about_toc_cache)
 
     @bp.route('/user/')
     @templated('help/help_page.html')
@@ -107,6 +127,6 @@ def create_help_blueprint():
     @bp.route('/admin/graph/<path:file_name>')
     @send_file(fixed_type=FigureType.PNG)
     def admin_graph(file_name):
-        return view.help_graph(admin_doc_root, file_name)
+        return view.help_graph(admin_doc_root, file_name, admin_toc_cache)
 
     return bp
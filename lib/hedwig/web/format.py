@@ -18,12 +18,17 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
+from hashlib import md5
+
 from flask import Markup
 
 from ..format.rst import rst_to_html
 from ..type.enum import FormatType
+from ..util import LRUCache
 from .util import HTTPError
 
+rst_cache = LRUCache(max_size=500)
+
 
 def format_text(text, format=None):
     """
@@ -80,6 +85,9 @@ def format_text_rst(text, extract_title_toc=False, start_heading=3):
     Format RST for display as HTML.
 
     This applies the :func:`hedwig.format.rst.rst_to_html` function.
+    The results are kept in a cache, keyed by the MD5 sum of the text
+    and the formatting options, so that text which is viewed repeatedly
+    does not need to be processed again.
 
     :param text: text marked up as RST for formatting
     :param extract_title_toc: indicate whether to extract title and TOC
@@ -91,11 +99,22 @@ def format_text_rst(text, extract_title_toc=False, start_heading=3):
         and a list of TOC items.
     """
 
-    (body, title, toc) = rst_to_html(text, extract_title=extract_title_toc,
-                                     start_heading=start_heading)
+    key = (md5(text if isinstance(text, bytes)
+               else text.encode('utf-8')).hexdigest(),
+           extract_title_toc, start_heading)
+
+    result = rst_cache.get(key)
+
+    if result is None:
+        result = rst_to_html(text, extract_title=extract_title_toc,
+                             start_heading=start_heading)
+
+        rst_cache.put(key, result)
+
+    (body, title, toc) = result
 
     if not extract_title_toc:
         return Markup(body)
 
     else:
-        return (Markup(body), Markup(title), toc)
+        return (Markup(body), Markup(title), list(toc))
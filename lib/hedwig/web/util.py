@@ -26,6 +26,7 @@ import functools
 from flask import session, url_for
 
 # Import the names which we use but do not wish to expose.
+from flask import current_app as _flask_current_app
 from flask import flash as _flask_flash
 from flask import make_response as _flask_make_response
 from flask import render_template as _flask_render_template
@@ -33,10 +34,16 @@ from flask import request as _flask_request
 from flask import Response as _FlaskResponse
 from werkzeug import exceptions as _werkzeug_exceptions
 from werkzeug import routing as _werkzeug_routing
+from werkzeug.http import is_resource_modified as \
+    _werkzeug_is_resource_modified
+from werkzeug.http import parse_date as _werkzeug_parse_date
+from werkzeug.http import parse_etags as _werkzeug_parse_etags
+from werkzeug.wsgi import wrap_file as _werkzeug_wrap_file
 
 from ..error import UserError
 from ..type.simple import DateAndTime
 from ..type.enum import FigureType, FileTypeInfo
+from ..type.misc import FileStream
 
 
 class HTTPError(_werkzeug_exceptions.InternalServerError):
@@ -380,6 +387,13 @@ def send_file(fixed_type=None, allow_cache=False):
     `(data, type, filename)` tuple where the type is a value from
     :class:`~hedwig.type.enum.FigureType`.
 
+    The data may be given as a :class:`~hedwig.type.misc.FileStream`
+    object, in which case the response is streamed and
+    HTTP range requests are supported.  If the stream has an entity tag
+    or modification time, these are used to answer conditional
+    requests ("If-None-Match" or "If-Modified-Since") with
+    "304 Not Modified" without reading any of the data.
+
     :param fixed_type: fixed MIME type, if appropriate (see above).
     :param allow_cache: if enabled, HTTP headers will be added to enable
         caching.  In this case it is assumed that the caller will ensure
@@ -411,7 +425,10 @@ def send_file(fixed_type=None, allow_cache=False):
                 mime_type = FigureType.get_mime_type(type_)
                 can_view_inline = FigureType.can_view_inline(type_)
 
-            response = _FlaskResponse(data, mimetype=mime_type)
+            if isinstance(data, FileStream):
+                response = _make_stream_response(data, mime_type)
+            else:
+                response = _FlaskResponse(data, mimetype=mime_type)
 
             if filename is not None:
                 if can_view_inline:
@@ -435,6 +452,121 @@ def send_file(fixed_type=None, allow_cache=False):
     return decorator
 
 
+def _make_stream_response(stream, mime_type):
+    """
+    Create a streamed response for a :class:`~hedwig.type.misc.FileStream`.
+
+    If the request includes a single byte range (and no "If-Range"
+    header, unless it matches the stream's entity tag or modification
+    time) then only that range is sent.
+
+    When the whole of a stream which has a local file path is sent,
+    the file is passed to the web server via the "X-Sendfile" header
+    (if the application's `USE_X_SENDFILE` option is enabled) or
+    otherwise via the WSGI file wrapper, allowing the server to
+    use zero-copy transfer where possible.
+    """
+
+    range_ = _flask_request.range
+    environ = _flask_request.environ
+    has_validator = (stream.etag is not None or
+                     stream.last_modified is not None)
+
+    if has_validator and not _werkzeug_is_resource_modified(
+            environ, etag=stream.etag, last_modified=stream.last_modified):
+        response = _FlaskResponse(status=304, mimetype=mime_type)
+        _set_stream_validators(response, stream)
+        return response
+
+    # Only determine the length once we know that data will be sent,
+    # since this may require a database query.
+    length = stream.length
+
+    if (range_ is None or len(range_.ranges) != 1 or
+            not _is_if_range_match(stream)):
+        (start, stop) = (0, length)
+        status = 200
+
+    else:
+        range_for_length = range_.range_for_length(length)
+
+        if range_for_length is None:
+            response = _FlaskResponse(status=416)
+            response.headers['Content-Range'] = 'bytes */{}'.format(length)
+            return response
+
+        (start, stop) = range_for_length
+        status = 206
+
+    if status == 200 and stream.path is not None:
+        if _flask_current_app.use_x_sendfile:
+            response = _FlaskResponse(status=status, mimetype=mime_type)
+            response.headers['X-Sendfile'] = stream.path
+
+        else:
+            response = _FlaskResponse(
+                _werkzeug_wrap_file(environ, open(stream.path, 'rb')),
+                status=status, mimetype=mime_type, direct_passthrough=True)
+
+    else:
+        response = _FlaskResponse(
+            stream.iter_range(start, stop), status=status, mimetype=mime_type,
+            direct_passthrough=True)
+
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Length'] = str(stop - start)
+
+    if status == 206:
+        response.headers['Content-Range'] = 'bytes {}-{}/{}'.format(
+            start, stop - 1, length)
+
+    _set_stream_validators(response, stream)
+
+    return response
+
+
+def _is_if_range_match(stream):
+    """
+    Determine whether a range may be sent for the given stream,
+    i.e. whether the request has no "If-Range" header or one which
+    matches the stream's entity tag (using strong comparison) or
+    modification time.
+    """
+
+    if_range = _flask_request.headers.get('If-Range')
+
+    if if_range is None:
+        return True
+
+    if_range = if_range.strip()
+
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return (stream.etag is not None and
+                _werkzeug_parse_etags(if_range).contains(stream.etag))
+
+    date = _werkzeug_parse_date(if_range)
+
+    if date is None or stream.last_modified is None:
+        return False
+
+    return (date.replace(tzinfo=None) ==
+            stream.last_modified.replace(microsecond=0))
+
+
+def _set_stream_validators(response, stream):
+    """
+    Set the "ETag" and "Last-Modified" headers of a response
+    from the corresponding attributes of a
+    :class:`~hedwig.type.misc.FileStream`, where present.
+    """
+
+    if stream.etag is not None:
+        response.set_etag(stream.etag)
+
+    if stream.last_modified is not None:
+        response.last_modified = stream.last_modified
+
+
 def templated(template):
     """
     Template application decorator.
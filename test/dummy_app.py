@@ -35,8 +35,7 @@ class WebAppTestCase(DummyConfigTestCase):
         self.config = get_config()
         self.db = get_dummy_database(facility_spec=self.facility_spec,
                                      randomize_ids=False)
-        auth._rounds = 10
-        auth.password_hash_delay = 0
+        auth._rounds = auth._legacy_rounds = 10
 
         app_info = create_web_app(db=self.db, facility_spec=self.facility_spec,
                                   _test_return_extra=True)
@@ -31,7 +31,7 @@ from hedwig.db.engine import get_engine
 
 
 def get_dummy_database(randomize_ids=True, allow_multi_threaded=False,
-                       facility_spec=None):
+                       facility_spec=None, attachment_store=None):
     """
     Create in-memory SQL database for testing.
 
@@ -62,7 +62,7 @@ def get_dummy_database(randomize_ids=True, allow_multi_threaded=False,
                              'VALUES ("{}", {})'.format(table,
                                                         randint(1, 1000000)))
 
-    return CombinedDatabase(engine)
+    return CombinedDatabase(engine, attachment_store=attachment_store)
 
 
 class DBTestCase(TestCase):
@@ -70,7 +70,7 @@ class DBTestCase(TestCase):
 
     def setUp(self):
         self.db = get_dummy_database(facility_spec=self.facility_spec)
-        auth._rounds = 10
+        auth._rounds = auth._legacy_rounds = 10
 
     def tearDown(self):
         del self.db
@@ -25,7 +25,9 @@ from astropy.coordinates import SkyCoord
 
 from hedwig.astro.coord import CoordSystem, \
     parse_coord, format_coord, \
-    coord_to_dec_deg, coord_from_dec_deg
+    coord_to_dec_deg, coord_from_dec_deg, \
+    coord_list_to_icrs, dec_deg_list_to_icrs, \
+    format_coord_list, parse_coord_list
 from hedwig.error import UserError
 
 
@@ -99,3 +101,52 @@ class AstroCoordTest(TestCase):
         cc = coord_from_dec_deg(CoordSystem.ICRS, 21.34, 55.89)
         self.assertEqual(format_coord(CoordSystem.ICRS, cc)[0], '01:25:21.6')
         self.assertEqual(format_coord(CoordSystem.ICRS, cc)[1], '+55:53:24')
+
+    def test_coord_list(self):
+        systems = [CoordSystem.ICRS, CoordSystem.GAL, CoordSystem.ICRS]
+        xs = ['12:34:56', '135.75', '15.0']
+        ys = ['+78:09:00', '-15.25', '75']
+        names = ['a', 'b', 'c']
+
+        (x_deg, y_deg) = parse_coord_list(systems, xs, ys, names)
+
+        for (system, x, y, name, x_d, y_d) in zip(
+                systems, xs, ys, names, x_deg, y_deg):
+            (x_expect, y_expect) = coord_to_dec_deg(
+                parse_coord(system, x, y, name))
+            self.assertAlmostEqual(x_d, x_expect)
+            self.assertAlmostEqual(y_d, y_expect)
+
+        self.assertEqual(format_coord_list(systems, x_deg, y_deg), (
+            ['12:34:56', '135.75', '01:00:00'],
+            ['+78:09:00', '-15.25', '+75:00:00']))
+
+        icrs = dec_deg_list_to_icrs(systems, x_deg, y_deg)
+        expect = coord_list_to_icrs(systems, [
+            coord_from_dec_deg(system, x, y)
+            for (system, x, y) in zip(systems, x_deg, y_deg)])
+
+        for i in range(len(systems)):
+            self.assertAlmostEqual(icrs.ra.deg[i], expect.ra.deg[i])
+            self.assertAlmostEqual(icrs.dec.deg[i], expect.dec.deg[i])
+
+        self.assertAlmostEqual(
+            icrs.ra.deg[1],
+            coord_from_dec_deg(CoordSystem.GAL, 135.75, -15.25).icrs.ra.deg)
+
+        # Errors should report the first position which could not be parsed.
+        xs = ['01:00:00'] * 10
+        ys = ['+45:00:00'] * 10
+        names = ['target {}'.format(i) for i in range(10)]
+        ys[6] = '-95:15:00'
+        xs[8] = '25:30:00'
+
+        with self.assertRaisesRegexp(UserError, '"target 6"'):
+            parse_coord_list([CoordSystem.ICRS] * 10, xs, ys, names)
+
+        with self.assertRaisesRegexp(UserError, 'not recognized'):
+            parse_coord_list([999], ['1'], ['2'], ['x'])
+
+        (x_deg, y_deg) = parse_coord_list([], [], [], [])
+        self.assertEqual(len(x_deg), 0)
+        self.assertEqual(format_coord_list([], x_deg, y_deg), ([], []))
@@ -21,11 +21,12 @@ from __future__ import absolute_import, division, print_function, \
 from unittest import TestCase
 
 from hedwig import auth
+from hedwig.error import UserError
 
 
 class AuthTest(TestCase):
     def setUp(self):
-        auth._rounds = 10
+        auth._rounds = auth._legacy_rounds = 10
 
     def test_auth(self):
         (h, s) = auth.create_password_hash('monkey')
@@ -33,5 +34,46 @@ class AuthTest(TestCase):
         self.assertRegexpMatches(h, '^[0-9a-f]{64}$')
         self.assertRegexpMatches(s, '^[0-9a-f]{64}$')
 
+        self.assertTrue(auth.check_password_hash('monkey', h, s, rounds=10))
+        self.assertFalse(auth.check_password_hash('donkey', h, s, rounds=10))
+
+        # The number of rounds must match.
+        self.assertFalse(auth.check_password_hash('monkey', h, s, rounds=11))
+
+        # Hashes from before the number of rounds was stored should use
+        # the legacy number of rounds.
+        self.assertTrue(auth.is_password_hash_current(None))
         self.assertTrue(auth.check_password_hash('monkey', h, s))
-        self.assertFalse(auth.check_password_hash('donkey', h, s))
+
+        auth._rounds = 12
+        self.assertFalse(auth.is_password_hash_current(None))
+        self.assertFalse(auth.is_password_hash_current(10))
+        self.assertTrue(auth.is_password_hash_current(12))
+
+        # Checks should use the stored number of rounds.
+        self.assertTrue(auth.check_password_hash('monkey', h, s, rounds=10))
+        self.assertIsNone(auth.check_password_dummy('monkey'))
+
+    def test_auth_pool(self):
+        auth.configure_password_hash(processes=1, max_waiting=0)
+        self.addCleanup(auth.configure_password_hash)
+
+        # The pool should be created immediately rather than when
+        # first used.
+        self.assertIsNotNone(auth._pool)
+
+        (h, s) = auth.create_password_hash('monkey', rounds=20)
+
+        self.assertTrue(auth.check_password_hash('monkey', h, s, rounds=20))
+        self.assertFalse(auth.check_password_hash('donkey', h, s, rounds=20))
+
+        # Requests beyond the number of processes plus waiting requests
+        # should be rejected.
+        auth._pool_semaphore.acquire()
+
+        try:
+            with self.assertRaisesRegexp(UserError, 'too many log in'):
+                auth.check_password_hash('monkey', h, s, rounds=20)
+
+        finally:
+            auth._pool_semaphore.release()
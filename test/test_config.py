@@ -75,6 +75,13 @@ class ConfigTestCase(DummyConfigTestCase):
         self.assertEqual(db.__class__.__name__, 'CombinedDatabase')
         self.assertIsInstance(db, Database)
         self.assertNotIsInstance(db, JCMTPart)
+        self.assertIs(db._read_engine, db._engine)
+
+        # Database with a separate engine for read-only transactions.
+        db = config.get_database(database_url=database_url,
+                                 facility_spec='Generic',
+                                 read_database_url=database_url)
+        self.assertIsNot(db._read_engine, db._engine)
 
         # Get database via plain facility name.
         db = config.get_database(database_url=database_url,
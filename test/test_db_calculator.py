@@ -26,10 +26,13 @@ from pymoc import MOC
 
 from hedwig.error import ConsistencyError, DatabaseIntegrityError, \
     Error, NoSuchRecord
+from hedwig.db.moc_index import MOCIndex
 from hedwig.file.moc import read_moc, write_moc
-from hedwig.type.collection import ResultCollection
+from hedwig.type.collection import ResultCollection, TargetCollection
 from hedwig.type.enum import AttachmentState, BaseCallType, FormatType
-from hedwig.type.simple import Calculation, MOCInfo
+from hedwig.type.misc import FileStream
+from hedwig.type.simple import Calculation, CallClash, MOCInfo, Target, \
+    TargetClashInfo
 
 from .dummy_db import DBTestCase
 
@@ -127,6 +130,15 @@ class DBCalculatorTest(DBTestCase):
         self.assertAlmostEqual(moc_info.area, 1718.873, places=3)
         self.assertEqual(moc_info.state, AttachmentState.NEW)
 
+        stream = self.db.get_moc_fits(moc_id, stream=True)
+        self.assertIsInstance(stream, FileStream)
+        self.assertEqual(stream.read(), moc_a_fits_fetched)
+        self.assertEqual(stream.last_modified, moc_info.uploaded)
+        self.assertIsNone(stream.etag)
+
+        with self.assertRaises(NoSuchRecord):
+            self.db.get_moc_fits(moc_id + 1, stream=True)
+
         # Update the moc_cell table (emulating poll process).
         update = self.db.update_moc_cell(moc_id, moc_a, block_pause=0)
         self.assertEqual(update, {1: 'insert'})
@@ -238,6 +250,184 @@ class DBCalculatorTest(DBTestCase):
         # Check the MOC really ended up as expected.
         self.assertEqual(list(moc), [(5, frozenset((21, 22, 23, 31, 32, 33)))])
 
+    def test_moc_search_cells(self):
+        (facility_id, moc_ids, cells) = self._create_test_mocs()
+
+        for public in (None, True, False):
+            result = self.db.search_moc_cells(
+                facility_id, public, 4, cells, block_size=3)
+
+            self.assertEqual(sorted(result.keys()), cells)
+
+            for cell in cells:
+                expected = self.db.search_moc_cell(
+                    facility_id, public, 4, cell)
+                self.assertIsInstance(result[cell], ResultCollection)
+                self.assertEqual(list(result[cell].keys()),
+                                 sorted(expected.keys()))
+                self.assertEqual(
+                    list(result[cell].values()),
+                    [expected[x] for x in sorted(expected.keys())])
+
+        # Check a few specific cases.
+        result = self.db.search_moc_cells(facility_id, None, 4, cells)
+        self.assertEqual(list(result[1000].keys()), [moc_ids[2]])
+        self.assertEqual(list(result[256].keys()), [moc_ids[0], moc_ids[1]])
+        self.assertEqual(list(result[50].keys()), [])
+
+        self.assertEqual(
+            self.db.search_moc_cells(facility_id, None, 4, []), {})
+
+    def test_moc_index(self):
+        (facility_id, moc_ids, cells) = self._create_test_mocs()
+
+        index = self.db.get_moc_index(facility_id, 4)
+        self.assertIsInstance(index, MOCIndex)
+        self.assertEqual(index.n_cell, 9)
+
+        # Adjacent cells 16 and 17 at order 2 should have been merged.
+        self.assertEqual(index.n_range, 8)
+
+        for public in (None, True, False):
+            self.assertEqual(
+                index.search(public, cells),
+                self.db.search_moc_cells(facility_id, public, 4, cells))
+
+        # The index should be cached until a MOC is altered.
+        self.assertIs(self.db.get_moc_index(facility_id, 4), index)
+
+        moc = MOC(order=4, cells=(50,))
+        self.db.update_moc(moc_ids[0], moc_object=moc)
+        self.db.update_moc_cell(moc_ids[0], moc, block_pause=0)
+
+        index_new = self.db.get_moc_index(facility_id, 4)
+        self.assertIsNot(index_new, index)
+        self.assertEqual(list(index_new.search(None, [50, 256])[50].keys()),
+                         [moc_ids[0]])
+        self.assertEqual(list(index_new.search(None, [50, 256])[256].keys()),
+                         [moc_ids[1]])
+
+        self.db.delete_moc(facility_id, moc_ids[0])
+        self.assertEqual(
+            list(self.db.get_moc_index(facility_id, 4).search(
+                None, [50])[50].keys()), [])
+
+        # Changes made by another process should be detected after
+        # the check interval.
+        self.db._moc_index.check_interval = 0
+        index = self.db.get_moc_index(facility_id, 4)
+        self.assertIs(self.db.get_moc_index(facility_id, 4), index)
+
+        other_db = self.db.__class__(self.db._engine)
+        other_db.update_moc(moc_ids[1], public=True)
+        index_new = self.db.get_moc_index(facility_id, 4)
+        self.assertIsNot(index_new, index)
+        self.assertEqual(
+            list(index_new.search(True, [256])[256].keys()), [moc_ids[1]])
+
+        # Indexes exceeding the size limit should not be used.
+        self.db._moc_index.max_cells = 5
+        self.db._moc_index.invalidate()
+        self.assertIsNone(self.db.get_moc_index(facility_id, 4))
+
+    def _create_test_mocs(self):
+        facility_id = self.db.ensure_facility('moc testing facility')
+
+        moc_ids = []
+
+        for (public, orders) in [
+                (True, {1: (4, 7)}),
+                (False, {2: (16, 17, 30), 3: (200,)}),
+                (True, {3: (17, 201), 4: (1000,)})]:
+            moc = MOC()
+            for (order, cells) in orders.items():
+                moc.add(order, cells)
+
+            moc_id = self.db.add_moc(
+                facility_id, 'test {}'.format(len(moc_ids)),
+                'test', FormatType.PLAIN, public, moc)
+            self.db.update_moc_cell(moc_id, moc, block_pause=0)
+            moc_ids.append(moc_id)
+
+        cells = [16, 17, 20, 50, 68, 250, 256, 800, 801, 804, 1000, 4001]
+
+        return (facility_id, moc_ids, cells)
+
+    def test_target_clash(self):
+        (facility_id, proposal_id) = self._create_test_proposal()
+        call_id = self.db.get_proposal(facility_id, proposal_id).call_id
+
+        self.db.sync_proposal_target(proposal_id, TargetCollection([
+            (1, Target(1, proposal_id, 1, 'T1', 1, 10.0, 20.0, None, None)),
+            (2, Target(2, proposal_id, 2, 'T2', 1, 30.0, 40.0, None, None)),
+        ]))
+
+        (target_1, target_2) = self.db.search_target(
+            proposal_id=proposal_id).keys()
+
+        moc_public = self.db.add_moc(facility_id, 'pub', '',
+                                     FormatType.PLAIN, True,
+                                     MOC(order=1, cells=(4,)))
+        moc_private = self.db.add_moc(facility_id, 'priv', '',
+                                      FormatType.PLAIN, False,
+                                      MOC(order=1, cells=(7,)))
+
+        self.assertFalse(self.db.search_call_clash(call_id=call_id))
+        self.assertFalse(self.db.search_target_clash(call_id=call_id))
+
+        self.assertEqual(self.db.sync_call_target_clash(call_id, {
+            target_1: [moc_public, moc_private],
+            target_2: [moc_private],
+        }), 3)
+
+        result = self.db.search_call_clash(call_id=call_id)
+        self.assertEqual(list(result.keys()), [call_id])
+        self.assertIsInstance(result[call_id], CallClash)
+        self.assertIsInstance(result[call_id].date, datetime)
+
+        result = self.db.search_target_clash(call_id=call_id)
+        self.assertIsInstance(result, ResultCollection)
+        self.assertEqual(len(result), 3)
+
+        for clash in result.values():
+            self.assertIsInstance(clash, TargetClashInfo)
+            self.assertEqual(clash.proposal_id, proposal_id)
+
+        self.assertEqual(
+            [(x.target_name, x.moc_name, x.moc_public)
+             for x in result.values()],
+            [('T1', 'pub', True), ('T1', 'priv', False),
+             ('T2', 'priv', False)])
+
+        result = self.db.search_target_clash(
+            proposal_id=proposal_id, public=True)
+        self.assertEqual([x.target_id for x in result.values()], [target_1])
+
+        # Storing new results should replace the previous ones.
+        date = self.db.search_call_clash(call_id=call_id)[call_id].date
+
+        self.assertEqual(self.db.sync_call_target_clash(call_id, {
+            target_2: [moc_public],
+        }), 1)
+
+        self.assertEqual(
+            [(x.target_id, x.moc_id) for x in self.db.search_target_clash(
+                call_id=call_id).values()],
+            [(target_2, moc_public)])
+
+        self.assertGreaterEqual(
+            self.db.search_call_clash(call_id=call_id)[call_id].date, date)
+
+        # Removing targets or MOCs should remove their clashes.
+        self.db.delete_moc(facility_id, moc_public)
+
+        self.assertFalse(self.db.search_target_clash(call_id=call_id))
+
+        self.db.sync_call_target_clash(call_id, {target_1: [moc_private]})
+        self.db.sync_proposal_target(proposal_id, TargetCollection())
+
+        self.assertFalse(self.db.search_target_clash(call_id=call_id))
+
     def _create_test_proposal(self):
         facility_id = self.db.ensure_facility('f')
         semester_id = self.db.add_semester(
@@ -0,0 +1,86 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from hedwig.config import _get_db_class
+from hedwig.db.engine import get_engine
+from hedwig.db.meta import metadata, person
+from hedwig.error import DatabaseError
+
+
+class DBControlTest(TestCase):
+    def setUp(self):
+        self.temp_dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.temp_dir)
+
+    def test_read_replica(self):
+        engine = get_engine('sqlite:///{}'.format(
+            os.path.join(self.temp_dir, 'primary.db')))
+        read_engine = get_engine('sqlite:///{}'.format(
+            os.path.join(self.temp_dir, 'replica.db')))
+
+        for e in (engine, read_engine):
+            metadata.create_all(e)
+
+        CombinedDatabase = _get_db_class('Generic')
+        db = CombinedDatabase(engine, read_engine=read_engine)
+
+        # Add a person to the primary database: this should not be visible
+        # to searches directed to the "replica" until it appears there,
+        # but other searches should see it immediately.
+        person_id = db.add_person('Person One')
+        self.assertEqual(db.get_person(person_id).name, 'Person One')
+        self.assertEqual(list(db.search_person().keys()), [person_id])
+        self.assertEqual(
+            list(db.search_person(read_replica=True).keys()), [])
+
+        with read_engine.begin() as conn:
+            conn.execute(person.insert().values({
+                person.c.id: person_id,
+                person.c.name: 'Person One',
+            }))
+
+        self.assertEqual(
+            list(db.search_person(read_replica=True).keys()), [person_id])
+
+        # Read-only transactions should never be committed.
+        for read_replica in (False, True):
+            with db._read_transaction(read_replica=read_replica) as conn:
+                conn.execute(person.delete())
+
+            self.assertEqual(
+                list(db.search_person(read_replica=read_replica).keys()),
+                [person_id])
+
+        # Errors should be re-raised in the same manner as _transaction.
+        with self.assertRaises(DatabaseError):
+            with db._read_transaction() as conn:
+                conn.execute('SELECT * FROM non_existent_table')
+
+        # Without a read engine, the main engine should be used.
+        db = CombinedDatabase(engine)
+        self.assertEqual(
+            list(db.search_person(read_replica=True).keys()), [person_id])
@@ -0,0 +1,103 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from threading import Event, Thread
+from unittest import TestCase
+
+from hedwig.db.engine import get_engine, get_transaction_lock_mode
+from hedwig.db.lock import TransactionLock, TransactionLockStatistics
+from hedwig.error import Error
+
+from .dummy_db import get_dummy_database
+
+
+class DBLockTest(TestCase):
+    def test_lock_mode(self):
+        self.assertEqual(
+            get_transaction_lock_mode(get_engine('sqlite:///:memory:')),
+            TransactionLock.ALL)
+
+        self.assertEqual(
+            get_transaction_lock_mode(get_engine('sqlite:////tmp/x.db')),
+            TransactionLock.WRITE)
+
+        with self.assertRaises(Error):
+            TransactionLock('sometimes')
+
+        db = get_dummy_database(facility_spec='Generic')
+        self.assertEqual(db._lock.mode, TransactionLock.ALL)
+
+        stats = db.get_transaction_lock_statistics(reset=True)
+        self.assertIsInstance(stats, TransactionLockStatistics)
+
+        db.search_person()
+
+        stats = db.get_transaction_lock_statistics()
+        self.assertEqual(stats.acquired, 1)
+
+    def test_lock_concurrency(self):
+        # Expected behavior: (mode, shared blocks, exclusive blocks).
+        for (mode, shared_blocks, exclusive_blocks) in [
+                (TransactionLock.NONE, False, False),
+                (TransactionLock.WRITE, False, True),
+                (TransactionLock.ALL, True, True)]:
+            lock = TransactionLock(mode)
+
+            self.assertEqual(
+                self._blocks(lock, lock.shared), shared_blocks)
+            self.assertEqual(
+                self._blocks(lock, lock.exclusive), exclusive_blocks)
+
+            # The main thread acquires the lock in exclusive mode for
+            # each test, and then the second thread acquires it if blocked.
+            stats = lock.get_statistics(reset=True)
+            self.assertEqual(
+                stats.acquired,
+                (0 if mode == TransactionLock.NONE else 2) +
+                shared_blocks + exclusive_blocks)
+
+            if exclusive_blocks:
+                self.assertGreater(stats.wait_max, 0.0)
+                self.assertGreaterEqual(stats.wait_total, stats.wait_max)
+
+            stats = lock.get_statistics()
+            self.assertEqual(stats, (0, 0.0, 0.0))
+
+    def _blocks(self, lock, context_manager):
+        """
+        Determine whether a second thread is blocked when using the given
+        context manager while the lock is held by the main thread.
+        """
+
+        entered = Event()
+
+        def target():
+            with context_manager():
+                entered.set()
+
+        with lock.exclusive():
+            thread = Thread(target=target)
+            thread.start()
+            blocked = not entered.wait(0.2)
+
+        thread.join()
+        self.assertTrue(entered.is_set())
+
+        return blocked
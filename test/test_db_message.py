@@ -20,6 +20,7 @@ from __future__ import absolute_import, division, print_function, \
 
 from datetime import datetime
 
+from hedwig.db.meta import message as message_table
 from hedwig.error import ConsistencyError, DatabaseIntegrityError, Error
 from hedwig.type.enum import MessageState, MessageThreadType
 from hedwig.type.collection import ResultCollection
@@ -90,8 +91,9 @@ class DBMessageTest(DBTestCase):
         self.assertEqual(recipient.address, '1@a')
         self.assertTrue(recipient.public)
 
-        self.assertIsNotNone(
-            self.db.search_message()[message_id].timestamp_send)
+        message = self.db.search_message()[message_id]
+        self.assertIsNotNone(message.timestamp_send)
+        self.assertEqual(message.state, MessageState.SENDING)
 
         self.assertIsNone(self.db.get_unsent_message())
 
@@ -164,6 +166,89 @@ class DBMessageTest(DBTestCase):
         with self.assertRaisesRegexp(Error, '^no message updates specified'):
             self.db.update_message(message_id=message_id)
 
+    def test_message_state(self):
+        person_1 = self.db.add_person('Person One')
+        self.db.add_email(person_1, '1@a', primary=True, public=True)
+
+        message_ids = [
+            self.db.add_message('test {}'.format(i), 'test message',
+                                [person_1])
+            for i in range(6)]
+
+        def search_ids(**kwargs):
+            return list(self.db.search_message(**kwargs).keys())
+
+        self.assertEqual(
+            search_ids(state=MessageState.UNSENT), message_ids[::-1])
+
+        # Mark messages as sending and sent, and discard one.
+        message = self.db.get_unsent_message(mark_sending=True)
+        self.assertEqual(message.id, message_ids[0])
+        self.assertEqual(self.db.get_message(message.id).state,
+                         MessageState.SENDING)
+
+        self.assertEqual(
+            [x.id for x in self.db.get_unsent_messages(
+                2, mark_sending=True)],
+            message_ids[1:3])
+
+        self.db.mark_message_sent(message_ids[0], '<0@localhost>')
+        self.assertEqual(self.db.mark_messages_sent({
+            message_ids[0]: '<0@localhost>',
+            message_ids[1]: '<1@localhost>',
+            1999999: '<2@localhost>',
+        }), [message_ids[0], 1999999])
+
+        self.db.update_message(message_ids[2], state=MessageState.DISCARD)
+        self.db.update_message(message_ids[3], state=MessageState.DISCARD)
+
+        # A discarded message which was already being sent should remain
+        # discarded when it is marked as sent.
+        self.db.mark_message_sent(message_ids[2], '<2@localhost>')
+
+        self.assertEqual(
+            search_ids(state=MessageState.SENT), message_ids[1::-1])
+        self.assertEqual(
+            search_ids(state=MessageState.SENDING), [])
+        self.assertEqual(
+            search_ids(state=MessageState.DISCARD), message_ids[3:1:-1])
+        self.assertEqual(
+            search_ids(state=MessageState.UNSENT), message_ids[:3:-1])
+
+        self.assertEqual(self.db.get_unsent_message().id, message_ids[4])
+
+        # Recomputing the state should have no effect, but should restore
+        # it after it has been set to a default value by a migration.
+        self.assertEqual(self.db.update_message_state(), 0)
+
+        with self.db._transaction() as conn:
+            conn.execute(message_table.update().values({
+                message_table.c.state: MessageState.DISCARD}))
+
+        self.assertEqual(search_ids(state=MessageState.UNSENT), [])
+
+        self.assertEqual(self.db.update_message_state(), 4)
+
+        self.assertEqual(
+            search_ids(state=MessageState.SENT), message_ids[1::-1])
+        self.assertEqual(
+            search_ids(state=MessageState.DISCARD), message_ids[3:1:-1])
+        self.assertEqual(
+            search_ids(state=MessageState.UNSENT), message_ids[:3:-1])
+
+        # Check searching for pages of messages either side of a message.
+        self.assertEqual(
+            search_ids(message_id_lt=message_ids[3], limit=2),
+            message_ids[2:0:-1])
+        self.assertEqual(
+            search_ids(message_id_gt=message_ids[1], limit=2,
+                       oldest_first=True),
+            message_ids[2:4])
+        self.assertEqual(
+            search_ids(message_id_gt=message_ids[1],
+                       message_id_lt=message_ids[4]),
+            message_ids[3:1:-1])
+
     def test_multiple_message(self):
         # Create some person records with multiple email addresses.
         person_1 = self.db.add_person('Person One')
@@ -23,11 +23,11 @@ from datetime import datetime, timedelta
 from sqlalchemy.sql import select
 
 from hedwig import auth
-from hedwig.db.meta import auth_failure, invitation, reset_token
+from hedwig.db.meta import auth_failure, invitation, reset_token, user
 from hedwig.error import ConsistencyError, DatabaseIntegrityError, \
     Error, NoSuchRecord, UserError
 from hedwig.type.collection import EmailCollection, ResultCollection
-from hedwig.type.enum import BaseCallType, FormatType
+from hedwig.type.enum import BaseCallType, FormatType, UserLogEvent
 from hedwig.type.simple import Email, \
     Institution, InstitutionInfo, MemberInstitution, \
     Person, UserInfo
@@ -83,7 +83,6 @@ class DBPeopleTest(DBTestCase):
         self.assertEqual(self.db.authenticate_user('user1', 'pass1'), user_id)
 
         # Test unsuccessful authentication.
-        auth.password_hash_delay = 0
         self.assertIsNone(self.db.authenticate_user('user1', 'wrongpass'))
         self.assertIsNone(self.db.authenticate_user('user2', 'pass1'))
 
@@ -131,9 +130,73 @@ class DBPeopleTest(DBTestCase):
         with self.assertRaisesRegexp(UserError, 'blank'):
             self.db.update_user_name(user_id, '')
 
+    def test_user_rehash(self):
+        user_id = self.db.add_user('user1', 'pass1')
+
+        # Simulate a password hash from before the number of rounds
+        # was stored.
+        self.addCleanup(setattr, auth, '_legacy_rounds', auth._legacy_rounds)
+        auth._legacy_rounds = 20
+        (password_hash, password_salt) = auth.create_password_hash(
+            'pass1', rounds=20)
+
+        with self.db._transaction() as conn:
+            conn.execute(user.update().where(user.c.id == user_id).values({
+                user.c.password: password_hash,
+                user.c.salt: password_salt,
+                user.c.password_rounds: None,
+            }))
+
+        # Authentication should upgrade the hash to the current
+        # number of rounds.
+        self.assertIsNone(self.db.authenticate_user('user1', 'wrongpass'))
+        self.assertIsNone(self._get_user_password_rounds(user_id))
+
+        self.assertEqual(self.db.authenticate_user('user1', 'pass1'), user_id)
+        self.assertEqual(self._get_user_password_rounds(user_id), 10)
+
+        # Increase the number of rounds.
+        auth._rounds = 15
+        self.assertEqual(self.db.authenticate_user('user1', 'pass1'), user_id)
+        self.assertEqual(self._get_user_password_rounds(user_id), 15)
+        self.assertEqual(self.db.authenticate_user('user1', 'pass1'), user_id)
+
+        # Rehashing should not have added user log entries.
+        self.assertEqual(
+            [x.event for x in self.db.search_user_log(user_id).values()],
+            [UserLogEvent.CREATE])
+
+        # Failure to rehash (e.g. if the hashing pool is busy) should not
+        # prevent log in.
+        def update_user_password(*args, **kwargs):
+            raise UserError('The server is currently busy.')
+
+        auth._rounds = 16
+        self.db.update_user_password = update_user_password
+        self.assertEqual(self.db.authenticate_user('user1', 'pass1'), user_id)
+        self.assertEqual(self._get_user_password_rounds(user_id), 15)
+        del self.db.update_user_password
+
+        # Legacy hashes should not be replaced if the number of rounds
+        # is unchanged.
+        with self.db._transaction() as conn:
+            conn.execute(user.update().where(user.c.id == user_id).values({
+                user.c.password: password_hash,
+                user.c.salt: password_salt,
+                user.c.password_rounds: None,
+            }))
+
+        auth._rounds = 20
+        self.assertEqual(self.db.authenticate_user('user1', 'pass1'), user_id)
+        self.assertIsNone(self._get_user_password_rounds(user_id))
+
+    def _get_user_password_rounds(self, user_id):
+        with self.db._transaction() as conn:
+            return conn.execute(select([user.c.password_rounds]).where(
+                user.c.id == user_id)).scalar()
+
     def test_user_auth_failure(self):
         allowed_failures = 5
-        auth.password_hash_delay = 0
 
         user_id = self.db.add_user('user1', 'pass1')
 
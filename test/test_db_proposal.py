@@ -19,20 +19,23 @@ from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
 from datetime import datetime
+from math import cos, radians
 
 from hedwig.db.meta import member
 from hedwig.error import ConsistencyError, DatabaseIntegrityError, \
     Error, NoSuchRecord, UserError
 from hedwig.type.collection import AffiliationCollection, \
     CallCollection, MemberCollection, \
+    PrevProposalCollection, \
     ProposalCollection, ProposalCategoryCollection, ProposalTextCollection, \
     ResultCollection, TargetCollection
 from hedwig.type.enum import AffiliationType, AttachmentState, \
     BaseCallType, BaseTextRole, \
     CallState, FigureType, \
     FormatType, ProposalState
+from hedwig.type.misc import FileStream
 from hedwig.type.simple import Affiliation, Call, CallPreamble, Category, \
-    Member, MemberInstitution, \
+    Member, MemberInstitution, PrevProposal, \
     Proposal, ProposalCategory, ProposalFigureInfo, ProposalPDFInfo, \
     ProposalText, ProposalTextInfo, Target
 from .dummy_db import DBTestCase
@@ -603,6 +606,20 @@ class DBProposalTest(DBTestCase):
         self.assertIsInstance(result.proposals, ResultCollection)
         self.assertEqual(len(result.proposals), 20)
 
+        # Search for a list of proposals, in blocks of fewer proposals.
+        proposal_ids = list(
+            self.db.search_proposal(call_id=call_id_1).keys())[::3]
+        self.assertEqual(len(proposal_ids), 4)
+
+        self.db.query_block_size = 3
+        result = self.db.search_proposal(
+            proposal_id=proposal_ids, with_members=True)
+        self.assertIsInstance(result, ProposalCollection)
+        self.assertEqual(list(result.keys()), proposal_ids)
+
+        for proposal in result.values():
+            self.assertEqual(len(proposal.members), 1)
+
     def test_add_member(self):
         # Create test records and check we have integer identifiers for all.
         (call_id, affiliation_id) = self._create_test_call(
@@ -974,10 +991,21 @@ class DBProposalTest(DBTestCase):
                                      id_=pdf_id).data,
             pdf)
 
+        stream = self.db.get_proposal_pdf(proposal_id, role, stream=True)
+        self.assertIsInstance(stream.data, FileStream)
+        self.assertEqual(stream.type, FigureType.PDF)
+        self.assertEqual(stream.filename, 'test.pdf')
+        self.assertEqual(stream.data.length, len(pdf))
+        self.assertEqual(list(stream.data.iter_range(2, 9, chunk_size=3)),
+                         [b'mmy', b' PD', b'F'])
+        self.assertEqual(stream.data.read(), pdf)
+
         result = self.db.search_proposal_pdf(proposal_id=proposal_id)
         self.assertEqual(len(result), 1)
         self.assertIn(pdf_id, result)
         pdf_info = result[pdf_id]
+        self.assertEqual(stream.data.etag, pdf_info.md5sum)
+        self.assertEqual(stream.data.last_modified, pdf_info.uploaded)
         self.assertIsInstance(pdf_info, ProposalPDFInfo)
         self.assertEqual(pdf_info.id, pdf_id)
         self.assertEqual(pdf_info.proposal_id, proposal_id)
@@ -1006,6 +1034,37 @@ class DBProposalTest(DBTestCase):
             pdf_id=pdf_id, state=AttachmentState.ERROR,
             state_prev=AttachmentState.READY)
 
+        # Test setting a single page rendered on demand: this should only
+        # be allowed while the PDF is unprocessed and has the given MD5 sum.
+        self.assertFalse(
+            self.db.set_proposal_pdf_preview_page(pdf_id, 2, b'page 2'))
+
+        self.db.update_proposal_pdf(
+            pdf_id=pdf_id, state=AttachmentState.PROCESSING)
+
+        md5sum = self.db.search_proposal_pdf(
+            proposal_id=proposal_id)[pdf_id].md5sum
+
+        self.assertFalse(self.db.set_proposal_pdf_preview_page(
+            pdf_id, 2, b'page 2', md5sum='0' * 32))
+        self.assertTrue(self.db.set_proposal_pdf_preview_page(
+            pdf_id, 2, b'page 2', md5sum=md5sum))
+        self.assertFalse(
+            self.db.set_proposal_pdf_preview_page(pdf_id, 2, b'other'))
+
+        self.db.update_proposal_pdf(
+            pdf_id=pdf_id, state=AttachmentState.ERROR)
+
+        self.assertEqual(
+            self.db.get_proposal_pdf_preview(proposal_id, role, 2),
+            b'page 2')
+
+        with self.assertRaises(NoSuchRecord):
+            self.db.get_proposal_pdf_preview(proposal_id, role, 1)
+
+        with self.assertRaises(ConsistencyError):
+            self.db.set_proposal_pdf_preview_page(pdf_id + 1, 1, b'page 1')
+
         # Test setting preview images.
         self.db.set_proposal_pdf_preview(pdf_id, [b'dummy 1', b'dummy 2'])
 
@@ -1020,6 +1079,43 @@ class DBProposalTest(DBTestCase):
         with self.assertRaises(NoSuchRecord):
             self.db.get_proposal_pdf_preview(proposal_id, role, 3)
 
+        # Test setting preview images and marking the PDF ready: this
+        # should only apply to PDF files in the PROCESSING state.
+        self.assertEqual(self.db.set_proposal_pdf_preview_ready(
+            {pdf_id: [b'ready 1']}), [])
+
+        self.assertEqual(
+            self.db.get_proposal_pdf_preview(proposal_id, role, 1),
+            b'dummy 1')
+
+        self.db.update_proposal_pdf(
+            pdf_id=pdf_id, state=AttachmentState.PROCESSING)
+
+        self.assertEqual(self.db.set_proposal_pdf_preview_ready(
+            {pdf_id: [b'ready 1', b'ready 2']}), [pdf_id])
+
+        self.assertEqual(
+            self.db.search_proposal_pdf(proposal_id=proposal_id)[
+                pdf_id].state,
+            AttachmentState.READY)
+
+        self.assertEqual(
+            self.db.get_proposal_pdf_preview(proposal_id, role, 1),
+            b'ready 1')
+
+        self.db.set_proposal_pdf_preview(pdf_id, [b'dummy 1', b'dummy 2'])
+
+        stream = self.db.get_proposal_pdf_preview(
+            proposal_id, role, 2, md5sum=pdf_info.md5sum, stream=True)
+        self.assertIsInstance(stream, FileStream)
+        self.assertEqual(stream.etag, pdf_info.md5sum)
+        self.assertEqual(stream.last_modified, pdf_info.uploaded)
+        self.assertEqual(stream.read(), b'dummy 2')
+
+        with self.assertRaises(NoSuchRecord):
+            self.db.get_proposal_pdf_preview(
+                proposal_id, role, 2, md5sum='0', stream=True)
+
         # Test deleting the PDF.
         self.db.delete_proposal_pdf(proposal_id, role)
 
@@ -1078,6 +1174,18 @@ class DBProposalTest(DBTestCase):
             self.db.get_proposal_figure(proposal_id, role, fig_id).data,
             fig)
 
+        stream = self.db.get_proposal_figure(
+            proposal_id, role, fig_id, stream=True)
+        self.assertIsInstance(stream.data, FileStream)
+        self.assertEqual(stream.type, type_)
+        self.assertEqual(stream.data.read(), fig)
+        self.assertEqual(stream.data.etag, fig_info.md5sum)
+        self.assertEqual(stream.data.last_modified, fig_info.uploaded)
+
+        with self.assertRaises(NoSuchRecord):
+            self.db.get_proposal_figure(
+                proposal_id, role, fig_id, md5sum='0', stream=True)
+
         # Try previews and thumbnails.
         preview = b'dummy preview'
         thumbnail = b'dummy thumbnail'
@@ -1107,11 +1215,46 @@ class DBProposalTest(DBTestCase):
             self.db.get_proposal_figure_thumbnail(proposal_id, role, fig_id),
             thumbnail)
 
+        # Try setting the images and marking the figure ready: this should
+        # only apply to figures in the PROCESSING state.
+        self.assertEqual(self.db.set_proposal_figure_alternate_ready(
+            {fig_id: (None, b'other thumbnail')}), [])
+
+        self.db.update_proposal_figure(
+            None, None, fig_id, state=AttachmentState.PROCESSING)
+
+        self.assertEqual(self.db.set_proposal_figure_alternate_ready(
+            {fig_id: (preview, thumbnail)}), [fig_id])
+
+        self.assertEqual(
+            self.db.search_proposal_figure(fig_id=fig_id).get_single().state,
+            AttachmentState.READY)
+
+        self.assertEqual(
+            self.db.get_proposal_figure_preview(proposal_id, role, fig_id),
+            preview)
+
+        self.assertEqual(
+            self.db.get_proposal_figure_thumbnail(proposal_id, role, fig_id),
+            thumbnail)
+
+        for (stream, expect) in (
+                (self.db.get_proposal_figure_preview(
+                    proposal_id, role, fig_id, stream=True), preview),
+                (self.db.get_proposal_figure_thumbnail(
+                    proposal_id, role, fig_id, md5sum=fig_info.md5sum,
+                    stream=True), thumbnail)):
+            self.assertIsInstance(stream, FileStream)
+            self.assertEqual(stream.etag, fig_info.md5sum)
+            self.assertEqual(stream.last_modified, fig_info.uploaded)
+            self.assertEqual(stream.length, len(expect))
+            self.assertEqual(stream.read(), expect)
+
         # Try updating the figure...
         # ... change figure state.
         self.db.update_proposal_figure(
             None, None, fig_id, state=AttachmentState.ERROR,
-            state_prev=AttachmentState.NEW)
+            state_prev=AttachmentState.READY)
 
         result = self.db.search_proposal_figure(proposal_id=proposal_id,
                                                 with_has_preview=True)
@@ -1190,6 +1333,118 @@ class DBProposalTest(DBTestCase):
             self.assertEqual(t.name, 'Obj {}'.format(i))
             i += 1
 
+        # Search for the targets of a whole call.
+        proposal_id_2 = self.db.add_proposal(call_id, person_id,
+                                             affiliation_id, 'Proposal 2')
+
+        self.db.sync_proposal_target(proposal_id_2, TargetCollection([
+            (1, Target(1, proposal_id_2, 1, 'Obj 4', 1, 0.5, -0.5, 15.5, 1)),
+        ]))
+
+        result = self.db.search_target(call_id=call_id)
+        self.assertEqual(
+            [x.name for x in result.values()],
+            ['Obj 1', 'Obj 2', 'Obj 3', 'Obj 4'])
+
+        with self.assertRaises(Error):
+            self.db.search_target()
+
+    def test_target_overlap(self):
+        (call_id, affiliation_id) = self._create_test_call('sem1', 'queue1')
+        (call_id_prev, affiliation_id_prev) = self._create_test_call(
+            'sem0', 'queue0')
+        person_id = self.db.add_person('Person 1')
+
+        proposal_ids = [
+            self.db.add_proposal(
+                call_id, person_id, affiliation_id, 'Proposal {}'.format(i))
+            for i in range(3)]
+        proposal_id_prev = self.db.add_proposal(
+            call_id_prev, person_id, affiliation_id_prev, 'Proposal 3')
+
+        for (proposal_id, targets) in zip(
+                proposal_ids + [proposal_id_prev], [
+                    [(10.0, 20.0), (100.0, -30.0), (None, None)],
+                    [(10.0 + 0.5 / 60.0, 20.0)],
+                    [(100.0, -30.0 + 5.0 / 60.0)],
+                    [(100.0, -30.0)]]):
+            self.db.sync_proposal_target(proposal_id, TargetCollection(
+                (i, Target(
+                    i, proposal_id, i, 'Obj {}'.format(i),
+                    (None if x is None else 1), x, y, None, None))
+                for (i, (x, y)) in enumerate(targets, 1)))
+
+        targets = self.db.search_target(call_id=call_id)
+        target_ids = {(x.proposal_id, x.sort_order): x.id
+                      for x in targets.values()}
+
+        # Only the proposals within 1' of each other should be found,
+        # and the previous proposal should only be included when requested.
+        result = self.db.search_target_overlap(
+            call_id=call_id, radius=1.0 / 60.0, with_prev_proposals=False)
+        self.assertIsInstance(result, list)
+        self.assertEqual(
+            [(x.proposal_id, x.target_id, x.other_proposal_id,
+              x.other_target_id) for x in result],
+            [
+                (proposal_ids[0], target_ids[(proposal_ids[0], 1)],
+                 proposal_ids[1], target_ids[(proposal_ids[1], 1)]),
+                (proposal_ids[1], target_ids[(proposal_ids[1], 1)],
+                 proposal_ids[0], target_ids[(proposal_ids[0], 1)]),
+            ])
+        self.assertAlmostEqual(
+            result[0].separation * 60.0, 0.5 * cos(radians(20.0)), places=3)
+
+        self.db.sync_proposal_prev_proposal(
+            proposal_ids[0], PrevProposalCollection([
+                (1, PrevProposal(
+                    None, proposal_ids[0], proposal_id_prev, 'PREV', False,
+                    [])),
+            ]))
+
+        result = self.db.search_target_overlap(
+            call_id=call_id, radius=1.0 / 60.0)
+        self.assertEqual(
+            [(x.proposal_id, x.other_proposal_id) for x in result],
+            [(proposal_ids[0], proposal_ids[1]),
+             (proposal_ids[0], proposal_id_prev),
+             (proposal_ids[1], proposal_ids[0])])
+        self.assertAlmostEqual(result[1].separation, 0.0, places=6)
+
+        # A larger radius should include the third proposal.
+        result = self.db.search_target_overlap(
+            call_id=call_id, radius=6.0 / 60.0)
+        self.assertEqual(
+            sorted(set((x.proposal_id, x.other_proposal_id) for x in result)),
+            sorted([
+                (proposal_ids[0], proposal_ids[1]),
+                (proposal_ids[0], proposal_ids[2]),
+                (proposal_ids[0], proposal_id_prev),
+                (proposal_ids[1], proposal_ids[0]),
+                (proposal_ids[2], proposal_ids[0]),
+                (proposal_ids[2], proposal_id_prev),
+            ]))
+
+        # The proposal state constraint should apply to the call's proposals.
+        result = self.db.search_target_overlap(
+            call_id=call_id, radius=1.0 / 60.0, state=ProposalState.SUBMITTED)
+        self.assertEqual(result, [])
+
+        # Removing targets should remove them from the index.
+        self.db.sync_proposal_target(proposal_ids[1], TargetCollection())
+
+        result = self.db.search_target_overlap(
+            call_id=call_id, radius=1.0 / 60.0)
+        self.assertEqual(
+            [(x.proposal_id, x.other_proposal_id) for x in result],
+            [(proposal_ids[0], proposal_id_prev)])
+
+        self.assertEqual(self.db.update_target_cell(), 3)
+
+        result = self.db.search_target_overlap(
+            call_id=call_id, radius=1.0 / 60.0)
+        self.assertEqual(len(result), 1)
+
     def test_category(self):
         facility_id = self.db.ensure_facility('cat test facility')
         records = ResultCollection()
@@ -0,0 +1,240 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from datetime import datetime
+from hashlib import md5
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pymoc import MOC
+from sqlalchemy.sql import select
+
+from hedwig.db.meta import moc_fits, proposal_fig, proposal_pdf
+from hedwig.db.store import DirectoryStore, get_attachment_store
+from hedwig.error import Error, FormattedError, NoSuchRecord
+from hedwig.file.moc import write_moc
+from hedwig.type.enum import BaseCallType, BaseTextRole, FigureType, \
+    FormatType
+from hedwig.type.misc import FileStream
+
+from .dummy_db import get_dummy_database
+
+
+class DBStoreTest(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.store = DirectoryStore(self.directory)
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_directory_store(self):
+        data = b'some attachment data'
+        key = md5(data).hexdigest()
+
+        self.assertEqual(self.store.put(data), key)
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.directory, key[:2], key)))
+
+        # Storing the same data again should give the same key,
+        # and refresh the modification time.
+        path = os.path.join(self.directory, key[:2], key)
+        os.utime(path, (1000000000, 1000000000))
+        self.assertEqual(list(self.store.iter_keys(min_age=3600)), [key])
+
+        self.assertEqual(self.store.put(data), key)
+        self.assertEqual(list(self.store.iter_keys()), [key])
+        self.assertEqual(list(self.store.iter_keys(min_age=3600)), [])
+
+        # Attachments stored after the given time should not be deleted.
+        self.assertFalse(self.store.delete(key, max_mtime=1000000000))
+        self.assertEqual(list(self.store.iter_keys()), [key])
+
+        self.assertEqual(self.store.get(key), data)
+
+        stream = self.store.get_stream(key, etag='abc')
+        self.assertIsInstance(stream, FileStream)
+        self.assertEqual(stream.length, len(data))
+        self.assertEqual(stream.etag, 'abc')
+        self.assertEqual(stream.path,
+                         os.path.join(self.directory, key[:2], key))
+        self.assertEqual(list(stream.iter_range(5, 15, chunk_size=6)),
+                         [b'attach', b'ment'])
+
+        self.assertTrue(self.store.delete(key))
+        self.assertEqual(list(self.store.iter_keys()), [])
+
+        missing = md5(b'missing').hexdigest()
+
+        with self.assertRaises(NoSuchRecord):
+            self.store.get(missing)
+
+        with self.assertRaises(NoSuchRecord):
+            self.store.get_stream(missing)
+
+        with self.assertRaises(NoSuchRecord):
+            self.store.delete(missing)
+
+        with self.assertRaises(FormattedError):
+            self.store.get('../../etc/passwd')
+
+        self.assertIsInstance(
+            get_attachment_store('directory', directory=self.directory),
+            DirectoryStore)
+
+        with self.assertRaises(FormattedError):
+            get_attachment_store('unknown')
+
+        with self.assertRaises(FormattedError):
+            DirectoryStore(os.path.join(self.directory, 'missing'))
+
+    def test_database_store(self):
+        db = get_dummy_database(
+            facility_spec='Generic', attachment_store=self.store)
+
+        (proposal_id, person_id) = self._create_test_proposal(db)
+        role = BaseTextRole.TECHNICAL_CASE
+
+        pdf = b'dummy PDF file'
+        fig = b'dummy figure'
+        thumbnail = b'dummy thumbnail'
+        moc_object = MOC(order=1, cells=(4, 7))
+        fits = write_moc(moc_object)
+
+        db.set_proposal_pdf(BaseTextRole, proposal_id, role, pdf, 1,
+                            'test.pdf', person_id)
+        db.set_proposal_pdf_preview(
+            db.search_proposal_pdf(proposal_id=proposal_id).get_single().id,
+            [b'dummy page'])
+        fig_id = db.add_proposal_figure(
+            BaseTextRole, proposal_id, role + 1, FigureType.PNG, fig,
+            'Caption', 'test.png', person_id)
+        db.set_proposal_figure_thumbnail(fig_id, thumbnail)
+        moc_id = db.add_moc(db.ensure_facility('my_tel'), 'test', '',
+                            FormatType.PLAIN, True, moc_object)
+
+        # The data should only be in the store.
+        with db._transaction() as conn:
+            for column in (proposal_pdf.c.pdf, proposal_fig.c.figure,
+                           moc_fits.c.fits):
+                row = conn.execute(select([
+                    column, column.table.c.store_key])).first()
+                self.assertIsNone(row[0])
+                self.assertIsNotNone(row[1])
+
+        self.assertEqual(len(list(self.store.iter_keys())), 5)
+
+        self._check_attachments(db, proposal_id, role, fig_id, moc_id,
+                                pdf, fig, thumbnail, fits)
+
+        stream = db.get_proposal_pdf(proposal_id, role, stream=True).data
+        self.assertIsNotNone(stream.path)
+        self.assertEqual(stream.read(), pdf)
+
+        # Move the attachments back into the database.
+        self.assertEqual(db.migrate_attachments(to_store=False), {
+            'moc_fits': 1,
+            'proposal_fig': 1,
+            'proposal_fig_preview': 0,
+            'proposal_fig_thumbnail': 1,
+            'proposal_pdf': 1,
+            'proposal_pdf_preview': 1,
+        })
+
+        self._check_attachments(db, proposal_id, role, fig_id, moc_id,
+                                pdf, fig, thumbnail, fits)
+
+        stream = db.get_proposal_pdf(proposal_id, role, stream=True).data
+        self.assertIsNone(stream.path)
+        self.assertEqual(stream.read(), pdf)
+
+        # All attachments are now unreferenced.
+        self.assertEqual(db.clean_attachment_store(dry_run=True), 0)
+        self.assertEqual(db.clean_attachment_store(min_age=0, dry_run=True), 5)
+        self.assertEqual(len(list(self.store.iter_keys())), 5)
+        self.assertEqual(db.clean_attachment_store(min_age=0), 5)
+        self.assertEqual(list(self.store.iter_keys()), [])
+
+        # Move the attachments into the store again.
+        moved = db.migrate_attachments()
+        self.assertEqual(sum(moved.values()), 5)
+        self.assertEqual(db.migrate_attachments(), {
+            x: 0 for x in moved.keys()})
+
+        self._check_attachments(db, proposal_id, role, fig_id, moc_id,
+                                pdf, fig, thumbnail, fits)
+
+        # Replacing the figure should leave the old one unreferenced.
+        db.update_proposal_figure(
+            None, None, fig_id, figure=b'new figure', type_=FigureType.PNG,
+            filename='new.png', uploader_person_id=person_id)
+
+        self.assertEqual(
+            db.get_proposal_figure(None, None, fig_id).data, b'new figure')
+
+        self.assertEqual(db.clean_attachment_store(min_age=0), 2)
+
+        self.assertEqual(
+            db.get_proposal_pdf(proposal_id, role).data, pdf)
+
+        # Without a store, stored attachments can not be read.
+        db._attachment_store = None
+
+        with self.assertRaisesRegexp(Error, 'not configured'):
+            db.get_proposal_pdf(proposal_id, role)
+
+    def _check_attachments(self, db, proposal_id, role, fig_id, moc_id,
+                           pdf, fig, thumbnail, fits):
+        self.assertEqual(db.get_proposal_pdf(proposal_id, role).data, pdf)
+        self.assertEqual(
+            db.get_proposal_pdf_preview(proposal_id, role, 1), b'dummy page')
+        self.assertEqual(
+            db.get_proposal_pdf_preview(
+                proposal_id, role, 1, stream=True).read(), b'dummy page')
+        self.assertEqual(
+            db.get_proposal_figure(proposal_id, role + 1, fig_id).data, fig)
+        self.assertEqual(
+            db.get_proposal_figure(
+                proposal_id, role + 1, fig_id, stream=True).data.read(), fig)
+        self.assertEqual(
+            db.get_proposal_figure_thumbnail(proposal_id, role + 1, fig_id),
+            thumbnail)
+        self.assertEqual(db.get_moc_fits(moc_id), fits)
+        self.assertEqual(db.get_moc_fits(moc_id, stream=True).read(), fits)
+
+    def _create_test_proposal(self, db):
+        facility_id = db.ensure_facility('my_tel')
+        semester_id = db.add_semester(
+            facility_id, 'sem', 'sem',
+            datetime(2000, 1, 1), datetime(2000, 6, 30))
+        queue_id = db.add_queue(facility_id, 'queue', 'queue')
+        call_id = db.add_call(
+            BaseCallType, semester_id, queue_id, BaseCallType.STANDARD,
+            datetime(1999, 9, 1), datetime(1999, 9, 30),
+            100, 1000, 0, 1, 2000, 4, 3, 100, 100,
+            '', '', '', FormatType.PLAIN)
+        affiliation_id = db.add_affiliation(queue_id, 'aff')
+        person_id = db.add_person('Person 1')
+        proposal_id = db.add_proposal(call_id, person_id,
+                                      affiliation_id, 'Proposal 1')
+
+        return (proposal_id, person_id)
@@ -0,0 +1,137 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import asyncore
+from email import message_from_string
+import smtpd
+from threading import Thread
+
+from hedwig.config import get_config
+from hedwig.email.poll import send_queued_messages
+from hedwig.type.enum import MessageState, MessageThreadType
+
+from .dummy_config import DummyConfigTestCase
+from .dummy_db import get_dummy_database
+
+
+class StubSMTPChannel(smtpd.SMTPChannel):
+    def found_terminator(self):
+        smtpd.SMTPChannel.found_terminator(self)
+
+        # Simulate the server dropping the connection after receiving
+        # a given number of messages.
+        server = self._SMTPChannel__server
+        if server.disconnect_after is not None and \
+                len(server.received) == server.disconnect_after:
+            server.disconnect_after = None
+            self.close_when_done()
+
+
+class StubSMTPServer(smtpd.SMTPServer):
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+
+        self.received = []
+        self.connections = 0
+        self.disconnect_after = None
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            self.connections += 1
+            StubSMTPChannel(self, pair[0], pair[1])
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        self.received.append((rcpttos, message_from_string(data)))
+
+
+class EmailPollTest(DummyConfigTestCase):
+    def setUp(self):
+        super(EmailPollTest, self).setUp()
+
+        self.server = StubSMTPServer()
+        self.thread = Thread(target=asyncore.loop,
+                             kwargs={'timeout': 0.1, 'use_poll': True})
+        self.thread.daemon = True
+        self.thread.start()
+
+        config = get_config()
+        config.set('email', 'server', '127.0.0.1:{}'.format(
+            self.server.socket.getsockname()[1]))
+        config.set('email', 'from', 'Hedwig <hedwig@test>')
+
+    def tearDown(self):
+        self.server.close()
+        self.thread.join()
+
+        super(EmailPollTest, self).tearDown()
+
+    def test_send_queued_messages(self):
+        db = get_dummy_database()
+
+        person_ids = []
+        for i in range(3):
+            person_id = db.add_person('Person {}'.format(i))
+            db.add_email(person_id, 'p{}@test'.format(i), primary=True)
+            person_ids.append(person_id)
+
+        message_ids = []
+        for i in range(10):
+            message_ids.append(db.add_message(
+                'Message {}'.format(i), 'Test message body.',
+                person_ids[i % 3:],
+                thread_type=MessageThreadType.PROPOSAL_STATUS,
+                thread_id=(i % 2)))
+
+        self.server.disconnect_after = 3
+
+        self.assertEqual(send_queued_messages(db=db, batch_size=4), 10)
+
+        # The server dropped the connection once: it should have
+        # been re-established, and then each batch should have used a
+        # single connection.
+        self.assertEqual(len(self.server.received), 10)
+        self.assertEqual(self.server.connections, 6)
+
+        messages = db.search_message(oldest_first=True)
+        self.assertEqual(list(messages.keys()), message_ids)
+
+        identifiers = {}
+
+        for ((rcpttos, email), message) in zip(
+                self.server.received, messages.values()):
+            self.assertEqual(message.state, MessageState.SENT)
+            self.assertEqual(email['Subject'], message.subject)
+            self.assertEqual(email['Message-ID'], message.identifier)
+
+            # Check that each message refers to the previous message in
+            # its thread.
+            previous = identifiers.get(message.thread_id)
+            if previous is None:
+                self.assertIsNone(email['In-Reply-To'])
+            else:
+                self.assertEqual(email['In-Reply-To'], previous)
+
+            identifiers[message.thread_id] = message.identifier
+
+        self.assertEqual(
+            self.server.received[2][0], ['p2@test'])
+
+        self.assertEqual(send_queued_messages(db=db), 0)
@@ -20,7 +20,10 @@ from __future__ import absolute_import, division, print_function, \
 
 from contextlib import closing
 from cStringIO import StringIO
+import os
 from os.path import exists
+from shutil import rmtree
+from tempfile import mkdtemp
 
 from PIL import Image
 from PyPDF2 import PdfFileWriter
@@ -32,7 +35,8 @@ from hedwig.file.image import create_thumbnail_and_preview, \
     _calculate_size
 from hedwig.file.info import determine_figure_type, \
     determine_pdf_page_count
-from hedwig.file.pdf import pdf_to_png, pdf_to_svg, ps_to_png
+from hedwig.file.pdf import pdf_page_to_png, pdf_to_png, pdf_to_svg, \
+    ps_to_png, _read_page_files, _run_converter
 from hedwig.type.enum import FigureType
 
 from .dummy_config import DummyConfigTestCase
@@ -53,6 +57,14 @@ with closing(StringIO()) as f:
     w.write(f)
     example_pdf = f.getvalue()
 
+with closing(StringIO()) as f:
+    w = PdfFileWriter()
+    w.addBlankPage(1, 1)
+    w.addBlankPage(2, 1)
+    w.addBlankPage(1, 2)
+    w.write(f)
+    example_pdf_multi = f.getvalue()
+
 example_eps = b"""%!PS-Adobe-3.0 EPSF-3.0
 %%BoundingBox: 0 0 100 50
 (Helvetica) findfont 12 scalefont setfont
@@ -94,6 +106,70 @@ class FileTest(DummyConfigTestCase):
         self.assertEqual(len(pages), 1)
         self.assertEqual(determine_figure_type(pages[0]), FigureType.PNG)
 
+    def test_pdf_to_png_multi_page(self):
+        for (renderer, utility) in (('ghostscript', 'ghostscript'),
+                                    ('pdftocairo', 'pdftocairo')):
+            if not exists(get_config().get('utilities', utility)):
+                continue
+
+            # Rendering all pages in one run should give the same pages, in
+            # the same order, as rendering each page separately.
+            pages = pdf_to_png(example_pdf_multi, renderer=renderer,
+                               multi_page=True)
+            self.assertEqual(len(pages), 3)
+
+            pages_single = pdf_to_png(example_pdf_multi, renderer=renderer,
+                                      multi_page=False)
+            self.assertEqual(len(pages_single), 3)
+
+            for (page, page_single) in zip(pages, pages_single):
+                self.assertEqual(determine_figure_type(page), FigureType.PNG)
+
+                with closing(StringIO(page)) as f:
+                    im = Image.open(f)
+                    with closing(StringIO(page_single)) as g:
+                        self.assertEqual(im.size, Image.open(g).size)
+
+            # Rendering a single page should also give the same page.
+            page = pdf_page_to_png(example_pdf_multi, 2, renderer=renderer)
+            self.assertEqual(determine_figure_type(page), FigureType.PNG)
+
+            with closing(StringIO(page)) as f:
+                with closing(StringIO(pages[1])) as g:
+                    self.assertEqual(Image.open(f).size, Image.open(g).size)
+
+    def test_run_converter(self):
+        if not exists('/bin/sleep'):
+            self.skipTest('sleep not available')
+
+        self.assertEqual(
+            _run_converter(['/bin/sleep', '0'], b'', 'Failed: ', timeout=5),
+            b'')
+
+        with self.assertRaisesRegexp(ConversionError, 'within 0.2 seconds'):
+            _run_converter(['/bin/sleep', '5'], b'', 'Failed: ', timeout=0.2)
+
+    def test_read_page_files(self):
+        temp_dir = mkdtemp()
+
+        try:
+            for (name, content) in (('page-09.png', 'nine'),
+                                    ('page-10.png', 'ten'),
+                                    ('page-08.png', 'eight'),
+                                    ('other.txt', 'other')):
+                with open(os.path.join(temp_dir, name), 'w') as f:
+                    f.write(content)
+
+            self.assertEqual(
+                _read_page_files(temp_dir, 'page-', '.png', [8, 9, 10]),
+                ['eight', 'nine', 'ten'])
+
+            with self.assertRaises(ConversionError):
+                _read_page_files(temp_dir, 'page-', '.png', [8, 9, 10, 11])
+
+        finally:
+            rmtree(temp_dir)
+
     def test_pdf_to_svg(self):
         if not exists(get_config().get('utilities', 'pdftocairo')):
             self.skipTest('pdftocairo not available')
@@ -0,0 +1,108 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import time
+from unittest import TestCase
+
+from hedwig.error import FormattedError
+from hedwig.file.cache import RenderCache, make_render_cache_key
+
+
+class FileCacheTest(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_render_cache_key(self):
+        key = make_render_cache_key('pdf', 'abc', {'a': 1, 'b': 2})
+
+        self.assertEqual(len(key), 32)
+        self.assertEqual(
+            make_render_cache_key('pdf', 'abc', {'b': 2, 'a': 1}), key)
+
+        for other in (
+                make_render_cache_key('figure', 'abc', {'a': 1, 'b': 2}),
+                make_render_cache_key('pdf', 'abd', {'a': 1, 'b': 2}),
+                make_render_cache_key('pdf', 'abc', {'a': 1, 'b': 3})):
+            self.assertNotEqual(other, key)
+
+    def test_render_cache(self):
+        cache = RenderCache(self.directory, max_size=25, expire_interval=0)
+
+        self.assertIsNone(cache.get('a'))
+
+        cache.put('a', {'page_0001': b'0123456789'})
+        cache.put('b', {'thumbnail': b'0123456789', 'preview': b''})
+
+        self.assertEqual(cache.get('a'), {'page_0001': b'0123456789'})
+        self.assertEqual(cache.get('b'), {
+            'thumbnail': b'0123456789', 'preview': b''})
+
+        # Make entry "b" the least-recently used and then add another
+        # entry: "b" should be removed.
+        for (key, age) in (('a', 10), ('b', 20)):
+            path = os.path.join(self.directory, key)
+            os.utime(path, (time() - age, time() - age))
+
+        cache.put('c', {'page_0001': b'0123456789'})
+
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+
+        self.assertEqual(self._list_entries(), ['a', 'c'])
+
+        with self.assertRaises(FormattedError):
+            cache.put('d', {'../x': b''})
+
+        self.assertEqual(self._list_entries(), ['a', 'c'])
+
+        with self.assertRaises(FormattedError):
+            RenderCache(os.path.join(self.directory, 'missing'), 1)
+
+    def test_render_cache_expire_interval(self):
+        cache = RenderCache(self.directory, max_size=15, expire_interval=600)
+
+        # The first entry causes the cache to be checked, but the next
+        # does not, as it was checked recently.
+        cache.put('a', {'page_0001': b'0123456789'})
+        cache.put('b', {'page_0001': b'0123456789'})
+
+        self.assertEqual(self._list_entries(), ['a', 'b'])
+
+        # Once the interval has passed, the cache is checked again.
+        stamp = os.path.join(self.directory, '.expire')
+        os.utime(stamp, (time() - 1200, time() - 1200))
+
+        os.utime(os.path.join(self.directory, 'a'),
+                 (time() - 10, time() - 10))
+
+        cache.put('c', {'page_0001': b'01234'})
+
+        self.assertEqual(self._list_entries(), ['b', 'c'])
+
+    def _list_entries(self):
+        return sorted(
+            x for x in os.listdir(self.directory) if not x.startswith('.'))
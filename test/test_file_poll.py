@@ -0,0 +1,221 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from contextlib import closing
+from cStringIO import StringIO
+from datetime import datetime
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import sleep
+
+from PIL import Image
+
+from hedwig.config import get_config
+from hedwig.error import ConversionError, UserError
+from hedwig.file.poll import process_proposal_figure, _run_jobs, \
+    _CachedResult
+from hedwig.type.enum import AttachmentState, BaseCallType, BaseTextRole, \
+    FigureType, FormatType
+
+from .dummy_config import DummyConfigTestCase
+from .dummy_db import get_dummy_database
+
+
+def job_square(x):
+    return x * x
+
+
+def job_fail(x):
+    raise UserError('Job {} failed', x)
+
+
+def job_sleep(x):
+    sleep(x)
+    return x
+
+
+def job_crash(x):
+    os._exit(1)
+
+
+class FilePollTest(DummyConfigTestCase):
+    def test_run_jobs(self):
+        for workers in (None, 2):
+            result = sorted(_run_jobs(
+                job_square, [(1, (3,)), (2, (4,)), (3, (5,))], workers))
+
+            self.assertEqual(result, [
+                (1, 9, None), (2, 16, None), (3, 25, None)])
+
+            # Jobs can be given by a generator, which should only be
+            # advanced as the pool requires more jobs.
+            claimed = []
+
+            def jobs():
+                for x in range(10):
+                    claimed.append(x)
+                    yield (x, (x,) if x % 3 else _CachedResult(-x))
+
+            results = _run_jobs(job_square, jobs(), workers)
+            next(results)
+            self.assertLess(len(claimed), 10)
+
+            result = sorted(results)
+            self.assertEqual(len(result), 9)
+            self.assertEqual(sorted(claimed), list(range(10)))
+            for (id_, value, error) in result:
+                self.assertIsNone(error)
+                self.assertEqual(value, id_ * id_ if id_ % 3 else -id_)
+
+            result = list(_run_jobs(job_fail, [(1, (3,))], workers))
+
+            self.assertEqual(len(result), 1)
+            (id_, value, error) = result[0]
+            self.assertEqual(id_, 1)
+            self.assertIsNone(value)
+            self.assertIsInstance(error, UserError)
+            self.assertEqual(error.message, 'Job 3 failed')
+
+            self.assertEqual(list(_run_jobs(job_square, [], workers)), [])
+
+    def test_run_jobs_timeout(self):
+        for func in (job_sleep, job_crash):
+            result = sorted(_run_jobs(
+                func, [(1, (0,)), (2, (60,))], workers=2, timeout=1))
+
+            self.assertEqual(len(result), 2)
+
+            self.assertEqual(result[1][0], 2)
+            self.assertIsNone(result[1][1])
+            self.assertIsInstance(result[1][2], ConversionError)
+
+            if func is job_sleep:
+                self.assertEqual(result[0], (1, 0, None))
+
+        # The timeout should apply to each job individually, and jobs
+        # running when another times out should be restarted.
+        result = sorted(_run_jobs(
+            job_sleep, [(1, (0.8,)), (2, (60,)), (3, (0.8,)), (4, (0.8,))],
+            workers=2, timeout=1.5))
+
+        self.assertEqual(len(result), 4)
+        self.assertEqual(result[1][0], 2)
+        self.assertIsInstance(result[1][2], ConversionError)
+        self.assertEqual(
+            [result[i] for i in (0, 2, 3)],
+            [(1, 0.8, None), (3, 0.8, None), (4, 0.8, None)])
+
+    def test_process_figure(self):
+        (db, proposal_id, person_id) = self._create_test_proposal()
+
+        with closing(StringIO()) as f:
+            Image.new('RGB', (2000, 1000)).save(f, format='PNG')
+            figure = f.getvalue()
+
+        fig_ids = [
+            db.add_proposal_figure(
+                BaseTextRole, proposal_id, BaseTextRole.TECHNICAL_CASE,
+                FigureType.PNG, data, 'Caption', 'test.png', person_id)
+            for data in (figure, b'not a figure')]
+
+        self.assertEqual(process_proposal_figure(db, workers=2), 1)
+
+        figures = db.search_proposal_figure(proposal_id=proposal_id)
+        self.assertEqual(figures[fig_ids[0]].state, AttachmentState.READY)
+        self.assertEqual(figures[fig_ids[1]].state, AttachmentState.ERROR)
+
+        preview = db.get_proposal_figure_preview(
+            proposal_id, BaseTextRole.TECHNICAL_CASE, fig_ids[0])
+
+        with closing(StringIO(preview)) as f:
+            self.assertEqual(Image.open(f).size, (800, 400))
+
+    def test_process_figure_cache(self):
+        (db, proposal_id, person_id) = self._create_test_proposal()
+
+        directory = mkdtemp()
+
+        try:
+            get_config().set('render_cache', 'directory', directory)
+
+            with closing(StringIO()) as f:
+                Image.new('RGB', (2000, 1000)).save(f, format='PNG')
+                figure = f.getvalue()
+
+            fig_id_1 = db.add_proposal_figure(
+                BaseTextRole, proposal_id, BaseTextRole.TECHNICAL_CASE,
+                FigureType.PNG, figure, 'Caption', 'test.png', person_id)
+
+            self.assertEqual(process_proposal_figure(db), 1)
+
+            # The images should have been cached: replace them to allow
+            # us to check that the cached images are used.
+            (key,) = (
+                x for x in os.listdir(directory) if not x.startswith('.'))
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(directory, key))),
+                ['preview', 'thumbnail'])
+
+            for name in ('preview', 'thumbnail'):
+                with open(os.path.join(directory, key, name), 'wb') as f:
+                    f.write(b'cached ' + name.encode('ascii'))
+
+            fig_id_2 = db.add_proposal_figure(
+                BaseTextRole, proposal_id, BaseTextRole.TECHNICAL_CASE,
+                FigureType.PNG, figure, 'Caption', 'test2.png', person_id)
+
+            self.assertEqual(process_proposal_figure(db, workers=2), 1)
+
+            figures = db.search_proposal_figure(proposal_id=proposal_id)
+            self.assertEqual(figures[fig_id_2].state, AttachmentState.READY)
+
+            self.assertEqual(
+                db.get_proposal_figure_preview(None, None, fig_id_2),
+                b'cached preview')
+            self.assertEqual(
+                db.get_proposal_figure_thumbnail(None, None, fig_id_2),
+                b'cached thumbnail')
+            self.assertNotEqual(
+                db.get_proposal_figure_thumbnail(None, None, fig_id_1),
+                b'cached thumbnail')
+
+        finally:
+            rmtree(directory)
+
+    def _create_test_proposal(self):
+        db = get_dummy_database(facility_spec='Generic')
+
+        facility_id = db.ensure_facility('my_tel')
+        semester_id = db.add_semester(
+            facility_id, 'sem1', 'sem1',
+            datetime(2000, 1, 1), datetime(2000, 6, 30))
+        queue_id = db.add_queue(facility_id, 'queue1', 'queue1')
+        call_id = db.add_call(
+            BaseCallType, semester_id, queue_id, BaseCallType.STANDARD,
+            datetime(1999, 9, 1), datetime(1999, 9, 30),
+            100, 1000, 0, 1, 2000, 4, 3, 100, 100,
+            '', '', '', FormatType.PLAIN)
+        affiliation_id = db.add_affiliation(queue_id, 'aff1')
+        person_id = db.add_person('Person 1')
+        proposal_id = db.add_proposal(
+            call_id, person_id, affiliation_id, 'Proposal 1')
+
+        return (db, proposal_id, person_id)
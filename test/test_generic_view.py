@@ -18,10 +18,18 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
+from healpy import ang2pix
+import numpy as np
+from pymoc import MOC
+
+from hedwig.admin.poll import process_call_target_clash
+from hedwig.astro.coord import CoordSystem
 from hedwig.error import NoSuchRecord
-from hedwig.type.collection import ReviewerCollection
-from hedwig.type.enum import ReviewState
-from hedwig.type.simple import Reviewer
+from hedwig.facility.generic.tool_clash import ClashTool
+from hedwig.type.collection import ReviewerCollection, TargetCollection
+from hedwig.type.enum import AttachmentState, FormatType, ProposalState, \
+    ReviewState
+from hedwig.type.simple import Reviewer, Target
 from hedwig.type.util import null_tuple
 
 from .dummy_facility import FacilityTestCase
@@ -107,3 +115,90 @@ class GenericFacilityTestCase(FacilityTestCase):
         (r, s) = self.view.calculate_overall_rating(c, with_std_dev=True)
         self.assertAlmostEqual(r, 70)
         self.assertIsNotNone(s)
+
+    def test_target_overlap(self):
+        types = self.view.get_call_types()
+
+        proposal_1 = self._create_test_proposal('20A', 'X', types.STANDARD)
+        proposal_2 = self._create_test_proposal('20A', 'X', types.STANDARD)
+        proposal_3 = self._create_test_proposal('20A', 'X', types.STANDARD)
+        call_id = self.db.get_proposal(self.facility_id, proposal_1).call_id
+
+        for (proposal_id, (x, y)) in [
+                (proposal_1, (10.0, 20.0)),
+                (proposal_2, (10.0, 20.01)),
+                (proposal_3, (200.0, -30.0))]:
+            self.db.sync_proposal_target(proposal_id, TargetCollection([
+                (1, null_tuple(Target)._replace(
+                    id=1, proposal_id=proposal_id, sort_order=1,
+                    name='Target', system=CoordSystem.ICRS, x=x, y=y))]))
+
+            self.db.update_proposal(proposal_id, state=ProposalState.REVIEW)
+
+        call = self.db.get_call(self.facility_id, call_id)
+        proposals = self.db.search_proposal(call_id=call_id)
+
+        self.assertEqual(
+            self.view._get_proposal_target_overlap(self.db, call, proposals),
+            {proposal_1: ['20A-X-2'], proposal_2: ['20A-X-1']})
+
+    def test_call_clash(self):
+        types = self.view.get_call_types()
+
+        proposal_1 = self._create_test_proposal('20A', 'X', types.STANDARD)
+        proposal_2 = self._create_test_proposal('20A', 'X', types.STANDARD)
+        call_id = self.db.get_proposal(self.facility_id, proposal_1).call_id
+
+        for (proposal_id, targets) in [
+                (proposal_1, [
+                    ('A', CoordSystem.ICRS, 10.0, 20.0),
+                    ('B', None, None, None),
+                    ('C', CoordSystem.ICRS, 200.0, -30.0)]),
+                (proposal_2, [
+                    ('D', CoordSystem.ICRS, 10.0, 20.0)])]:
+            self.db.sync_proposal_target(proposal_id, TargetCollection(
+                (i, null_tuple(Target)._replace(
+                    id=i, proposal_id=proposal_id, sort_order=i,
+                    name=name, system=system, x=x, y=y))
+                for (i, (name, system, x, y)) in enumerate(targets, 1)))
+
+            self.db.update_proposal(proposal_id, state=ProposalState.REVIEW)
+
+        # Create MOCs covering targets "A" and "D", one public and one not.
+        cell = int(ang2pix(2 ** 5, 0.5 * np.pi - np.radians(20.0),
+                           np.radians(10.0), nest=True))
+
+        moc_ids = []
+
+        for (name, public) in (('public', True), ('private', False)):
+            moc = MOC(order=5, cells=(cell,))
+            moc_id = self.db.add_moc(self.facility_id, name, name,
+                                     FormatType.PLAIN, public, moc)
+            self.db.update_moc_cell(moc_id, moc, block_pause=0)
+            moc_ids.append(moc_id)
+
+        # The targets should not be checked until the MOCs are ready.
+        self.assertEqual(process_call_target_clash(self.db), 0)
+        self.assertFalse(self.db.search_call_clash())
+
+        for moc_id in moc_ids:
+            self.db.update_moc(moc_id, state=AttachmentState.READY)
+
+        self.assertEqual(process_call_target_clash(self.db), 1)
+        self.assertEqual(list(self.db.search_call_clash().keys()), [call_id])
+
+        # A call should not be checked again unless a MOC is updated.
+        self.assertEqual(process_call_target_clash(self.db), 0)
+
+        clashes = self.db.search_target_clash(call_id=call_id)
+        self.assertEqual(
+            [(x.proposal_id, x.target_name, x.moc_name)
+             for x in clashes.values()],
+            [(proposal_1, 'A', 'public'), (proposal_1, 'A', 'private'),
+             (proposal_2, 'D', 'public'), (proposal_2, 'D', 'private')])
+
+        # Checking the call again directly should give the same result.
+        tool = ClashTool(self.view, 0)
+        self.assertEqual(tool.check_call(self.db, call_id), 2)
+        self.assertEqual(
+            len(self.db.search_target_clash(call_id=call_id)), 4)
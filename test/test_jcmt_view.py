@@ -18,7 +18,10 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
-from hedwig.error import NoSuchRecord
+from unittest import TestCase
+
+from hedwig.error import NoSuchRecord, UserError
+from hedwig.facility.jcmt.calculator_jcmt import JCMTCalculator
 from hedwig.facility.jcmt.type import JCMTAncillary, JCMTInstrument, \
     JCMTRequest, JCMTRequestCollection, \
     JCMTReview, JCMTReviewerExpertise, \
@@ -268,3 +271,35 @@ class JCMTFacilityTestCase(FacilityTestCase):
         self.assertEqual(a.weather, 'Band 5')
         self.assertEqual(a.time, 4.5)
         self.assertIsNone(a.ancillary)
+
+
+class JCMTCalculatorTestCase(TestCase):
+    def test_weather_band_comparison(self):
+        calculator = JCMTCalculator(None, None)
+        tau_values = []
+
+        def func(tau):
+            tau_values.append(tau)
+
+            if tau > 0.2:
+                raise UserError('Tau too high')
+
+            return -tau
+
+        comparison = calculator._make_weather_band_comparison(
+            func, (UserError,))
+
+        # The function should only be called once for each distinct value.
+        self.assertEqual(sorted(tau_values), [
+            0.045, 0.05, 0.065, 0.08, 0.1, 0.12, 0.16, 0.2, 0.25])
+
+        self.assertEqual(list(comparison.keys()), [
+            JCMTWeather.BAND1, JCMTWeather.BAND2, JCMTWeather.BAND3,
+            JCMTWeather.BAND4, JCMTWeather.BAND5])
+
+        self.assertEqual(comparison[JCMTWeather.BAND1], {
+            'rep': -0.045, 'min': None, 'max': -0.05})
+        self.assertEqual(comparison[JCMTWeather.BAND3], {
+            'rep': -0.1, 'min': -0.08, 'max': -0.12})
+        self.assertEqual(comparison[JCMTWeather.BAND5], {
+            'rep': None, 'min': -0.2, 'max': None})
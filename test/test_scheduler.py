@@ -0,0 +1,101 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from time import sleep
+from unittest import TestCase
+
+from hedwig.error import Error
+from hedwig.scheduler import PollScheduler, PollTask, PollTaskStatistics, \
+    parse_task_values
+from hedwig.web.template_util import Counter
+
+
+class SchedulerTest(TestCase):
+    def test_scheduler(self):
+        n_fast = Counter(0)
+        n_slow = Counter(0)
+
+        def fast():
+            n_fast()
+            return 1
+
+        def slow():
+            n_slow()
+            sleep(0.5)
+            return 0
+
+        def fail():
+            raise Exception('Task failed')
+
+        scheduler = PollScheduler([
+            PollTask('fast', fast, '{} fast', interval=0.01,
+                     queue_depth=lambda: 42),
+            PollTask('slow', slow, '{} slow', interval=0.01, threads=2),
+            PollTask('fail', fail, '{} fail', interval=0.01, max_backoff=10),
+        ])
+
+        scheduler.start()
+        sleep(0.3)
+        scheduler.stop()
+        scheduler.join()
+
+        stats = scheduler.get_statistics(with_queue_depth=True)
+        self.assertEqual(set(stats.keys()), set(('fast', 'slow', 'fail')))
+
+        for stat in stats.values():
+            self.assertIsInstance(stat, PollTaskStatistics)
+
+        # The fast task should not have been held up by the slow task.
+        self.assertGreater(n_fast.value, 5)
+        self.assertEqual(stats['fast'].runs, n_fast.value)
+        self.assertEqual(stats['fast'].processed, n_fast.value)
+        self.assertEqual(stats['fast'].failures, 0)
+        self.assertEqual(stats['fast'].queue_depth, 42)
+
+        # The slow task had two threads, each of which should have run once.
+        self.assertEqual(n_slow.value, 2)
+        self.assertEqual(stats['slow'].runs, 2)
+        self.assertGreaterEqual(stats['slow'].latency_max, 0.5)
+        self.assertIsNone(stats['slow'].queue_depth)
+
+        # The failing task should have backed off.
+        self.assertGreater(stats['fail'].failures, 0)
+        self.assertLess(stats['fail'].failures, 6)
+        self.assertEqual(stats['fail'].runs, stats['fail'].failures)
+
+    def test_delay(self):
+        task = PollTask('test', None, '', interval=5, max_backoff=60)
+
+        self.assertEqual(
+            [task.get_delay(x) for x in range(6)],
+            [5, 10, 20, 40, 60, 60])
+
+        self.assertEqual(task.get_delay(1000), 60)
+
+    def test_parse_task_values(self):
+        self.assertEqual(parse_task_values(''), {})
+
+        self.assertEqual(
+            parse_task_values('email:5, publication:300'),
+            {'email': 5, 'publication': 300})
+
+        for invalid in ('email', 'email:fast', 'email:5:6'):
+            with self.assertRaises(Error):
+                parse_task_values(invalid)
@@ -22,6 +22,7 @@ from collections import namedtuple
 import itertools
 from unittest import TestCase
 
+from hedwig.astro.coord import CoordSystem
 from hedwig.error import MultipleRecords, NoSuchRecord, NoSuchValue, UserError
 from hedwig.type.base import CollectionByProposal, CollectionOrdered, \
     CollectionSortable
@@ -29,13 +30,14 @@ from hedwig.type.collection import \
     CallCollection, CallPreambleCollection, \
     EmailCollection, GroupMemberCollection, MemberCollection, \
     ResultCollection, \
-    ProposalCollection, ProposalFigureCollection, ReviewerCollection
+    ProposalCollection, ProposalFigureCollection, ReviewerCollection, \
+    TargetCollection, TargetObjectList
 from hedwig.type.enum import BaseReviewerRole, BaseTextRole, \
     CallState, GroupType, \
     ReviewState
 from hedwig.type.simple import \
     Call, CallPreamble, Email, GroupMember, Member, \
-    Proposal, ProposalFigureInfo, Reviewer
+    Proposal, ProposalFigureInfo, Reviewer, Target, TargetObject
 from hedwig.type.util import null_tuple
 
 
@@ -465,3 +467,64 @@ class CollectionTypeTestCase(TestCase):
                                                  with_std_dev=True)
         self.assertEqual(rating, 55.0)
         self.assertAlmostEqual(std_dev, 25.981, places=3)
+
+    def test_target_collection(self):
+        formatted = ResultCollection()
+
+        for (id_, name, x, y, system, time) in [
+                (1, 'A', '12:34:56', '+78:09:00', CoordSystem.ICRS, '1.5'),
+                (2, 'B', '', '', None, ''),
+                (3, 'C', '135.75', '-15.25', CoordSystem.GAL, ''),
+                (4, 'D', '15.0', '75', CoordSystem.ICRS, '2'),
+                ]:
+            formatted[id_] = null_tuple(Target)._replace(
+                id=id_, name=name, x=x, y=y, system=system, time=time)
+
+        c = TargetCollection.from_formatted_collection(formatted)
+
+        self.assertIsInstance(c, TargetCollection)
+        self.assertEqual(list(c.keys()), [1, 2, 3, 4])
+        self.assertAlmostEqual(c[1].x, 188.7333333)
+        self.assertAlmostEqual(c[1].y, 78.15)
+        self.assertIsNone(c[2].system)
+        self.assertIsNone(c[2].x)
+        self.assertEqual(c[3].system, CoordSystem.GAL)
+        self.assertAlmostEqual(c[3].x, 135.75)
+        self.assertAlmostEqual(c[4].x, 15.0)
+        self.assertEqual(c.total_time(), 3.5)
+
+        self.assertEqual(
+            [(x.x, x.y) for x in c.to_formatted_collection().values()],
+            [('12:34:56', '+78:09:00'), ('', ''),
+             ('135.75', '-15.25'), ('01:00:00', '+75:00:00')])
+
+        objects = c.to_object_list()
+        self.assertIsInstance(objects, TargetObjectList)
+        self.assertEqual(len(objects), 3)
+        self.assertEqual(objects.names, ['A', 'C', 'D'])
+
+        target = objects[1]
+        self.assertIsInstance(target, TargetObject)
+        self.assertEqual(target.system, CoordSystem.GAL)
+        self.assertAlmostEqual(target.coord.spherical.lon.deg, 135.75)
+        self.assertEqual([x.name for x in objects], ['A', 'C', 'D'])
+
+        icrs = objects.to_icrs()
+        self.assertAlmostEqual(icrs.ra.deg[1], target.coord.icrs.ra.deg)
+        self.assertAlmostEqual(icrs.dec.deg[2], 75.0)
+
+        copy = TargetObjectList.from_object_list(list(objects))
+        self.assertEqual(copy.names, objects.names)
+        self.assertEqual(copy.systems, objects.systems)
+
+        # Errors should identify the target which could not be parsed.
+        formatted[3] = formatted[3]._replace(
+            y='-95.25', system=CoordSystem.ICRS)
+
+        with self.assertRaisesRegexp(UserError, '"C"'):
+            TargetCollection.from_formatted_collection(formatted)
+
+        formatted[3] = formatted[3]._replace(y='')
+
+        with self.assertRaisesRegexp(UserError, 'only one coordinate'):
+            TargetCollection.from_formatted_collection(formatted)
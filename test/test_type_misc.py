@@ -20,10 +20,45 @@ from __future__ import absolute_import, division, print_function, \
 
 from unittest import TestCase
 
-from hedwig.type.misc import SectionedList, SectionedListSection
+from hedwig.type.misc import FileStream, SectionedList, SectionedListSection
 
 
 class MiscTypeTestCase(TestCase):
+    def test_file_stream(self):
+        data = b'abcdefghij'
+        reads = []
+
+        def read(offset, size):
+            reads.append((offset, size))
+            return data[offset:offset + size]
+
+        stream = FileStream(len(data), read, chunk_size=4)
+
+        self.assertEqual(stream.length, 10)
+        self.assertEqual(list(stream.iter_range()), [b'abcd', b'efgh', b'ij'])
+        self.assertEqual(reads, [(0, 4), (4, 4), (8, 2)])
+
+        self.assertEqual(list(stream.iter_range(3, 6)), [b'def'])
+        self.assertEqual(list(stream.iter_range(8, 20, chunk_size=1)),
+                         [b'i', b'j'])
+        self.assertEqual(list(stream.iter_range(10)), [])
+
+        self.assertEqual(stream.read(), data)
+
+        # The length can be given as a function, which should only be
+        # called when required.
+        lengths = []
+
+        def length():
+            lengths.append(len(data))
+            return len(data)
+
+        stream = FileStream(length, read)
+        self.assertEqual(lengths, [])
+        self.assertEqual(stream.length, 10)
+        self.assertEqual(stream.read(), data)
+        self.assertEqual(lengths, [10])
+
     def test_sectioned_list(self):
         # Construct empty list.
         sl = SectionedList()
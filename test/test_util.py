@@ -21,8 +21,8 @@ from __future__ import absolute_import, division, print_function, \
 from collections import OrderedDict
 from unittest import TestCase
 
-from hedwig.util import get_countries, is_list_like, list_in_blocks, \
-    matches_constraint
+from hedwig.util import LRUCache, get_countries, is_list_like, \
+    list_in_blocks, matches_constraint
 
 
 class UtilTest(TestCase):
@@ -45,6 +45,25 @@ class UtilTest(TestCase):
         cc = get_countries()
         self.assertIs(cc, c)
 
+    def test_lru_cache(self):
+        cache = LRUCache(max_size=2)
+
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+
+        # Adding a third entry should remove the least-recently used.
+        cache.put('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('b', 0), 0)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get('a'))
+
     def test_list_in_blocks(self):
         self.assertEqual(list(list_in_blocks(range(0, 3), 5)),
                          [[0, 1, 2]])
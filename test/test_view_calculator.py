@@ -0,0 +1,70 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from unittest import TestCase
+
+from hedwig.facility.example.calculator_example import ExampleCalculator
+from hedwig.view.calculator import result_cache
+
+
+class CountingCalculator(ExampleCalculator):
+    cache_results = True
+
+    n_calls = 0
+
+    def __call__(self, mode, input_):
+        self.n_calls += 1
+
+        return super(CountingCalculator, self).__call__(mode, input_)
+
+
+class CalculatorViewTest(TestCase):
+    def test_calculate_cache(self):
+        result_cache.clear()
+
+        calculator = CountingCalculator(None, 1)
+        mode = calculator.ADDITION
+
+        result = calculator.calculate(mode, {'a': 1.0, 'b': 2.0})
+        self.assertEqual(result.output, {'sum': 3000.0})
+        self.assertEqual(calculator.n_calls, 1)
+
+        # Repeating the calculation (with the input in any order) should
+        # return a copy of the cached result.
+        result.output['sum'] = 0.0
+        result = calculator.calculate(mode, {'b': 2.0, 'a': 1.0})
+        self.assertEqual(result.output, {'sum': 3000.0})
+        self.assertEqual(calculator.n_calls, 1)
+
+        # Different inputs or modes should be calculated.
+        result = calculator.calculate(mode, {'a': 1.0, 'b': 3.0})
+        self.assertEqual(result.output, {'sum': 4000.0})
+        self.assertEqual(calculator.n_calls, 2)
+
+        result = calculator.calculate(
+            calculator.SUBTRACTION, {'a': 1.0, 'b': 2.0})
+        self.assertEqual(result.output, {'diff': -0.001})
+        self.assertEqual(calculator.n_calls, 3)
+
+        # Calculators which do not enable the cache should not use it.
+        calculator = ExampleCalculator(None, 1)
+        calculator.calculate(mode, {'a': 1.0, 'b': 2.0})
+        self.assertEqual(len(result_cache), 3)
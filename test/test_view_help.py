@@ -0,0 +1,95 @@
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from hedwig.view.help import HelpView, NavLink, compile_help, \
+    write_help_graphs
+
+pages = {
+    'index': 'Help\n====\n\n.. toctree::\n\n    page_a\n    page_b\n',
+    'page_a': 'Page A\n======\n\nFirst page.\n',
+    'page_b': 'Page B\n======\n\nSecond page.\n',
+}
+
+
+class HelpViewTest(TestCase):
+    def setUp(self):
+        self.doc_root = mkdtemp()
+
+        for (name, text) in pages.items():
+            self._write_file(name + '.rst', text)
+
+        os.mkdir(os.path.join(self.doc_root, 'graph'))
+        self._write_file(os.path.join('graph', 'graph_a.dot'), 'digraph {}')
+
+    def tearDown(self):
+        rmtree(self.doc_root)
+
+    def test_compile_help(self):
+        view = HelpView()
+        toc_cache = {}
+
+        # Provide an up-to-date PNG file so that Graphviz is not needed.
+        self._write_file(os.path.join('graph', 'graph_a.png'), 'PNG', 1)
+
+        # The image should not be written again.
+        self.assertEqual(write_help_graphs(self.doc_root), 0)
+
+        self.assertEqual(compile_help(self.doc_root, toc_cache), (3, 1))
+
+        self.assertEqual(
+            sorted(toc_cache['_page'].keys()), ['index', 'page_a', 'page_b'])
+        self.assertEqual(list(toc_cache['_tree']['index'].toc.keys()),
+                         ['page_a', 'page_b'])
+        self.assertEqual(toc_cache['_graph']['graph_a'].png, 'PNG')
+
+        ctx = view.help_page(self.doc_root, 'page_a', toc_cache)
+        self.assertEqual(ctx['title'], 'Page A')
+        self.assertIn('First page.', ctx['help_text'])
+        self.assertEqual(ctx['nav_link'], NavLink(
+            './', 'Help', None, None, 'page_b', 'Page B'))
+
+        # Pages should be served from the cache.
+        toc_cache['_page']['page_a'] = toc_cache['_page']['page_a']._replace(
+            body='cached')
+        ctx = view.help_page(self.doc_root, 'page_a', toc_cache)
+        self.assertEqual(ctx['help_text'], 'cached')
+
+        # Modified files should be read again.
+        self._write_file('page_a.rst', 'Page A\n======\n\nUpdated.\n', 2)
+        ctx = view.help_page(self.doc_root, 'page_a', toc_cache)
+        self.assertIn('Updated.', ctx['help_text'])
+
+        self.assertEqual(
+            view.help_graph(self.doc_root, 'graph_a', toc_cache), 'PNG')
+
+    def _write_file(self, file_name, text, mtime_offset=0):
+        path_name = os.path.join(self.doc_root, file_name)
+
+        with open(path_name, 'w') as f:
+            f.write(text)
+
+        if mtime_offset:
+            mtime = os.path.getmtime(path_name) + mtime_offset
+            os.utime(path_name, (mtime, mtime))
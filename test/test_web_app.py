@@ -18,6 +18,13 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
+from datetime import datetime
+import json
+import re
+
+from hedwig.type.enum import BaseCallType, BaseTextRole, FormatType, \
+    GroupType
+
 from .dummy_app import WebAppTestCase
 
 
@@ -56,3 +63,176 @@ class BasicWebAppTestCase(WebAppTestCase):
 
         with self.client.session_transaction() as sess:
             self.assertNotIn('user_id', sess)
+
+    def test_call_clash_report(self):
+        facility_id = self.db.ensure_facility('generic')
+        semester_id = self.db.add_semester(
+            facility_id, 'Semester', 'sem',
+            datetime(2000, 1, 1), datetime(2000, 6, 30))
+        queue_id = self.db.add_queue(facility_id, 'Queue', 'q')
+        call_id = self.db.add_call(
+            BaseCallType, semester_id, queue_id, BaseCallType.STANDARD,
+            datetime(1999, 9, 1), datetime(1999, 9, 30),
+            100, 1000, 0, 1, 2000, 4, 3, 100, 100, '', '', '',
+            FormatType.PLAIN)
+
+        user_id = self.db.add_user('coord', 'pass1')
+        person_id = self.db.add_person('Coordinator', user_id=user_id)
+        self.db.add_group_member(queue_id, GroupType.COORD, person_id)
+
+        url = '/generic/tool/clash/call/{}'.format(call_id)
+
+        rv = self.client.post(
+            '/user/log_in', data={'user_name': 'coord', 'password': 'pass1'})
+        self.assertEqual(rv.status_code, 303)
+
+        rv = self.client.get(url)
+        self.assertEqual(rv.status_code, 200)
+        self.assertIn('have not yet been checked', rv.data)
+
+        self.db.sync_call_target_clash(call_id, {})
+
+        rv = self.client.get(url)
+        self.assertEqual(rv.status_code, 200)
+        self.assertIn('No proposals have been submitted', rv.data)
+
+        rv = self.client.get(url + '/download')
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.mimetype, 'text/csv')
+        self.assertTrue(rv.data.startswith('"Proposal","Title",'))
+
+        self.log_out()
+
+        rv = self.client.get(url)
+        self.assertEqual(rv.status_code, 303)
+
+    def test_processing_status(self):
+        facility_id = self.db.ensure_facility('generic')
+        semester_id = self.db.add_semester(
+            facility_id, 'Semester', 'sem',
+            datetime(2000, 1, 1), datetime(2000, 6, 30))
+        queue_id = self.db.add_queue(facility_id, 'Queue', 'q')
+        call_id = self.db.add_call(
+            BaseCallType, semester_id, queue_id, BaseCallType.STANDARD,
+            datetime(1999, 9, 1), datetime(1999, 9, 30),
+            100, 1000, 0, 1, 2000, 4, 3, 100, 100, '', '', '',
+            FormatType.PLAIN)
+        affiliation_id = self.db.add_affiliation(queue_id, 'Affiliation')
+
+        user_id = self.db.add_user('admin', 'pass1')
+        person_id = self.db.add_person('Administrator', user_id=user_id)
+        self.db.update_person(person_id, admin=True)
+
+        for title in ('Proposal A', 'Proposal B'):
+            proposal_id = self.db.add_proposal(
+                call_id, person_id, affiliation_id, title)
+
+            self.db.set_proposal_pdf(
+                BaseTextRole, proposal_id, BaseTextRole.TECHNICAL_CASE,
+                b'dummy PDF file', 1, 'technical.pdf', person_id)
+            self.db.set_proposal_pdf(
+                BaseTextRole, proposal_id, BaseTextRole.SCIENCE_CASE,
+                b'dummy PDF file', 1, 'scientific.pdf', person_id)
+
+        rv = self.client.post(
+            '/user/log_in', data={'user_name': 'admin', 'password': 'pass1'})
+        self.assertEqual(rv.status_code, 303)
+
+        with self.client.session_transaction() as sess:
+            sess['is_admin'] = True
+
+        rv = self.client.get('/admin/processing')
+        self.assertEqual(rv.status_code, 200)
+
+        for code in ('sem-q-1', 'sem-q-2'):
+            self.assertEqual(rv.data.count('>{}</a>'.format(code)), 2)
+
+        self.assertIn('All files appear to be ready.', rv.data)
+
+    def test_message_list(self):
+        user_id = self.db.add_user('admin', 'pass1')
+        person_id = self.db.add_person('Administrator', user_id=user_id)
+        self.db.update_person(person_id, admin=True)
+
+        message_ids = [
+            self.db.add_message(
+                'Message {}'.format(i), 'Test message', [person_id])
+            for i in range(205)]
+
+        rv = self.client.post(
+            '/user/log_in', data={'user_name': 'admin', 'password': 'pass1'})
+        self.assertEqual(rv.status_code, 303)
+
+        with self.client.session_transaction() as sess:
+            sess['is_admin'] = True
+
+        def get_page(url):
+            rv = self.client.get(url)
+            self.assertEqual(rv.status_code, 200)
+
+            ids = [int(x) for x in re.findall(
+                r'/admin/message/(\d+)"', rv.data)]
+
+            links = {
+                name: url.replace('&amp;', '&') for (url, name) in
+                re.findall(r'<a href="([^"]*)">(\w+) page</a>', rv.data)}
+
+            return (ids, links)
+
+        (ids, links) = get_page('/admin/message/')
+        self.assertEqual(ids, message_ids[:104:-1])
+        self.assertEqual(sorted(links.keys()), ['Next'])
+
+        (ids, links) = get_page(links['Next'])
+        self.assertEqual(ids, message_ids[104:4:-1])
+        self.assertEqual(sorted(links.keys()), ['First', 'Next', 'Previous'])
+
+        (ids, links_last) = get_page(links['Next'])
+        self.assertEqual(ids, message_ids[4::-1])
+        self.assertEqual(sorted(links_last.keys()), ['First', 'Previous'])
+
+        (ids, links) = get_page(links_last['Previous'])
+        self.assertEqual(ids, message_ids[104:4:-1])
+        self.assertEqual(sorted(links.keys()), ['First', 'Next', 'Previous'])
+
+        (ids, links) = get_page(links['Previous'])
+        self.assertEqual(ids, message_ids[:104:-1])
+        self.assertEqual(sorted(links.keys()), ['Next'])
+
+
+class ExampleWebAppTestCase(WebAppTestCase):
+    facility_spec = 'hedwig.facility.example.view.Example'
+
+    def test_calculator_batch(self):
+        url = '/example/calculator/example/batch'
+
+        rv = self.client.post(url, content_type='application/json',
+                              data=json.dumps({'calculations': [
+                                  {'mode': 'add', 'input': {'a': 3, 'b': '4'}},
+                                  {'mode': 'sub', 'input': {'a': 3}},
+                                  {'mode': 'mul', 'input': {}},
+                                  {'mode': 'add', 'input': {'a': 'x'}},
+                                  {'mode': 'add', 'input': {'c': 1}},
+                                  {'mode': 'add', 'input': {'a': [1]}},
+                                  {'mode': 'add', 'input': {'a': None}},
+                              ]}))
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.mimetype, 'application/json')
+        self.assertEqual(json.loads(rv.data), {'results': [
+            {'output': {'sum': 7000.0}, 'error': None},
+            {'output': {'diff': 0.001}, 'error': None},
+            {'output': None, 'error': 'Unknown calculator mode.'},
+            {'output': None, 'error': 'Invalid value for First input.'},
+            {'output': None, 'error': 'Unknown input "c".'},
+            {'output': None,
+             'error': 'Input "a" should be a string or number.'},
+            {'output': None,
+             'error': 'Input "a" should be a string or number.'},
+        ]})
+
+        # Invalid requests should be rejected.
+        for data in ('not JSON', '[]', '{"calculations": {}}',
+                     json.dumps({'calculations': [{}] * 101})):
+            rv = self.client.post(url, data=data)
+            self.assertEqual(rv.status_code, 400)
+            self.assertIn('error', json.loads(rv.data))
@@ -18,11 +18,13 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
+from threading import Thread
 from unittest import TestCase
 
 from hedwig.type.enum import FormatType
 from hedwig.type.simple import ProposalText
-from hedwig.web.format import format_text, format_text_plain
+from hedwig.web.format import format_text, format_text_plain, \
+    format_text_rst, rst_cache
 from hedwig.web.util import HTTPError
 
 
@@ -58,3 +60,48 @@ class TextFormatTest(TestCase):
         self.assertEqual(format_text_plain(
             '&ldquo;a\n<i>b</i>\n\nc\nd'),
             '<p>&amp;ldquo;a<br />&lt;i&gt;b&lt;/i&gt;</p><p>c<br />d</p>')
+
+    def test_format_rst(self):
+        rst_cache.clear()
+
+        self.assertEqual(format_text_rst('*a*').strip(),
+                         '<p><em>a</em></p>')
+        self.assertEqual(len(rst_cache), 1)
+
+        # Repeating the same text should use the cache.
+        self.assertEqual(format_text('*a*', FormatType.RST).strip(),
+                         '<p><em>a</em></p>')
+        self.assertEqual(len(rst_cache), 1)
+
+        text = 'Title\n=====\n\n.. toctree::\n\n    page_1\n    page_2\n'
+
+        (body, title, toc) = format_text_rst(text, extract_title_toc=True)
+        self.assertEqual(title, 'Title')
+        self.assertEqual(toc, ['page_1', 'page_2'])
+        self.assertEqual(len(rst_cache), 2)
+
+        # Changing the returned TOC should not affect the cached entry.
+        toc.append('page_3')
+        (body, title, toc) = format_text_rst(text, extract_title_toc=True)
+        self.assertEqual(toc, ['page_1', 'page_2'])
+
+        # Documents should be converted correctly in several threads.
+        results = {}
+
+        def convert(n):
+            results[n] = format_text_rst(
+                'Title {0}\n=======\n\n.. toctree::\n\n    page_{0}\n'
+                .format(n), extract_title_toc=True)
+
+        threads = [Thread(target=convert, args=(n,)) for n in range(10)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        for n in range(10):
+            (body, title, toc) = results[n]
+            self.assertEqual(title, 'Title {}'.format(n))
+            self.assertEqual(toc, ['page_{}'.format(n)])
@@ -19,11 +19,17 @@ from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
 from datetime import datetime
+import os
+from tempfile import mkstemp
 from unittest import TestCase
 
+from flask import Flask
+
 from hedwig.error import UserError
-from hedwig.type.simple import DateAndTime
-from hedwig.web.util import format_datetime, parse_datetime
+from hedwig.type.enum import FigureType
+from hedwig.type.misc import FileStream
+from hedwig.type.simple import DateAndTime, ProposalFigure
+from hedwig.web.util import format_datetime, parse_datetime, send_file
 
 
 class WebUtilTestCase(TestCase):
@@ -53,3 +59,158 @@ class WebUtilTestCase(TestCase):
         self.assertEqual(dt.day, 4)
         self.assertEqual(dt.hour, 17)
         self.assertEqual(dt.minute, 55)
+
+    def test_send_file_stream(self):
+        data = b'0123456789' * 10
+
+        app = Flask(__name__)
+
+        @app.route('/file')
+        @send_file()
+        def file_route():
+            return ProposalFigure(
+                FileStream(len(data), lambda offset, size:
+                           data[offset:offset + size], chunk_size=7),
+                FigureType.PDF, 'test.pdf')
+
+        client = app.test_client()
+
+        response = client.get('/file')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, data)
+        self.assertEqual(response.headers['Content-Length'], '100')
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(response.mimetype, 'application/pdf')
+
+        for (range_header, content_range, expect) in [
+                ('bytes=10-24', 'bytes 10-24/100', data[10:25]),
+                ('bytes=95-', 'bytes 95-99/100', data[95:]),
+                ('bytes=-3', 'bytes 97-99/100', data[97:]),
+                ('bytes=90-1000', 'bytes 90-99/100', data[90:])]:
+            response = client.get('/file', headers={'Range': range_header})
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response.data, expect)
+            self.assertEqual(response.headers['Content-Range'], content_range)
+            self.assertEqual(response.headers['Content-Length'],
+                             str(len(expect)))
+
+        response = client.get('/file', headers={'Range': 'bytes=100-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], 'bytes */100')
+
+        # Multiple ranges are not supported: the whole file should be sent.
+        response = client.get('/file', headers={'Range': 'bytes=0-1,5-6'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, data)
+
+    def test_send_file_conditional(self):
+        data = b'0123456789'
+        reads = []
+
+        def read(offset, size):
+            reads.append((offset, size))
+            return data[offset:offset + size]
+
+        def length():
+            reads.append('length')
+            return len(data)
+
+        app = Flask(__name__)
+
+        @app.route('/file')
+        @send_file(fixed_type=FigureType.PNG, allow_cache=True)
+        def file_route():
+            return FileStream(
+                length, read, etag='abc123',
+                last_modified=datetime(2016, 4, 1, 12, 0, 30, 500))
+
+        client = app.test_client()
+
+        response = client.get('/file')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, data)
+        self.assertEqual(response.headers['ETag'], '"abc123"')
+        self.assertEqual(response.headers['Last-Modified'],
+                         'Fri, 01 Apr 2016 12:00:30 GMT')
+        self.assertEqual(len(reads), 2)
+
+        del reads[:]
+
+        for headers in [
+                {'If-None-Match': '"abc123"'},
+                {'If-None-Match': '"xyz", "abc123"'},
+                {'If-Modified-Since': 'Fri, 01 Apr 2016 12:00:30 GMT'},
+                {'If-Modified-Since': 'Sat, 02 Apr 2016 00:00:00 GMT'}]:
+            response = client.get('/file', headers=headers)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b'')
+            self.assertEqual(response.headers['ETag'], '"abc123"')
+
+        # The stream (including its length) should not have been read
+        # for "Not Modified" responses.
+        self.assertEqual(reads, [])
+
+        for headers in [
+                {'If-None-Match': '"xyz"'},
+                {'If-Modified-Since': 'Fri, 01 Apr 2016 12:00:29 GMT'}]:
+            response = client.get('/file', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, data)
+
+        # Ranges should only be applied if "If-Range" matches.
+        response = client.get('/file', headers={
+            'Range': 'bytes=2-3', 'If-Range': '"abc123"'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b'23')
+
+        response = client.get('/file', headers={
+            'Range': 'bytes=2-3',
+            'If-Range': 'Fri, 01 Apr 2016 12:00:30 GMT'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b'23')
+
+        for if_range in ('"xyz"', 'W/"abc123"',
+                         'Fri, 01 Apr 2016 12:00:29 GMT', 'invalid'):
+            response = client.get('/file', headers={
+                'Range': 'bytes=2-3', 'If-Range': if_range})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, data)
+
+    def test_send_file_path(self):
+        data = b'0123456789'
+
+        (fd, path) = mkstemp()
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+
+            app = Flask(__name__)
+
+            @app.route('/file')
+            @send_file(fixed_type=FigureType.PNG)
+            def file_route():
+                return FileStream(
+                    len(data), None, etag='abc123', path=path)
+
+            client = app.test_client()
+
+            # The file should be sent via the WSGI file wrapper.
+            response = client.get('/file')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, data)
+            self.assertEqual(response.headers['Content-Length'], '10')
+            self.assertNotIn('X-Sendfile', response.headers)
+
+            # Or by the web server, if X-Sendfile is enabled.
+            app.use_x_sendfile = True
+
+            response = client.get('/file')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, b'')
+            self.assertEqual(response.headers['X-Sendfile'], path)
+            self.assertEqual(response.headers['Content-Length'], '10')
+            self.assertEqual(response.headers['ETag'], '"abc123"')
+
+        finally:
+            os.unlink(path)
+
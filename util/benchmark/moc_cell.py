@@ -0,0 +1,100 @@
+#!/usr/bin/env python2
+
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+"""
+moc_cell - Benchmark import of MOC cells into the database
+
+Usage:
+    moc_cell.py [--database <url>] [--cells <number>] [--order <order>]
+        [--block-size <number>]
+
+Options:
+    --help, -h                Show usage information.
+    --database <url>          Database URL [default: sqlite:///:memory:].
+    --cells <number>          Number of cells in the MOC [default: 1000000].
+    --order <order>           MOC order of the cells [default: 12].
+    --block-size <number>     Number of cells per transaction [default: 10000].
+
+A synthetic MOC is constructed from every other cell at the given order
+(so that no cells can be merged by normalization).  This is imported
+into an empty moc_cell table and then replaced with an alternative MOC
+offset by one cell, testing the "insert" and "bulk" update paths.
+Finally a single cell is added to test the "individual" update path.
+
+If a database URL other than the default is given, the tables
+will be created in it if necessary.  A temporary facility and MOC
+will be created and then deleted.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from time import time
+
+from docopt import docopt
+from pymoc import MOC
+
+from hedwig.config import _get_db_class
+from hedwig.db.engine import get_engine
+from hedwig.db.meta import metadata
+from hedwig.type.enum import FormatType
+
+
+def main():
+    args = docopt(__doc__)
+
+    n_cell = int(args['--cells'])
+    order = int(args['--order'])
+    block_size = int(args['--block-size'])
+
+    if n_cell * 2 > 12 * 4 ** order:
+        raise Exception('Too many cells for MOC order {}'.format(order))
+
+    engine = get_engine(args['--database'])
+    metadata.create_all(engine)
+    db = _get_db_class('Generic')(engine)
+
+    moc_a = MOC(order=order, cells=range(0, 2 * n_cell, 2))
+    moc_b = MOC(order=order, cells=range(1, 2 * n_cell + 1, 2))
+    moc_c = MOC(order=order, cells=range(1, 2 * n_cell + 1, 2))
+    moc_c.add(order, [2 * n_cell + 3])
+
+    facility_id = db.ensure_facility('benchmark_moc_cell')
+    moc_id = db.add_moc(facility_id, 'Benchmark', '', FormatType.PLAIN,
+                        True, MOC())
+
+    try:
+        for (description, moc_object) in (
+                ('Import', moc_a),
+                ('Replace', moc_b),
+                ('Add one cell', moc_c)):
+            start = time()
+
+            result = db.update_moc_cell(moc_id, moc_object,
+                                        block_size=block_size, block_pause=0)
+
+            print('{:<16} {:>9} cells {:>8.2f}s {!r}'.format(
+                description, moc_object.cells, time() - start, result))
+
+    finally:
+        db.delete_moc(facility_id, moc_id)
+
+
+if __name__ == '__main__':
+    main()
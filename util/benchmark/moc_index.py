@@ -0,0 +1,140 @@
+#!/usr/bin/env python2
+
+# Copyright (C) 2016 East Asian Observatory
+# All Rights Reserved.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful,but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc.,51 Franklin
+# Street, Fifth Floor, Boston, MA  02110-1301, USA
+
+"""
+moc_index - Benchmark MOC coverage searches
+
+Usage:
+    moc_index.py [--database <url>] [--mocs <number>] [--cells <number>]
+        [--order <order>] [--targets <number>] [--repeat <number>]
+
+Options:
+    --help, -h                Show usage information.
+    --database <url>          Database URL [default: sqlite:///:memory:].
+    --mocs <number>           Number of MOCs [default: 5].
+    --cells <number>          Number of cells in each MOC [default: 20000].
+    --order <order>           MOC order of the cells [default: 10].
+    --targets <number>        Number of target cells to search for
+                              [default: 1000].
+    --repeat <number>         Number of times to repeat each search
+                              [default: 5].
+
+A number of synthetic MOCs are constructed from random cells at the
+given order and imported into the moc_cell table.  Random target
+cells (at order 12) are then searched for, first via SQL queries
+and then using the in-memory coverage index.  The time taken to build
+the index is reported separately.
+
+If a database URL other than the default is given, the tables
+will be created in it if necessary.  A temporary facility and MOCs
+will be created and then deleted.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from random import randrange, sample
+from time import time
+
+from docopt import docopt
+from pymoc import MOC
+
+from hedwig.config import _get_db_class
+from hedwig.db.engine import get_engine
+from hedwig.db.meta import metadata
+from hedwig.type.enum import FormatType
+
+search_order = 12
+
+
+def main():
+    args = docopt(__doc__)
+
+    n_moc = int(args['--mocs'])
+    n_cell = int(args['--cells'])
+    order = int(args['--order'])
+    n_target = int(args['--targets'])
+    n_repeat = int(args['--repeat'])
+
+    if order > search_order:
+        raise Exception('MOC order must not exceed {}'.format(search_order))
+
+    engine = get_engine(args['--database'])
+    metadata.create_all(engine)
+    db = _get_db_class('Generic')(engine)
+
+    facility_id = db.ensure_facility('benchmark_moc_index')
+    moc_ids = []
+
+    try:
+        start = time()
+
+        for i in range(n_moc):
+            moc_object = MOC(order=order,
+                             cells=sample(xrange(12 * 4 ** order), n_cell))
+
+            moc_id = db.add_moc(facility_id, 'Benchmark {}'.format(i), '',
+                                FormatType.PLAIN, True, moc_object)
+            moc_ids.append(moc_id)
+
+            db.update_moc_cell(moc_id, moc_object, block_pause=0)
+
+        print('{:<16} {:>8.2f}s'.format('Import', time() - start))
+
+        targets = [randrange(12 * 4 ** search_order) for i in range(n_target)]
+
+        start = time()
+        for i in range(n_repeat):
+            result_sql = db.search_moc_cells(
+                facility_id, None, search_order, targets)
+        time_sql = (time() - start) / n_repeat
+
+        start = time()
+        index = db.get_moc_index(facility_id, search_order)
+        time_build = time() - start
+
+        if index is None:
+            raise Exception('MOCs too large to be indexed')
+
+        start = time()
+        for i in range(n_repeat):
+            result_index = index.search(None, targets)
+        time_index = (time() - start) / n_repeat
+
+        if result_index != result_sql:
+            raise Exception('Index search results differ from SQL results')
+
+        n_clash = sum(1 for x in result_index.values() if x)
+
+        print('{:<16} {:>8.2f}s ({} ranges)'.format(
+            'Build index', time_build, index.n_range))
+
+        for (description, duration) in (
+                ('Search SQL', time_sql),
+                ('Search index', time_index)):
+            print('{:<16} {:>8.4f}s ({} targets, {} clashes)'.format(
+                description, duration, n_target, n_clash))
+
+    finally:
+        for moc_id in moc_ids:
+            db.delete_moc(facility_id, moc_id)
+
+
+if __name__ == '__main__':
+    main()